@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""Benchmark the analyzer against synthetic workbooks.
+
+    python benchmark.py generate --preset large --out bench/
+    python benchmark.py run --presets small,medium --output baseline.json
+    python benchmark.py run --compare baseline.json --metric wall_s
+    python benchmark.py compare baseline.json current.json --threshold 0.15
+
+Each case is measured in a fresh interpreter so peak RSS belongs to that
+workbook alone.
+"""
+
+from __future__ import annotations
+import argparse
+import datetime
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Sequence
+
+from synthetic_workbook import PRESETS, generate_preset
+
+HERE = Path(__file__).resolve().parent
+
+
+def _peak_rss_mb() -> float | None:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return round(peak / (1 << 20 if sys.platform == 'darwin' else 1 << 10), 1)
+
+
+def measure(path: Path, stream: bool = False, repeat: int = 1) -> dict:
+    """Time one workbook end to end, then break the time down by phase."""
+    import main
+    from workbook_index import WorkbookIndex
+    from workbook_loader import resolve_source
+
+    rules = main.RULES = main.load_rules()
+    main.SCORING = main.ScoringModel(rules)
+    wall = []
+    findings = []
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        findings = main.analyze_workbook(path, stream=stream)
+        wall.append(time.perf_counter() - t0)
+    peak = _peak_rss_mb()
+
+    t0 = time.perf_counter()
+    source = resolve_source(path)
+    tree = source.parse()
+    parse_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    index = WorkbookIndex(tree, source.kind == 'datasource', source.package)
+    index_s = time.perf_counter() - t0
+    rules_s = {}
+    for rule in rules:
+        t0 = time.perf_counter()
+        rule.check_index(index)
+        rules_s[rule.id] = round(time.perf_counter() - t0, 6)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        main.REPORT_DIR = Path(tmp)
+        t0 = time.perf_counter()
+        main.write_html_report(path, findings)
+        html_s = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        main.write_json_report(path, findings)
+        json_s = time.perf_counter() - t0
+
+    return {
+        'file_bytes': path.stat().st_size,
+        'rules': len(rules),
+        'findings': len(findings),
+        'wall_s': round(min(wall), 6),
+        'parse_s': round(parse_s, 6),
+        'index_s': round(index_s, 6),
+        'rules_s': rules_s,
+        'report_html_s': round(html_s, 6),
+        'report_json_s': round(json_s, 6),
+        'peak_rss_mb': peak,
+    }
+
+
+def _measure_in_child(path: Path, stream: bool, repeat: int) -> dict:
+    cmd = [sys.executable, str(HERE / 'benchmark.py'), '_measure',
+           str(path.resolve()), '--repeat', str(repeat)]
+    if stream:
+        cmd.append('--stream')
+    out = subprocess.run(cmd, check=True, capture_output=True, text=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def run(presets: list[str], workdir: Path, stream: bool, repeat: int,
+        packaged: bool) -> dict:
+    cases = {}
+    for name in presets:
+        path = workdir / f"synthetic_{name}{'.twbx' if packaged else '.twb'}"
+        if not path.exists():
+            print(f'… generating {name}', file=sys.stderr)
+            generate_preset(name, workdir, packaged)
+        print(f'▶ {name}', file=sys.stderr)
+        cases[name] = _measure_in_child(path, stream, repeat)
+        c = cases[name]
+        print(f"  wall {c['wall_s']:.3f}s  html {c['report_html_s']:.3f}s  "
+              f"rss {c['peak_rss_mb']} MB", file=sys.stderr)
+    return {
+        'generated': datetime.datetime.utcnow().isoformat(timespec='seconds')
+        + 'Z',
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'stream': stream,
+        'cases': cases,
+    }
+
+
+def _metric(case: dict, metric: str) -> float | None:
+    value = case
+    for part in metric.split('.'):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value if isinstance(value, (int, float)) else None
+
+
+def compare(baseline: dict, current: dict, metric: str, threshold: float,
+            min_delta: float = 0.0) -> list[str]:
+    """Print a comparison table; return the cases that regressed."""
+    regressed = []
+    print(f'{"case":<10} {"baseline":>12} {"current":>12} {"change":>9}')
+    for name, case in current.get('cases', {}).items():
+        base = _metric(baseline.get('cases', {}).get(name, {}), metric)
+        cur = _metric(case, metric)
+        if base is None or cur is None:
+            print(f'{name:<10} {"-":>12} {cur if cur is not None else "-":>12}')
+            continue
+        change = (cur - base) / base if base else 0.0
+        flag = ''
+        if change > threshold and cur - base > min_delta:
+            regressed.append(name)
+            flag = '  ✗'
+        print(f'{name:<10} {base:>12.4f} {cur:>12.4f} {change:>+8.1%}{flag}')
+    return regressed
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    p = argparse.ArgumentParser(description='Tableau Optimizer benchmarks')
+    sub = p.add_subparsers(dest='cmd', required=True)
+
+    g = sub.add_parser('generate', help='Write synthetic workbooks')
+    g.add_argument('--preset', choices=sorted(PRESETS), action='append')
+    g.add_argument('--out', type=Path, default=Path('bench'))
+    g.add_argument('--twb', action='store_true',
+                   help='Write plain .twb instead of a .twbx package')
+
+    r = sub.add_parser('run', help='Measure presets and record a baseline')
+    r.add_argument('--presets', default='small,medium,large')
+    r.add_argument('--workdir', type=Path, default=Path('bench'))
+    r.add_argument('--repeat', type=int, default=3)
+    r.add_argument('--stream', action='store_true')
+    r.add_argument('--twb', action='store_true')
+    r.add_argument('--output', type=Path, default=None)
+    r.add_argument('--compare', type=Path, default=None,
+                   help='Baseline JSON to compare the new run against')
+    c = sub.add_parser('compare', help='Compare two baseline files')
+    for sp in (r, c):
+        sp.add_argument('--metric', default='wall_s',
+                        help='Metric path, e.g. wall_s, peak_rss_mb, '
+                             'rules_s.GBLEND (default: wall_s)')
+        sp.add_argument('--threshold', type=float, default=0.10,
+                        help='Allowed relative regression (default: 0.10)')
+        sp.add_argument('--min-delta', type=float, default=0.0,
+                        help='Ignore regressions smaller than this absolute '
+                             'amount')
+    c.add_argument('baseline', type=Path)
+    c.add_argument('current', type=Path)
+
+    m = sub.add_parser('_measure')
+    m.add_argument('path', type=Path)
+    m.add_argument('--repeat', type=int, default=1)
+    m.add_argument('--stream', action='store_true')
+
+    args = p.parse_args(argv)
+    if args.cmd == '_measure':
+        print(json.dumps(measure(args.path, args.stream, args.repeat)))
+        return
+    if args.cmd == 'generate':
+        for name in args.preset or ['small']:
+            print(generate_preset(name, args.out, not args.twb))
+        return
+    if args.cmd == 'run':
+        presets = [n for n in args.presets.split(',') if n]
+        unknown = set(presets) - set(PRESETS)
+        if unknown:
+            p.error(f"unknown preset(s): {', '.join(sorted(unknown))}")
+        result = run(presets, args.workdir, args.stream, args.repeat,
+                     not args.twb)
+        text = json.dumps(result, indent=2)
+        if args.output:
+            args.output.write_text(text)
+        else:
+            print(text)
+        if args.compare is None:
+            return
+        baseline = json.loads(args.compare.read_text())
+    else:
+        baseline = json.loads(args.baseline.read_text())
+        result = json.loads(args.current.read_text())
+    regressed = compare(baseline, result, args.metric, args.threshold,
+                        args.min_delta)
+    if regressed:
+        print(f"⚠️  {args.metric} regressed beyond {args.threshold:.0%}: "
+              f"{', '.join(regressed)}")
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,20 +1,28 @@
 from __future__ import annotations
 from rule_base import Rule, Finding
-import xml.etree.ElementTree as ET
+from streaming import ScopedCountHandler, StreamHandler
+from workbook_index import WorkbookIndex
 
 class BlendRule(Rule):
     id = 'GBLEND'
     description = 'Worksheets that blend multiple data sources.'
     group = 'Performance'
     severity = 'MEDIUM'
+    scope = 'worksheet'
 
-    def check(self, tree: ET.ElementTree) ->list[Finding]:
-        findings = []
-        for ws in tree.findall('.//worksheet'):
-            blends = ws.findall('.//datasource-dependencies')
-            if len(blends) > 1:
-                name = ws.get('name', '(unnamed)')
-                findings.append(Finding(self.id,
-                    f"Worksheet '{name}' references {len(blends)} data sources."
-                    , 'NEEDS_REVIEW'))
-        return findings
\ No newline at end of file
+    def _report(self, ws, blends: int) ->(Finding | None):
+        if blends > 1:
+            name = ws.get('name', '(unnamed)')
+            return Finding(self.id,
+                "Worksheet '{}' references {} data sources.",
+                'NEEDS_REVIEW', (name, blends), ws)
+        return None
+
+    def check_object(self, ws, index: WorkbookIndex) ->list[Finding]:
+        blends = index.within(ws, 'datasource-dependencies')
+        finding = self._report(ws, len(blends))
+        return [finding] if finding is not None else []
+
+    def stream(self) ->StreamHandler:
+        return ScopedCountHandler('worksheet', 'datasource-dependencies',
+            self._report)
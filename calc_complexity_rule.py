@@ -0,0 +1,184 @@
+from __future__ import annotations
+import xml.etree.ElementTree as ET
+from calc_parser import FormulaInfo, analyze
+from rule_base import Rule, Finding, anchor
+from streaming import StreamHandler
+from workbook_index import WorkbookIndex
+
+
+def _label(elem: ET.Element | None) -> str:
+    if elem is None:
+        return '(unnamed)'
+    return elem.get('caption') or elem.get('name') or '(unnamed)'
+
+
+def _entry(column: ET.Element | None, formula: str
+           ) -> tuple[ET.Element | None, str | None, str, FormulaInfo]:
+    name = column.get('name') if column is not None else None
+    return column, name, _label(column), analyze(formula)
+
+
+class _CalcCollector(StreamHandler):
+    """Gather (column, formula) pairs per data source while streaming and
+    report each data source when it closes."""
+
+    tags = ('datasource', 'calculation')
+
+    def __init__(self, report):
+        self._report = report
+        self._open: list[tuple[ET.Element, list]] = []
+        self.findings: list[Finding] = []
+
+    def start(self, elem, ctx):
+        if elem.tag == 'datasource':
+            self._open.append((elem, []))
+        elif self._open:
+            formula = elem.get('formula')
+            if formula:
+                # Closed columns are cleared, so keep their names now.
+                self._open[-1][1].append(_entry(ctx.nearest('column'),
+                    formula))
+
+    def end(self, elem, ctx):
+        if elem.tag == 'datasource':
+            ds, calcs = self._open.pop()
+            self.findings.extend(self._report(ds, calcs))
+
+    def finish(self, ctx):
+        return self.findings
+
+
+class _CalcRule(Rule):
+    """Shared plumbing for rules over parsed calculated-field formulas.
+
+    Formulas are parsed through ``calc_parser.analyze`` (memoized by
+    formula hash), judged per data source, and reported with the field's
+    caption and its data source, located at the field's ``<column>``.
+    Subclasses implement ``_judge``.
+    """
+
+    group = 'Performance'
+    severity = 'LOW'
+    scope = 'datasource'
+    cost = 50
+    category = 'NEEDS_REVIEW'
+
+    def _judge(self, info: FormulaInfo, calcs: dict[str, FormulaInfo]
+               ) -> str | None:
+        """Return what is wrong with one formula, or None.  *calcs* maps
+        column names of the same data source to their formulas."""
+        raise NotImplementedError()
+
+    def _report(self, ds: ET.Element, calcs: list[tuple[ET.Element | None,
+                str | None, str, FormulaInfo]]) -> list[Finding]:
+        by_name = {name: info for _, name, _, info in calcs if name}
+        findings = []
+        for column, _, label, info in calcs:
+            if info.ast is None:
+                continue
+            detail = self._judge(info, by_name)
+            if detail:
+                findings.append(Finding(self.id,
+                    "Calculated field '{}' in data source '{}' {}.",
+                    self.category, (label, _label(ds), detail), column))
+        return anchor(findings, ds)
+
+    def check_object(self, ds, index: WorkbookIndex) ->list[Finding]:
+        calcs = []
+        for calc in index.within(ds, 'calculation'):
+            formula = calc.get('formula')
+            if formula and index.nearest(calc, 'datasource') is ds:
+                calcs.append(_entry(index.nearest(calc, 'column'), formula))
+        return self._report(ds, calcs)
+
+    def stream(self) ->StreamHandler:
+        return _CalcCollector(self._report)
+
+
+class NestedLodRule(_CalcRule):
+    id = 'GCALC_NESTED_LOD'
+    description = 'LOD expressions nested inside other LOD expressions.'
+    severity = 'MEDIUM'
+
+    def _judge(self, info, calcs):
+        if info.lod_depth >= 2:
+            return f'nests LOD expressions {info.lod_depth} levels deep'
+        return None
+
+
+class CountDistinctRule(_CalcRule):
+    id = 'GCALC_COUNTD'
+    description = 'COUNTD is expensive on high-cardinality fields.'
+
+    def _judge(self, info, calcs):
+        if info.countd_fields:
+            return 'uses COUNTD over ' + ', '.join(info.countd_fields)
+        return None
+
+
+class RowLevelStringRule(_CalcRule):
+    id = 'GCALC_ROW_STRING'
+    description = 'Row-level string manipulation in calculated fields.'
+    limit = 3
+
+    def _judge(self, info, calcs):
+        if info.row_string_calls >= self.limit:
+            return (f'makes {info.row_string_calls} row-level string '
+                    'function calls')
+        return None
+
+
+class DeepBranchRule(_CalcRule):
+    id = 'GCALC_DEEP_BRANCH'
+    description = 'Deeply nested or very long IF/CASE chains.'
+    max_depth = 3
+    max_chain = 12
+
+    def _judge(self, info, calcs):
+        if info.branch_depth > self.max_depth:
+            return f'nests IF/CASE {info.branch_depth} levels deep'
+        if info.longest_chain > self.max_chain:
+            return f'has an IF/CASE chain with {info.longest_chain} branches'
+        return None
+
+
+class NestedTableCalcRule(_CalcRule):
+    id = 'GCALC_NESTED_TABLE_CALC'
+    description = 'Table calculations computed over other table calculations.'
+    severity = 'MEDIUM'
+
+    @staticmethod
+    def _depth(info: FormulaInfo, calcs: dict[str, FormulaInfo],
+               active: frozenset = frozenset()) -> int:
+        """Table-calc nesting including calculated fields it references
+        (cycles are cut)."""
+        depth = info.table_calc_depth
+        for field, outer in info.table_calc_refs:
+            ref = calcs.get(field)
+            if ref is None or ref is info or ref.ast is None or \
+                    field in active:
+                continue
+            if ref.table_calcs:
+                depth = max(depth, outer + NestedTableCalcRule._depth(ref,
+                    calcs, active | {field}))
+        return depth
+
+    def _judge(self, info, calcs):
+        if not info.table_calcs:
+            return None
+        depth = self._depth(info, calcs)
+        if depth >= 2:
+            return f'nests table calculations {depth} levels deep'
+        return None
+
+
+class CalcCostRule(_CalcRule):
+    id = 'GCALC_COST'
+    description = 'Calculated fields with a high complexity score.'
+    limit = 150
+
+    def _judge(self, info, calcs):
+        cost = info.cost()
+        if cost >= self.limit:
+            return f'has a complexity score of {cost}'
+        return None
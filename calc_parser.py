@@ -0,0 +1,438 @@
+# calc_parser.py
+
+from __future__ import annotations
+import hashlib
+import re
+from collections import OrderedDict
+from typing import Iterator
+
+# Function families the cost model and rules care about.
+AGGREGATES = frozenset({
+    'SUM', 'AVG', 'MIN', 'MAX', 'COUNT', 'COUNTD', 'MEDIAN', 'ATTR', 'STDEV',
+    'STDEVP', 'VAR', 'VARP', 'PERCENTILE', 'COLLECT', 'CORR', 'COVAR',
+    'COVARP'})
+STRING_FUNCTIONS = frozenset({
+    'ASCII', 'CHAR', 'CONTAINS', 'ENDSWITH', 'FIND', 'FINDNTH', 'LEFT', 'LEN',
+    'LOWER', 'LTRIM', 'MID', 'PROPER', 'REGEXP_EXTRACT', 'REGEXP_EXTRACT_NTH',
+    'REGEXP_MATCH', 'REGEXP_REPLACE', 'REPLACE', 'RIGHT', 'RTRIM', 'SPACE',
+    'SPLIT', 'STARTSWITH', 'TRIM', 'UPPER'})
+TABLE_CALCS = frozenset({
+    'FIRST', 'INDEX', 'LAST', 'LOOKUP', 'PREVIOUS_VALUE', 'RANK',
+    'RANK_DENSE', 'RANK_MODIFIED', 'RANK_PERCENTILE', 'RANK_UNIQUE',
+    'RUNNING_AVG', 'RUNNING_COUNT', 'RUNNING_MAX', 'RUNNING_MIN',
+    'RUNNING_SUM', 'SIZE', 'TOTAL'})
+_TABLE_CALC_PREFIXES = ('WINDOW_', 'SCRIPT_')
+LOD_KEYWORDS = frozenset({'FIXED', 'INCLUDE', 'EXCLUDE'})
+
+# complexity = nodes + Σ weight × occurrences (see FormulaInfo.cost)
+COST_WEIGHTS = {
+    'lod': 8, 'nested_lod': 20, 'countd': 10, 'row_string': 3, 'branch': 2,
+    'deep_branch': 6, 'table_calc': 5, 'nested_table_calc': 20,
+}
+
+# Parsed formulas kept in memory; workbooks repeat the same formulas across
+# data-source copies, so even a small cache hits often.
+CACHE_SIZE = 8192
+
+
+def is_table_calc(name: str) -> bool:
+    return name in TABLE_CALCS or name.startswith(_TABLE_CALC_PREFIXES)
+
+
+class CalcSyntaxError(ValueError):
+    """Formula the parser does not understand."""
+
+
+# ── tokenizer ────────────────────────────────────────────────────────
+_TOKEN_RE = re.compile(r"""
+    (?P<ws>\s+)
+  | (?P<comment>//[^\n]*|/\*.*?\*/)
+  | (?P<field>\[(?:[^\]]|\]\])*\])
+  | (?P<str>"(?:[^"]|"")*"|'(?:[^']|'')*')
+  | (?P<date>\#[^\#]*\#)
+  | (?P<num>(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)
+  | (?P<ident>[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<op><=|>=|<>|!=|==|&&|\|\||[-+*/%^=<>!(),{}:.])
+""", re.S | re.X)
+
+
+class Token:
+    __slots__ = ('kind', 'value', 'pos')
+
+    def __init__(self, kind: str, value: str, pos: int):
+        self.kind = kind    # field | str | date | num | ident | op | eof
+        self.value = value  # identifiers are upper-cased
+        self.pos = pos
+
+    def __repr__(self) -> str:
+        return f'<Token {self.kind} {self.value!r}>'
+
+
+def tokenize(formula: str) -> Iterator[Token]:
+    pos = 0
+    end = len(formula)
+    match = _TOKEN_RE.match
+    while pos < end:
+        m = match(formula, pos)
+        if m is None:
+            raise CalcSyntaxError(f'unexpected {formula[pos]!r} at {pos}')
+        kind = m.lastgroup
+        if kind not in ('ws', 'comment'):
+            text = m.group()
+            yield Token(kind, text.upper() if kind == 'ident' else text, pos)
+        pos = m.end()
+    yield Token('eof', '', end)
+
+
+# ── parser ───────────────────────────────────────────────────────────
+class Node:
+    """AST node.  ``kind`` is one of num, str, date, bool, null, field,
+    call (value = function name), lod (value = FIXED/INCLUDE/EXCLUDE or
+    '', children = dimensions + [expression]), if / case (children are the
+    condition/result arms, else last), binop / unop (value = operator) and
+    in."""
+
+    __slots__ = ('kind', 'value', 'children')
+
+    def __init__(self, kind: str, value: str = '',
+                 children: tuple[Node, ...] = ()):
+        self.kind = kind
+        self.value = value
+        self.children = children
+
+    def __repr__(self) -> str:
+        return f'<Node {self.kind} {self.value!r} {len(self.children)}>'
+
+
+_COMPARE = frozenset({'=', '==', '!=', '<>', '<', '>', '<=', '>='})
+
+
+class _Parser:
+    def __init__(self, formula: str):
+        self.tokens = list(tokenize(formula))
+        self.i = 0
+
+    @property
+    def tok(self) -> Token:
+        return self.tokens[self.i]
+
+    def _next(self) -> Token:
+        tok = self.tokens[self.i]
+        self.i += 1
+        return tok
+
+    def _at(self, *values: str) -> bool:
+        tok = self.tokens[self.i]
+        return tok.kind in ('op', 'ident') and tok.value in values
+
+    def _expect(self, value: str) -> None:
+        if not self._at(value):
+            tok = self.tok
+            raise CalcSyntaxError(f'expected {value} at {tok.pos}, '
+                                  f'found {tok.value or "end"!r}')
+        self.i += 1
+
+    def parse(self) -> Node:
+        node = self.expr()
+        if self.tok.kind != 'eof':
+            raise CalcSyntaxError(f'unexpected {self.tok.value!r} at '
+                                  f'{self.tok.pos}')
+        return node
+
+    def expr(self) -> Node:
+        node = self.conj()
+        while self._at('OR', '||'):
+            self.i += 1
+            node = Node('binop', 'OR', (node, self.conj()))
+        return node
+
+    def conj(self) -> Node:
+        node = self.neg()
+        while self._at('AND', '&&'):
+            self.i += 1
+            node = Node('binop', 'AND', (node, self.neg()))
+        return node
+
+    def neg(self) -> Node:
+        if self._at('NOT', '!'):
+            self.i += 1
+            return Node('unop', 'NOT', (self.neg(),))
+        return self.compare()
+
+    def compare(self) -> Node:
+        node = self.additive()
+        while True:
+            if self._at(*_COMPARE):
+                op = self._next().value
+                node = Node('binop', op, (node, self.additive()))
+            elif self._at('IN'):
+                self.i += 1
+                self._expect('(')
+                node = Node('in', '', (node, *self._args()))
+            else:
+                return node
+
+    def additive(self) -> Node:
+        node = self.term()
+        while self._at('+', '-'):
+            op = self._next().value
+            node = Node('binop', op, (node, self.term()))
+        return node
+
+    def term(self) -> Node:
+        node = self.unary()
+        while self._at('*', '/', '%'):
+            op = self._next().value
+            node = Node('binop', op, (node, self.unary()))
+        return node
+
+    def unary(self) -> Node:
+        if self._at('-', '+'):
+            op = self._next().value
+            return Node('unop', op, (self.unary(),))
+        node = self.primary()
+        if self._at('^'):
+            self.i += 1
+            node = Node('binop', '^', (node, self.unary()))
+        return node
+
+    def _args(self) -> list[Node]:
+        """Comma-separated expressions up to ``)`` (already past ``(``)."""
+        args: list[Node] = []
+        if self._at(')'):
+            self.i += 1
+            return args
+        while True:
+            args.append(self.expr())
+            if self._at(')'):
+                self.i += 1
+                return args
+            self._expect(',')
+
+    def _field(self, first: Token) -> Node:
+        # [Data Source].[Field] qualifies a field; keep the field part.
+        name = first.value
+        while self._at('.') and self.tokens[self.i + 1].kind == 'field':
+            self.i += 1
+            name = self._next().value
+        return Node('field', name.replace(']]', ']'))
+
+    def primary(self) -> Node:
+        tok = self._next()
+        kind, value = tok.kind, tok.value
+        if kind == 'num':
+            return Node('num', value)
+        if kind == 'str':
+            return Node('str', value[1:-1])
+        if kind == 'date':
+            return Node('date', value[1:-1])
+        if kind == 'field':
+            return self._field(tok)
+        if kind == 'op':
+            if value == '(':
+                node = self.expr()
+                self._expect(')')
+                return node
+            if value == '{':
+                return self._lod()
+        if kind == 'ident':
+            if value in ('TRUE', 'FALSE'):
+                return Node('bool', value)
+            if value == 'NULL':
+                return Node('null')
+            if value == 'IF':
+                return self._if()
+            if value == 'CASE':
+                return self._case()
+            if self._at('('):
+                self.i += 1
+                return Node('call', value, tuple(self._args()))
+        raise CalcSyntaxError(f'unexpected {value or "end"!r} at {tok.pos}')
+
+    def _if(self) -> Node:
+        arms = [self.expr()]
+        self._expect('THEN')
+        arms.append(self.expr())
+        while self._at('ELSEIF'):
+            self.i += 1
+            arms.append(self.expr())
+            self._expect('THEN')
+            arms.append(self.expr())
+        if self._at('ELSE'):
+            self.i += 1
+            arms.append(self.expr())
+        self._expect('END')
+        return Node('if', '', tuple(arms))
+
+    def _case(self) -> Node:
+        arms = [self.expr()]
+        if not self._at('WHEN'):
+            raise CalcSyntaxError(f'expected WHEN at {self.tok.pos}')
+        while self._at('WHEN'):
+            self.i += 1
+            arms.append(self.expr())
+            self._expect('THEN')
+            arms.append(self.expr())
+        if self._at('ELSE'):
+            self.i += 1
+            arms.append(self.expr())
+        self._expect('END')
+        return Node('case', '', tuple(arms))
+
+    def _lod(self) -> Node:
+        keyword = ''
+        dims: list[Node] = []
+        if self.tok.kind == 'ident' and self.tok.value in LOD_KEYWORDS:
+            keyword = self._next().value
+            if not self._at(':'):
+                dims.append(self.expr())
+                while self._at(','):
+                    self.i += 1
+                    dims.append(self.expr())
+            self._expect(':')
+        dims.append(self.expr())
+        self._expect('}')
+        return Node('lod', keyword, tuple(dims))
+
+
+# ── analysis ─────────────────────────────────────────────────────────
+class FormulaInfo:
+    """Parse result and the measurements rules and scoring use.
+
+    ``table_calc_refs`` lists ``(field, enclosing table-calc depth)`` for
+    every field reference, so callers can resolve table calcs nested
+    through other calculated fields.
+    """
+
+    __slots__ = ('ast', 'error', 'nodes', 'fields', 'lod_count', 'lod_depth',
+                 'countd_fields', 'row_string_calls', 'branches',
+                 'longest_chain', 'branch_depth', 'table_calcs', 'table_calc_depth',
+                 'table_calc_refs')
+
+    def __init__(self, ast: Node | None, error: str | None = None):
+        self.ast = ast
+        self.error = error
+        self.nodes = 0
+        self.fields: tuple[str, ...] = ()
+        self.lod_count = 0
+        self.lod_depth = 0
+        self.countd_fields: tuple[str, ...] = ()
+        self.row_string_calls = 0
+        self.branches = 0
+        self.longest_chain = 0
+        self.branch_depth = 0
+        self.table_calcs = 0
+        self.table_calc_depth = 0
+        self.table_calc_refs: tuple[tuple[str, int], ...] = ()
+        if ast is not None:
+            self._measure(ast)
+
+    def _measure(self, ast: Node) -> None:
+        fields: dict[str, None] = {}
+        countd: dict[str, None] = {}
+        refs: dict[tuple[str, int], None] = {}
+        # Iterative walk (long '+' chains make very deep left-leaning trees)
+        # carrying (lod depth, aggregate depth, branch depth, table-calc
+        # depth) down from the parents.
+        stack = [(ast, 0, 0, 0, 0)]
+        while stack:
+            node, lod, agg, branch, tc = stack.pop()
+            self.nodes += 1
+            kind = node.kind
+            if kind == 'field':
+                fields[node.value] = None
+                refs[(node.value, tc)] = None
+                continue
+            if kind == 'lod':
+                lod += 1
+                self.lod_count += 1
+                self.lod_depth = max(self.lod_depth, lod)
+            elif kind in ('if', 'case'):
+                branch += 1
+                self.branch_depth = max(self.branch_depth, branch)
+                # IF: cond/result pairs; CASE: subject then WHEN/THEN pairs.
+                arms = (len(node.children) - (kind == 'case')) // 2
+                self.branches += arms
+                self.longest_chain = max(self.longest_chain, arms)
+            elif kind == 'call':
+                name = node.value
+                if name == 'IIF':
+                    branch += 1
+                    self.branch_depth = max(self.branch_depth, branch)
+                    self.branches += 1
+                    self.longest_chain = max(self.longest_chain, 1)
+                elif name in AGGREGATES:
+                    agg += 1
+                    if name == 'COUNTD':
+                        for child in node.children:
+                            for sub in _walk(child):
+                                if sub.kind == 'field':
+                                    countd[sub.value] = None
+                elif name in STRING_FUNCTIONS:
+                    if not (agg or lod or tc):
+                        self.row_string_calls += 1
+                elif is_table_calc(name):
+                    tc += 1
+                    self.table_calcs += 1
+                    self.table_calc_depth = max(self.table_calc_depth, tc)
+            for child in reversed(node.children):
+                stack.append((child, lod, agg, branch, tc))
+        self.fields = tuple(fields)
+        self.countd_fields = tuple(countd)
+        self.table_calc_refs = tuple(refs)
+
+    def cost(self) -> int:
+        """Complexity/cost score: AST size plus weighted expensive
+        constructs (see COST_WEIGHTS)."""
+        w = COST_WEIGHTS
+        return (self.nodes
+                + w['lod'] * self.lod_count
+                + w['nested_lod'] * max(0, self.lod_depth - 1)
+                + w['countd'] * len(self.countd_fields)
+                + w['row_string'] * self.row_string_calls
+                + w['branch'] * self.branches
+                + w['deep_branch'] * max(0, self.branch_depth - 2)
+                + w['table_calc'] * self.table_calcs
+                + w['nested_table_calc'] * max(0, self.table_calc_depth - 1))
+
+
+def _walk(node: Node) -> Iterator[Node]:
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(reversed(node.children))
+
+
+_CACHE: OrderedDict[bytes, FormulaInfo] = OrderedDict()
+
+
+def formula_key(formula: str) -> bytes:
+    return hashlib.blake2b(formula.encode('utf-8'), digest_size=16).digest()
+
+
+def analyze(formula: str) -> FormulaInfo:
+    """Parse and measure *formula*, memoized by its hash (LRU, CACHE_SIZE
+    entries).  Unparseable formulas come back with ``error`` set and no
+    AST rather than raising."""
+    key = formula_key(formula)
+    info = _CACHE.get(key)
+    if info is not None:
+        _CACHE.move_to_end(key)
+        return info
+    try:
+        info = FormulaInfo(_Parser(formula).parse())
+    except (CalcSyntaxError, RecursionError) as e:
+        info = FormulaInfo(None, str(e) or type(e).__name__)
+    _CACHE[key] = info
+    if len(_CACHE) > CACHE_SIZE:
+        _CACHE.popitem(last=False)
+    return info
+
+
+def parse(formula: str) -> Node:
+    """AST of *formula*; raises CalcSyntaxError when it does not parse."""
+    info = analyze(formula)
+    if info.ast is None:
+        raise CalcSyntaxError(info.error)
+    return info.ast
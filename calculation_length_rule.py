@@ -1,6 +1,7 @@
 from __future__ import annotations
 from rule_base import Rule, Finding
-import xml.etree.ElementTree as ET
+from streaming import ElementHandler, StreamHandler
+from workbook_index import WorkbookIndex
 
 class CalculationLengthRule(Rule):
     id = 'GCALC_LEN'
@@ -8,12 +9,21 @@ class CalculationLengthRule(Rule):
     group = 'Readability'
     severity = 'LOW'
 
-    def check(self, tree: ET.ElementTree) ->list[Finding]:
+    def _report(self, calc) ->(Finding | None):
+        formula = calc.get('formula', '')
+        if len(formula) > 600:
+            return Finding(self.id,
+                "Calculated field '{}' formula >600 chars.",
+                'NEEDS_REVIEW', (calc.get('name'),), calc)
+        return None
+
+    def check_index(self, index: WorkbookIndex) ->list[Finding]:
         findings = []
-        for calc in tree.findall('.//calculation'):
-            formula = calc.get('formula', '')
-            if len(formula) > 600:
-                findings.append(Finding(self.id,
-                    f"Calculated field '{calc.get('name')}' formula >600 chars."
-                    , 'NEEDS_REVIEW'))
-        return findings
\ No newline at end of file
+        for calc in index.findall('calculation'):
+            finding = self._report(calc)
+            if finding is not None:
+                findings.append(finding)
+        return findings
+
+    def stream(self) ->StreamHandler:
+        return ElementHandler(('calculation',), self._report)
@@ -0,0 +1,316 @@
+from __future__ import annotations
+import weakref
+import xml.etree.ElementTree as ET
+from rule_base import Rule, Finding, anchor
+from sql_parser import SqlInfo, analyze
+from streaming import StreamHandler
+from workbook_index import WorkbookIndex
+
+# Connection classes that read files rather than query a database.
+FILE_CLASSES = frozenset({'excel-direct', 'textscan', 'hyper', 'dataengine',
+    'ogrdirect', 'csv', 'pdf', 'json', 'statistical-file', 'spatial'})
+_LEAVES = ('table', 'text', 'stored-proc')
+
+
+def _label(elem: ET.Element) -> str:
+    return elem.get('caption') or elem.get('name') or '(unnamed)'
+
+
+def _is_relation(tag: str) -> bool:
+    # Tableau 2020.2+ also writes object-model variants such as
+    # ``_.fcp.ObjectModelEncapsulateLegacy.false...relation``.
+    return tag == 'relation' or tag.endswith('...relation')
+
+
+def _top_relation(conn: ET.Element) -> ET.Element | None:
+    """The physical relation tree of a data source connection: the plain
+    ``relation`` child, else the legacy object-model variant."""
+    found = [c for c in conn if _is_relation(c.tag)]
+    for pick in ('relation', '.false...relation', '...relation'):
+        for rel in found:
+            if rel.tag.endswith(pick):
+                return rel
+    return None
+
+
+class _Join:
+    """One relation tree: its leaf tables, joins, the named connections
+    its leaves read from, and whether any join lacks a condition."""
+
+    __slots__ = ('tables', 'joins', 'connections', 'cartesian')
+
+    def __init__(self):
+        self.tables = 0
+        self.joins = 0
+        self.connections: set[str] = set()
+        self.cartesian = False
+
+
+def _constant(expr: ET.Element) -> bool:
+    return all('[' not in (e.get('op') or '') for e in expr.iter())
+
+
+class _Connection:
+    """What a data source's connection does, summarized from its subtree
+    when it is complete (tree mode, or its end event when streaming)."""
+
+    __slots__ = ('classes', 'join', 'custom_sql', 'initial_sql')
+
+    def __init__(self, conn: ET.Element):
+        self.classes = {c.get('class') for c in conn.iter('connection')
+            } - {None, 'federated'}
+        self.join = _Join()
+        # (relation name, SqlInfo, joined with other relations)
+        self.custom_sql: list[tuple[str, SqlInfo, bool]] = []
+        self.initial_sql = [analyze(c.get('one-time-sql')) for c in conn.
+            iter('connection') if (c.get('one-time-sql') or '').strip()]
+        top = _top_relation(conn)
+        if top is not None:
+            self._walk(top)
+
+    def _walk(self, top: ET.Element) -> None:
+        join = self.join
+        stack = [(top, False)]
+        while stack:
+            rel, joined = stack.pop()
+            kind = rel.get('type')
+            if kind in _LEAVES:
+                join.tables += 1
+                if rel.get('connection'):
+                    join.connections.add(rel.get('connection'))
+                if kind == 'text' and (rel.text or '').strip():
+                    self.custom_sql.append((rel.get('name') or
+                        'Custom SQL Query', analyze(rel.text), joined))
+                continue
+            if kind == 'join':
+                join.joins += 1
+                clauses = [c for c in rel if c.tag == 'clause']
+                if not clauses or all(_constant(c) for c in clauses):
+                    join.cartesian = True
+            for child in reversed(rel):
+                if _is_relation(child.tag):
+                    stack.append((child, joined or kind == 'join'))
+
+
+_SUMMARIES: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def _summary(conn: ET.Element) -> _Connection:
+    """Per-connection summary, shared by the rules of this module (the
+    connection element is the same object for all of them)."""
+    summary = _SUMMARIES.get(conn)
+    if summary is None:
+        summary = _SUMMARIES[conn] = _Connection(conn)
+    return summary
+
+
+class _Extract:
+    __slots__ = ('enabled', 'limited', 'filters')
+
+    def __init__(self, extract: ET.Element):
+        self.enabled = extract.get('enabled') == 'true'
+        self.limited = extract.get('count', '-1') != '-1'
+        self.filters = sum(1 for _ in extract.iter('filter'))
+
+
+class _Collector(StreamHandler):
+    """Summarize each data source's connections and extract at their end
+    events (their subtrees are kept until then) and report the data
+    source when it closes."""
+
+    tags = ('datasource', 'connection', 'extract')
+    keep = ('connection', 'extract')
+
+    def __init__(self, report):
+        self._report = report
+        self._open: list[tuple[ET.Element, list, list]] = []
+        self.findings: list[Finding] = []
+
+    def start(self, elem, ctx):
+        if elem.tag == 'datasource':
+            self._open.append((elem, [], []))
+
+    def end(self, elem, ctx):
+        if elem.tag == 'datasource':
+            ds, conns, extracts = self._open.pop()
+            self.findings.extend(self._report(ds, conns, extracts))
+        elif self._open and ctx.stack and ctx.stack[-1] is self._open[-1][0]:
+            entry = self._open[-1]
+            if elem.tag == 'connection':
+                entry[1].append(_summary(elem))
+            else:
+                entry[2].append(_Extract(elem))
+
+    def finish(self, ctx):
+        return self.findings
+
+
+class _ConnectionRule(Rule):
+    """Shared plumbing for rules over what a data source's connections do.
+
+    The connection and extract children of each ``<datasource>`` are
+    summarized once (relation tree, custom and initial SQL through
+    ``sql_parser.analyze``, memoized by SQL hash) and judged per data
+    source.  Subclasses implement ``_judge``.  Findings sit on the data
+    source; those about one custom SQL relation are keyed by its name, so
+    each keeps its own fingerprint.
+    """
+
+    group = 'Connectivity'
+    scope = 'datasource'
+
+    def _judge(self, ds: ET.Element, conns: list[_Connection], extracts:
+        list[_Extract]) ->list[Finding]:
+        raise NotImplementedError()
+
+    def _report(self, ds, conns, extracts) ->list[Finding]:
+        if not conns:
+            return []
+        return anchor(self._judge(ds, conns, extracts), ds)
+
+    def check_object(self, ds, index: WorkbookIndex) ->list[Finding]:
+        parent = index.parent
+        conns = [_summary(c) for c in index.connections_of(ds) if parent[c
+            ] is ds]
+        extracts = [_Extract(e) for e in index.within(ds, 'extract') if
+            parent[e] is ds]
+        return self._report(ds, conns, extracts)
+
+    def stream(self) ->StreamHandler:
+        return _Collector(self._report)
+
+
+class CartesianJoinRule(_ConnectionRule):
+    id = 'GCONN_CARTESIAN'
+    description = 'Joins without a join condition (Cartesian products).'
+    severity = 'HIGH'
+
+    def _judge(self, ds, conns, extracts):
+        findings = []
+        for conn in conns:
+            if conn.join.cartesian:
+                findings.append(Finding(self.id,
+                    "Data source '{}' has a join without a join condition.",
+                    'TAKE_ACTION', (_label(ds),)))
+            for name, info, _ in conn.custom_sql:
+                if info.cartesian:
+                    findings.append(Finding(self.id,
+                        "Custom SQL '{}' in data source '{}' has a Cartesian join (CROSS JOIN, JOIN without ON, or comma-joined tables without WHERE)."
+                        , 'TAKE_ACTION', (name, _label(ds)), key=name))
+        return findings
+
+
+class ManyJoinsRule(_ConnectionRule):
+    id = 'GCONN_MANY_JOINS'
+    description = 'Relation trees or custom SQL joining many tables.'
+    severity = 'MEDIUM'
+    max_tables = 8
+
+    def _judge(self, ds, conns, extracts):
+        findings = []
+        for conn in conns:
+            if conn.join.joins and conn.join.tables > self.max_tables:
+                findings.append(Finding(self.id,
+                    "Data source '{}' joins {} tables.", 'NEEDS_REVIEW', (
+                    _label(ds), conn.join.tables)))
+            for name, info, _ in conn.custom_sql:
+                if info.joins and info.tables > self.max_tables:
+                    findings.append(Finding(self.id,
+                        "Custom SQL '{}' in data source '{}' joins {} tables."
+                        , 'NEEDS_REVIEW', (name, _label(ds), info.tables),
+                        key=name))
+        return findings
+
+
+class SelectStarRule(_ConnectionRule):
+    id = 'GCONN_SELECT_STAR'
+    description = 'Custom SQL selecting every column with SELECT *.'
+    severity = 'MEDIUM'
+
+    def _judge(self, ds, conns, extracts):
+        return [Finding(self.id,
+            "Custom SQL '{}' in data source '{}' uses SELECT *.",
+            'TAKE_ACTION', (name, _label(ds)), key=name) for conn in conns
+            for name, info, _ in conn.custom_sql if info.select_star]
+
+
+class WrappedCustomSqlRule(_ConnectionRule):
+    id = 'GCONN_SQL_WRAPPED'
+    description = (
+        'Custom SQL that performs badly inside the subqueries Tableau wraps it in.'
+        )
+    severity = 'MEDIUM'
+
+    def _judge(self, ds, conns, extracts):
+        findings = []
+        for conn in conns:
+            for name, info, joined in conn.custom_sql:
+                why = []
+                if joined:
+                    why.append('is joined with other tables, so it cannot be culled from queries')
+                if info.order_by:
+                    why.append('sorts (ORDER BY) inside every query')
+                if info.cte:
+                    why.append('starts with WITH, which many databases reject in a subquery')
+                if info.statements > 1:
+                    why.append(f'has {info.statements} statements')
+                if why:
+                    findings.append(Finding(self.id,
+                        "Custom SQL '{}' in data source '{}' is wrapped as a subquery and {}."
+                        , 'NEEDS_REVIEW', (name, _label(ds), '; '.join(why)),
+                        key=name))
+        return findings
+
+
+class InitialSqlRule(_ConnectionRule):
+    id = 'GCONN_INITIAL_SQL'
+    description = 'Initial SQL that does more than configure the session.'
+    severity = 'LOW'
+
+    def _judge(self, ds, conns, extracts):
+        findings = []
+        for conn in conns:
+            for info in conn.initial_sql:
+                if not info.session_only:
+                    verbs = ', '.join(dict.fromkeys(info.verbs))
+                    findings.append(Finding(self.id,
+                        "Data source '{}' runs initial SQL ({}) on every connection."
+                        , 'NEEDS_REVIEW', (_label(ds), verbs)))
+        return findings
+
+
+class ExtractFilterRule(_ConnectionRule):
+    id = 'GCONN_EXTRACT_FILTER'
+    description = 'Database extracts without extract filters or a row limit.'
+    severity = 'LOW'
+
+    def _judge(self, ds, conns, extracts):
+        classes = set().union(*(c.classes for c in conns))
+        if not classes or classes <= FILE_CLASSES:
+            return []
+        for ext in extracts:
+            if ext.enabled and not ext.limited and not ext.filters:
+                return [Finding(self.id,
+                    "Extract of data source '{}' has no extract filters or row limit."
+                    , 'NEEDS_REVIEW', (_label(ds),))]
+        return []
+
+
+class FederatedFanOutRule(_ConnectionRule):
+    id = 'GCONN_FEDERATED'
+    description = 'Cross-database joins fanning out over many tables.'
+    severity = 'MEDIUM'
+    max_tables = 5
+    max_connections = 2
+
+    def _judge(self, ds, conns, extracts):
+        findings = []
+        for conn in conns:
+            join = conn.join
+            sources = len(join.connections)
+            if join.joins and sources > 1 and (join.tables > self.
+                max_tables or sources > self.max_connections):
+                findings.append(Finding(self.id,
+                    "Data source '{}' joins {} tables across {} connections.",
+                    'NEEDS_REVIEW', (_label(ds), join.tables, sources)))
+        return findings
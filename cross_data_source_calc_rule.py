@@ -1,15 +1,29 @@
 from __future__ import annotations
 from rule_base import Rule, Finding
-import xml.etree.ElementTree as ET
+from streaming import StreamHandler, TagCountHandler
+from workbook_index import WorkbookIndex
 
 class CrossDataSourceCalcRule(Rule):
     id = 'GCROSS_DS'
     description = 'Detect calculations that span data sources.'
     group = 'Performance'
     severity = 'HIGH'
+    cost = 2
+    short_circuit = True
 
-    def check(self, tree: ET.ElementTree) ->list[Finding]:
-        cross = tree.findall('.//calculation[@is-cross-data-source="true"]')
+    @staticmethod
+    def _is_cross(calc) ->bool:
+        return calc.get('is-cross-data-source') == 'true'
+
+    def _report(self, cross: int) ->list[Finding]:
         return [Finding(self.id,
             'Workbook contains cross‑data‑source calculations.',
-            'NEEDS_REVIEW')] if cross else []
\ No newline at end of file
+            'NEEDS_REVIEW')] if cross else []
+
+    def check_index(self, index: WorkbookIndex) ->list[Finding]:
+        cross = any(self._is_cross(c) for c in index.findall('calculation'))
+        return self._report(cross)
+
+    def stream(self) ->StreamHandler:
+        return TagCountHandler('calculation', self._report, self._is_cross,
+            limit=1)
@@ -0,0 +1,403 @@
+# daemon.py
+
+from __future__ import annotations
+import argparse
+import hashlib
+import http.client
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Iterable
+
+from rule_base import Finding, Rule
+from streaming import StreamHandler
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DISCOVERY_FILE = 'daemon.json'
+UPLOAD_SUFFIXES = ('.twb', '.twbx', '.tds', '.tdsx')
+DEFAULT_MAX_UPLOAD_MB = 512
+# Prune the result cache after this many analyses (the CLI prunes per run).
+PRUNE_EVERY = 256
+
+
+def rule_meta(rules: Iterable[Rule]) -> list[dict]:
+    return [{'id': r.id, 'severity': r.severity, 'group': r.group,
+             'description': r.description, 'streams': r.stream() is not None}
+            for r in rules]
+
+
+class RemoteRule(Rule):
+    """Client-side stand-in for a rule the daemon runs: carries what
+    scoring and reports need without importing the rule module."""
+
+    def __init__(self, meta: dict):
+        self.id = meta['id']
+        self.severity = meta['severity']
+        self.group = meta['group']
+        self.description = meta['description']
+        self._streams = meta['streams']
+
+    def stream(self) -> StreamHandler | None:
+        # Never driven; only tells --stream which rules the daemon skips.
+        return StreamHandler() if self._streams else None
+
+
+class Busy(Exception):
+    """The daemon's request queue is full."""
+
+
+class WorkQueue:
+    """Bounded front of a process pool.
+
+    At most ``jobs`` analyses run and ``depth`` more wait; ``run``
+    raises Busy beyond that instead of queueing without limit, so callers
+    get backpressure (HTTP 503) rather than unbounded latency.  A pool
+    broken by a crashed worker is replaced for the next request.
+    """
+
+    def __init__(self, make_pool: Callable[[], ProcessPoolExecutor],
+                 jobs: int, depth: int):
+        self._make_pool = make_pool
+        self._pool = make_pool()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(jobs + depth)
+        self.jobs = jobs
+        self.capacity = jobs + depth
+        self.active = 0
+        self.done = 0
+
+    def warm(self, fn: Callable) -> None:
+        """Start every worker now (rule import happens in the initializer)."""
+        for fut in [self._pool.submit(fn) for _ in range(self.jobs)]:
+            fut.result()
+
+    def run(self, fn: Callable, *args):
+        """``fn(*args)`` on the pool; raises Busy when the queue is full."""
+        if not self._slots.acquire(blocking=False):
+            raise Busy()
+        with self._lock:
+            self.active += 1
+            pool = self._pool
+        try:
+            try:
+                fut = pool.submit(fn, *args)
+            except BrokenProcessPool:
+                pool = self._replace(pool)
+                fut = pool.submit(fn, *args)
+            try:
+                return fut.result()
+            except BrokenProcessPool:
+                self._replace(pool)
+                raise
+        finally:
+            with self._lock:
+                self.active -= 1
+                self.done += 1
+            self._slots.release()
+
+    def _replace(self, broken: ProcessPoolExecutor) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is broken:
+                self._pool = self._make_pool()
+                broken.shutdown(wait=False, cancel_futures=True)
+            return self._pool
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+
+class AnalysisService:
+    """What the HTTP handler talks to: the warm pool, the loaded rule set
+    and the per-request options on top of the ``serve`` arguments."""
+
+    def __init__(self, queue: WorkQueue, task: Callable, args:
+                 argparse.Namespace, rules: list[Rule],
+                 selection: dict, spool: Path,
+                 on_analyzed: Callable[[int], None] | None = None):
+        self.queue = queue
+        self.task = task
+        self.args = args
+        self.rules = rule_meta(rules)
+        self.severity_of = {r.id: r.severity for r in rules}
+        self.selection = selection
+        self.spool = spool
+        self.on_analyzed = on_analyzed
+        self._upload_locks: dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def health(self) -> dict:
+        return {'status': 'ok', 'pid': os.getpid(), 'jobs': self.queue.jobs,
+                'capacity': self.queue.capacity, 'active': self.queue.active,
+                'analyzed': self.queue.done, 'selection': self.selection,
+                'rules': self.rules}
+
+    def _options(self, stream, no_cache) -> argparse.Namespace:
+        opts = argparse.Namespace(**vars(self.args))
+        if stream is not None:
+            opts.stream = bool(stream)
+        if no_cache is not None:
+            opts.no_cache = bool(no_cache)
+        return opts
+
+    def analyze(self, path: Path, stream=None, no_cache=None,
+                name: str | None = None) -> dict:
+        res = self.queue.run(self.task, path, self._options(stream, no_cache))
+        if self.on_analyzed is not None:
+            self.on_analyzed(self.queue.done)
+        if 'error' in res:
+            raise ValueError(res['error'])
+        severity_of = self.severity_of
+        return {'workbook': name or path.name, 'path': str(path),
+                'health_score': res['score'], 'cached': res['cached'],
+                'findings': [{'rule': rule, 'severity': severity_of[rule],
+                              'category': category, 'message': message}
+                             for rule, category, message in res['rows']]}
+
+    def analyze_upload(self, name: str, body: bytes, stream=None,
+                       no_cache=None) -> dict:
+        """Analyze uploaded workbook bytes.  Uploads of the same name share
+        one spool path (taking turns), so incremental state carries over
+        between successive versions of a workbook."""
+        key = hashlib.sha256(name.encode()).hexdigest()[:16]
+        with self._locks_guard:
+            lock = self._upload_locks.setdefault(key, threading.Lock())
+        with lock:
+            directory = self.spool / key
+            directory.mkdir(parents=True, exist_ok=True)
+            path = directory / name
+            path.write_bytes(body)
+            try:
+                return self.analyze(path, stream, no_cache, name)
+            finally:
+                path.unlink(missing_ok=True)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = 'tabsca'
+    protocol_version = 'HTTP/1.1'
+
+    def address_string(self) -> str:
+        # Unix-socket peers have no address.
+        return self.client_address[0] if self.client_address else 'local'
+
+    def log_message(self, format, *args) -> None:
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, status: int, payload: dict, headers: dict | None = None
+              ) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        if urllib.parse.urlsplit(self.path).path == '/health':
+            self._send(200, self.server.service.health())
+        else:
+            self._send(404, {'error': 'not found'})
+
+    def do_POST(self) -> None:
+        url = urllib.parse.urlsplit(self.path)
+        if url.path != '/analyze':
+            self._send(404, {'error': 'not found'})
+            return
+        service = self.server.service
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > self.server.max_upload:
+            self.close_connection = True
+            self._send(413, {'error': 'upload too large'})
+            return
+        body = self.rfile.read(length)
+        try:
+            if self.headers.get_content_type() == 'application/json':
+                req = json.loads(body or b'{}')
+                if not isinstance(req.get('path'), str):
+                    raise TypeError('expected {"path": ...}')
+                path = Path(req['path'])
+                if not path.is_file():
+                    self._send(404, {'error': f'no such file: {path}'})
+                    return
+                result = service.analyze(path, req.get('stream'),
+                                         req.get('no_cache'))
+            else:
+                query = dict(urllib.parse.parse_qsl(url.query))
+                name = Path(query.get('name', '')).name
+                if not name.lower().endswith(UPLOAD_SUFFIXES):
+                    raise TypeError('name must end in ' +
+                                    '/'.join(UPLOAD_SUFFIXES))
+                flags = {k: query[k] in ('1', 'true') for k in
+                         ('stream', 'no_cache') if k in query}
+                result = service.analyze_upload(name, body, **flags)
+        except Busy:
+            self._send(503, {'error': 'busy'}, {'Retry-After': '1'})
+        except BrokenProcessPool:
+            self._send(500, {'error': 'worker process crashed while '
+                             'analyzing this workbook'})
+        except (TypeError, ValueError) as e:
+            status = 422 if isinstance(e, ValueError) and \
+                not isinstance(e, json.JSONDecodeError) else 400
+            self._send(status, {'error': str(e)})
+        else:
+            self._send(200, result)
+
+
+class _Server:
+    daemon_threads = True
+    block_on_close = False
+    verbose = False
+    max_upload = DEFAULT_MAX_UPLOAD_MB << 20
+    service: AnalysisService
+
+
+class TCPServer(_Server, ThreadingHTTPServer):
+    pass
+
+
+class UnixServer(_Server, socketserver.ThreadingMixIn,
+                 socketserver.UnixStreamServer):
+    def server_bind(self) -> None:
+        Path(self.server_address).unlink(missing_ok=True)
+        super().server_bind()
+        os.chmod(self.server_address, 0o600)
+
+
+def make_server(service: AnalysisService, host: str = DEFAULT_HOST,
+                port: int = DEFAULT_PORT, unix_socket: Path | None = None
+                ) -> TCPServer | UnixServer:
+    if unix_socket is not None:
+        server = UnixServer(str(unix_socket), _Handler)
+    else:
+        server = TCPServer((host, port), _Handler)
+    server.service = service
+    return server
+
+
+def address_of(server: TCPServer | UnixServer) -> str:
+    if isinstance(server, UnixServer):
+        return 'unix:' + str(Path(server.server_address).resolve())
+    host, port = server.server_address[:2]
+    return f'http://{host}:{port}'
+
+
+# ── discovery ───────────────────────────────────────────────────────
+def write_discovery(cache_dir: Path, address: str) -> Path:
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    path = cache_dir / DISCOVERY_FILE
+    tmp = path.with_suffix('.tmp')
+    tmp.write_text(json.dumps({'address': address, 'pid': os.getpid()}))
+    os.replace(tmp, path)
+    return path
+
+
+def remove_discovery(cache_dir: Path) -> None:
+    path = cache_dir / DISCOVERY_FILE
+    try:
+        if json.loads(path.read_text()).get('pid') == os.getpid():
+            path.unlink()
+    except (OSError, ValueError):
+        pass
+
+
+# ── client ──────────────────────────────────────────────────────────
+class _UnixConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float):
+        super().__init__('localhost', timeout=timeout)
+        self._socket_path = path
+
+    def connect(self) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self._socket_path)
+
+
+class DaemonClient:
+    """Talks to a running ``main.py serve`` (``http://host:port`` or
+    ``unix:/path``).  One connection per request keeps it thread-safe."""
+
+    def __init__(self, address: str, timeout: float = 600.0):
+        self.address = address
+        self.timeout = timeout
+        self.jobs = 1
+        self.rules: list[Rule] = []
+
+    def _connect(self, timeout: float) -> http.client.HTTPConnection:
+        if self.address.startswith('unix:'):
+            return _UnixConnection(self.address[5:], timeout)
+        url = urllib.parse.urlsplit(self.address)
+        return http.client.HTTPConnection(url.hostname, url.port,
+                                          timeout=timeout)
+
+    def _request(self, method: str, url: str, body: bytes | None = None,
+                 headers: dict | None = None, timeout: float | None = None
+                 ) -> tuple[int, dict]:
+        conn = self._connect(self.timeout if timeout is None else timeout)
+        try:
+            conn.request(method, url, body, headers or {})
+            resp = conn.getresponse()
+            return resp.status, json.loads(resp.read() or b'{}')
+        finally:
+            conn.close()
+
+    def health(self, timeout: float = 0.5) -> dict | None:
+        try:
+            status, payload = self._request('GET', '/health', timeout=timeout)
+        except (OSError, ValueError, http.client.HTTPException):
+            return None
+        return payload if status == 200 else None
+
+    def analyze(self, path: Path, stream: bool = False,
+                no_cache: bool = False, retries: int = 30) -> dict:
+        """JSON findings for a workbook the daemon can read; waits out
+        ``busy`` replies.  Raises ValueError with the daemon's message."""
+        body = json.dumps({'path': str(Path(path).resolve()),
+                           'stream': stream, 'no_cache': no_cache}).encode()
+        for attempt in range(retries + 1):
+            status, payload = self._request(
+                'POST', '/analyze', body,
+                {'Content-Type': 'application/json'})
+            if status != 503 or attempt == retries:
+                break
+            time.sleep(min(0.05 * 2 ** attempt, 1.0))
+        if status != 200:
+            raise ValueError(payload.get('error', f'daemon error {status}'))
+        return payload
+
+
+def findings_of(payload: dict) -> list[Finding]:
+    return [Finding(f['rule'], f['message'], f['category'])
+            for f in payload['findings']]
+
+
+def connect(address: str, selection: dict) -> DaemonClient | None:
+    """A client for the daemon at *address* if it is up and runs the same
+    rule selection as the caller would; its rules are in ``client.rules``."""
+    client = DaemonClient(address)
+    health = client.health()
+    if health is None or health.get('selection') != selection:
+        return None
+    client.jobs = health['jobs']
+    client.rules = [RemoteRule(meta) for meta in health['rules']]
+    return client
+
+
+def discover(cache_dir: Path, selection: dict) -> DaemonClient | None:
+    """``connect`` to the daemon advertised in *cache_dir*, if any."""
+    try:
+        info = json.loads((cache_dir / DISCOVERY_FILE).read_text())
+    except (OSError, ValueError):
+        return None
+    return connect(info.get('address', ''), selection)
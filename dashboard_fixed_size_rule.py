@@ -1,18 +1,25 @@
 from __future__ import annotations
 from rule_base import Rule, Finding
-import xml.etree.ElementTree as ET
+from streaming import ElementHandler, StreamHandler
+from workbook_index import WorkbookIndex
 
 class DashboardFixedSizeRule(Rule):
     id = 'GDASH_FIXED'
     description = 'Dashboards should have fixed sizing.'
     group = 'Design Consistency'
     severity = 'LOW'
+    scope = 'dashboard'
 
-    def check(self, tree: ET.ElementTree) ->list[Finding]:
-        findings = []
-        for dash in tree.findall('.//dashboard'):
-            if dash.get('automatic-size', 'true') == 'true':
-                findings.append(Finding(self.id,
-                    f"Dashboard '{dash.get('name')}' is not fixed size.",
-                    'NEEDS_REVIEW'))
-        return findings
\ No newline at end of file
+    def _report(self, dash) ->(Finding | None):
+        if dash.get('automatic-size', 'true') == 'true':
+            return Finding(self.id,
+                "Dashboard '{}' is not fixed size.", 'NEEDS_REVIEW',
+                (dash.get('name'),), dash)
+        return None
+
+    def check_object(self, dash, index: WorkbookIndex) ->list[Finding]:
+        finding = self._report(dash)
+        return [finding] if finding is not None else []
+
+    def stream(self) ->StreamHandler:
+        return ElementHandler(('dashboard',), self._report)
@@ -0,0 +1,192 @@
+from __future__ import annotations
+import xml.etree.ElementTree as ET
+from rule_base import Rule, Finding
+from streaming import StreamHandler
+from workbook_index import WorkbookIndex
+
+PARAMETERS = 'Parameters'
+_EXTRACT_CLASSES = ('hyper', 'dataengine')
+
+
+class _LoadModel:
+    """Facts gathered in one pass (tree or stream) and joined at the end:
+    per data source whether it is live, per worksheet its data sources and
+    filter count, per dashboard its element, view names, quick-filter zones
+    and the actions it is the source of.  Every lookup is a dict access, so the
+    join is linear in the number of zones."""
+
+    def __init__(self):
+        self.live: dict[str, bool] = {}
+        self.sources: dict[str, set[str]] = {}
+        self.filters: dict[str, int] = {}
+        self.dashboards: dict[str, tuple[dict[str, None], set]] = {}
+        self.elements: dict[str, ET.Element] = {}
+        self.actions: dict[str, int] = {}
+
+    def datasource(self, name: str | None) ->None:
+        if name and name != PARAMETERS:
+            self.live.setdefault(name, True)
+
+    def extract(self, name: str | None) ->None:
+        if name in self.live:
+            self.live[name] = False
+
+    def worksheet(self, name: str) ->None:
+        self.sources.setdefault(name, set())
+        self.filters.setdefault(name, 0)
+
+    def uses(self, sheet: str, datasource: str | None) ->None:
+        if datasource and datasource != PARAMETERS:
+            self.sources[sheet].add(datasource)
+
+    def dashboard(self, name: str, elem: ET.Element) ->None:
+        self.dashboards.setdefault(name, ({}, set()))
+        self.elements.setdefault(name, elem)
+
+    def zone(self, dash: str, zone) ->None:
+        views, quick_filters = self.dashboards[dash]
+        kind = zone.get('type-v2') or zone.get('type')
+        if kind == 'filter':
+            quick_filters.add((zone.get('name'), zone.get('param')))
+        elif kind is None and zone.get('name'):
+            views[zone.get('name')] = None
+
+    def action(self, source) ->None:
+        dash = source.get('dashboard')
+        if dash:
+            self.actions[dash] = self.actions.get(dash, 0) + 1
+
+
+class DashboardLoadCostRule(Rule):
+    """Estimate what opening a dashboard costs from its views, their
+    filters and data sources, quick filters and actions together.
+
+    Each view issues one query per data source it uses (blends query every
+    source), made dearer by its filters (``filter_weight`` each) and by
+    live sources (``live_factor``); each quick filter adds a domain query
+    and each action sourced from the dashboard a re-query of its targets.
+    """
+    id = 'GDASH_LOAD'
+    description = (
+        'Dashboards whose views, filters, data sources and actions add up to a high estimated load cost.'
+        )
+    group = 'Performance'
+    severity = 'MEDIUM'
+    cost = 20
+    threshold = 50
+    filter_weight = 0.25
+    live_factor = 2
+    breakdown = 5
+
+    def _view_cost(self, model: _LoadModel, sheet: str) ->float:
+        sources = model.sources[sheet]
+        live = any(model.live.get(ds, False) for ds in sources)
+        return max(1, len(sources)) * (1 + self.filter_weight * model.
+            filters[sheet]) * (self.live_factor if live else 1)
+
+    def _report(self, model: _LoadModel) ->list[Finding]:
+        findings: list[Finding] = []
+        for dash, (views, quick_filters) in model.dashboards.items():
+            sheets = [v for v in views if v in model.sources]
+            costs = {s: self._view_cost(model, s) for s in sheets}
+            queries = sum(max(1, len(model.sources[s])) for s in sheets)
+            actions = model.actions.get(dash, 0)
+            total = sum(costs.values()) + len(quick_filters) + actions
+            if total <= self.threshold:
+                continue
+            sources = set().union(*(model.sources[s] for s in sheets))
+            live = sum(1 for ds in sources if model.live.get(ds, False))
+            heaviest = sorted(costs.items(), key=lambda kv: -kv[1])[:self.
+                breakdown]
+            findings.append(Finding(self.id,
+                "Dashboard '{}' has an estimated load cost of {:.0f} ({} views, {} queries, {} filters, {} quick filters, {} data sources of which {} live, {} actions); heaviest views: {}."
+                , 'NEEDS_REVIEW', (dash, total, len(sheets), queries, sum(
+                model.filters[s] for s in sheets), len(quick_filters), len(
+                sources), live, actions, ', '.join(f'{s} ({c:.1f})' for s,
+                c in heaviest)), model.elements[dash]))
+        return findings
+
+    def check_index(self, index: WorkbookIndex) ->list[Finding]:
+        model = _LoadModel()
+        for ds in index.findall('datasource'):
+            if index.nearest(ds, 'worksheet') is None and index.nearest(ds,
+                'dashboard') is None:
+                model.datasource(ds.get('name'))
+                for conn in index.within(ds, 'connection'):
+                    if conn.get('class') in _EXTRACT_CLASSES:
+                        model.extract(ds.get('name'))
+                for ext in index.within(ds, 'extract'):
+                    if ext.get('enabled') == 'true':
+                        model.extract(ds.get('name'))
+        for ws in index.findall('worksheet'):
+            name = ws.get('name', '')
+            model.worksheet(name)
+            model.filters[name] = len(index.filters_of(ws))
+            for ds in index.within(ws, 'datasource'):
+                model.uses(name, ds.get('name'))
+            for dep in index.within(ws, 'datasource-dependencies'):
+                model.uses(name, dep.get('datasource'))
+        for dash in index.findall('dashboard'):
+            if dash.get('type') == 'storyboard':
+                continue
+            name = dash.get('name', '')
+            model.dashboard(name, dash)
+            for zone in index.within(dash, 'zone'):
+                model.zone(name, zone)
+            for view in index.views_of(dash):
+                model.zone(name, view)
+        for source in index.findall('source'):
+            if index.nearest(source, 'action') is not None:
+                model.action(source)
+        return self._report(model)
+
+    def stream(self) ->StreamHandler:
+        return _LoadHandler(self)
+
+
+class _LoadHandler(StreamHandler):
+    """Feed the same ``_LoadModel`` from start events; the join runs in
+    ``finish``, so element order in the document does not matter."""
+    tags = ('datasource', 'connection', 'extract', 'worksheet', 'filter',
+        'datasource-dependencies', 'dashboard', 'zone', 'view', 'source')
+
+    def __init__(self, rule: DashboardLoadCostRule):
+        self._rule = rule
+        self._model = _LoadModel()
+        self._dashboard: str | None = None
+
+    def start(self, elem, ctx):
+        model = self._model
+        tag = elem.tag
+        sheet = ctx.nearest('worksheet')
+        if tag == 'worksheet':
+            model.worksheet(elem.get('name', ''))
+        elif tag == 'dashboard':
+            self._dashboard = None
+            if elem.get('type') != 'storyboard':
+                self._dashboard = elem.get('name', '')
+                model.dashboard(self._dashboard, elem)
+        elif sheet is not None:
+            name = sheet.get('name', '')
+            if tag == 'filter':
+                model.filters[name] += 1
+            elif tag == 'datasource':
+                model.uses(name, elem.get('name'))
+            elif tag == 'datasource-dependencies':
+                model.uses(name, elem.get('datasource'))
+        elif ctx.inside('dashboard'):
+            if tag in ('zone', 'view') and self._dashboard is not None:
+                model.zone(self._dashboard, elem)
+        elif tag == 'datasource':
+            model.datasource(elem.get('name'))
+        elif tag == 'source':
+            if ctx.inside('action'):
+                model.action(elem)
+        else:
+            ds = ctx.nearest('datasource')
+            if ds is not None and (elem.get('class') in _EXTRACT_CLASSES
+                if tag == 'connection' else elem.get('enabled') == 'true'):
+                model.extract(ds.get('name'))
+
+    def finish(self, ctx):
+        return self._rule._report(self._model)
@@ -1,15 +1,25 @@
 from __future__ import annotations
 from rule_base import Rule, Finding
-import xml.etree.ElementTree as ET
+from streaming import StreamHandler, TagCountHandler
+from workbook_index import WorkbookIndex
 
 class DataSourceCountRule(Rule):
     id = 'GDATA_SRC_COUNT'
     description = 'Warn when workbook contains a high number of data sources.'
     group = 'Design Complexity'
     severity = 'MEDIUM'
+    cost = 1
+    short_circuit = True
+    threshold = 25
 
-    def check(self, tree: ET.ElementTree) ->list[Finding]:
-        sources = tree.findall('.//datasource')
+    def _report(self, sources: int) ->list[Finding]:
         return [Finding(self.id,
-            f'Workbook has {len(sources)} data sources.', 'NEEDS_REVIEW')
-            ] if len(sources) > 25 else []
\ No newline at end of file
+            f'Workbook has {sources} data sources.', 'NEEDS_REVIEW')
+            ] if sources > self.threshold else []
+
+    def check_index(self, index: WorkbookIndex) ->list[Finding]:
+        return self._report(index.count('datasource'))
+
+    def stream(self) ->StreamHandler:
+        return TagCountHandler('datasource', self._report,
+            limit=self.threshold + 1)
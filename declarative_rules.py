@@ -0,0 +1,419 @@
+# declarative_rules.py
+
+from __future__ import annotations
+import hashlib
+import json
+import re
+import string
+import weakref
+import xml.etree.ElementTree as ET
+from collections import defaultdict
+from pathlib import Path
+from typing import Callable, Iterable
+
+from rule_base import Finding, Rule
+from scoring import DEFAULT_WEIGHTS
+from streaming import StreamContext, StreamHandler
+from workbook_index import WorkbookIndex
+
+SCOPES = ('worksheet', 'dashboard', 'datasource', 'workbook')
+CATEGORIES = ('NEEDS_REVIEW', 'TAKE_ACTION')
+DEFAULT_GROUP = 'Custom'
+# Values a message template can name: per finding (passed as Finding args)
+# and per rule (substituted once, when the rule is compiled).
+_ARGS = {'scope': 0, 'count': 1}
+_KEYS = {'id', 'tag', 'scope', 'where', 'min', 'max', 'severity', 'group',
+         'category', 'description', 'message'}
+_CONVERSIONS = {'r': repr, 's': str, 'a': ascii}
+
+Test = Callable[[ET.Element], bool]
+
+
+def read_declarative_config(config_path: Path | None) -> list[dict]:
+    """Return the ``rules`` list of a config file (empty when absent)::
+
+        {"rules": [{"id": "CUSTOM_FILTERS", "tag": "filter",
+                    "scope": "worksheet", "where": {"class": "categorical"},
+                    "max": 8, "severity": "LOW"}]}
+    """
+    if config_path is None or not config_path.exists():
+        return []
+    specs = json.loads(config_path.read_text()).get('rules', [])
+    if not isinstance(specs, list):
+        raise ValueError(f'{config_path}: "rules" must be a list')
+    return specs
+
+
+def _number(text: str | None) -> float | None:
+    try:
+        return float(text)
+    except (TypeError, ValueError):
+        return None
+
+
+def _attribute_test(attr: str, op: str, value) -> Test:
+    get = ET.Element.get
+    if op == 'exists':
+        if not isinstance(value, bool):
+            raise ValueError('"exists" takes true or false')
+        return lambda e: (get(e, attr) is not None) is value
+    if op in ('eq', 'ne'):
+        value = str(value)
+        if op == 'eq':
+            return lambda e: get(e, attr) == value
+        return lambda e: get(e, attr) != value
+    if op in ('in', 'not_in'):
+        if not isinstance(value, list):
+            raise ValueError(f'"{op}" takes a list')
+        values = frozenset(map(str, value))
+        if op == 'in':
+            return lambda e: get(e, attr) in values
+        return lambda e: get(e, attr) not in values
+    if op == 'contains':
+        value = str(value)
+        return lambda e: value in (get(e, attr) or '')
+    if op == 'matches':
+        search = re.compile(value).search
+        return lambda e: search(get(e, attr) or '') is not None
+    if op in ('gt', 'ge', 'lt', 'le'):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f'"{op}" takes a number')
+        compare = {'gt': float.__gt__, 'ge': float.__ge__,
+                   'lt': float.__lt__, 'le': float.__le__}[op]
+
+        def test(e: ET.Element) -> bool:
+            n = _number(get(e, attr))
+            return n is not None and compare(n, value)
+        return test
+    raise ValueError(f'unknown operator "{op}"')
+
+
+def compile_where(where: dict) -> Test | None:
+    """One test for a ``where`` clause: every attribute predicate must hold.
+    ``"attr": "text"`` is equality, ``"attr": true``/``false`` presence or
+    absence, and ``"attr": {"op": value, ...}`` applies each operator
+    (eq, ne, in, not_in, contains, matches, exists, gt, ge, lt, le; the
+    comparisons read the attribute as a number)."""
+    tests: list[Test] = []
+    for attr, cond in where.items():
+        if isinstance(cond, bool):
+            tests.append(_attribute_test(attr, 'exists', cond))
+        elif isinstance(cond, str):
+            tests.append(_attribute_test(attr, 'eq', cond))
+        elif isinstance(cond, dict) and cond:
+            tests.extend(_attribute_test(attr, op, value)
+                         for op, value in cond.items())
+        else:
+            raise ValueError(f'bad predicate for attribute "{attr}"')
+    if not tests:
+        return None
+    if len(tests) == 1:
+        return tests[0]
+    return lambda e: all(t(e) for t in tests)
+
+
+def _escape(text: str) -> str:
+    return text.replace('{', '{{').replace('}', '}}')
+
+
+def compile_template(template: str, constants: dict) -> str:
+    """Turn a message with named placeholders into a positional Finding
+    template: ``{scope}`` and ``{count}`` become arguments, the rule's own
+    values (``{id}``, ``{tag}``, ``{min}``, ``{max}``) are filled in now."""
+    out = []
+    for literal, field, spec, conversion in string.Formatter().parse(
+            template):
+        out.append(_escape(literal))
+        if field is None:
+            continue
+        if field in _ARGS:
+            conv = f'!{conversion}' if conversion else ''
+            fmt = f':{spec}' if spec else ''
+            out.append(f'{{{_ARGS[field]}{conv}{fmt}}}')
+        elif field in constants:
+            value = constants[field]
+            if conversion:
+                value = _CONVERSIONS[conversion](value)
+            out.append(_escape(format(value, spec)))
+        else:
+            raise ValueError(f'unknown placeholder "{{{field}}}"')
+    return ''.join(out)
+
+
+def _default_message(scope: str, tag: str) -> str:
+    if scope == tag:
+        return f"{scope.capitalize()} '{{scope}}' matches {{id}}."
+    if scope == 'workbook':
+        return f'Workbook has {{count}} matching <{tag}> elements.'
+    return f"{scope.capitalize()} '{{scope}}' has {{count}} matching " \
+           f'<{tag}> elements.'
+
+
+def _default_description(scope: str, tag: str, low: int | None,
+                         high: int | None) -> str:
+    if scope == tag and high == 0 and low is None:
+        return f'{scope.capitalize()}s matching the rule conditions.'
+    parts = []
+    if high is not None:
+        parts.append(f'more than {high}' if high else 'any')
+    if low is not None:
+        parts.append(f'fewer than {low}')
+    return f"{' or '.join(parts).capitalize()} matching <{tag}> elements " \
+           f'per {scope}.'
+
+
+class DeclarativeRule(Rule):
+    """A rule defined in the ``rules`` section of tableau_optimizer.json.
+
+    It counts the ``tag`` elements that satisfy ``where`` in each ``scope``
+    element (or in the whole workbook) and reports every scope whose count
+    is above ``max`` or below ``min``.  A ``tag`` equal to the scope counts
+    the scope element itself, so per-object checks need no threshold.  The
+    counting is done by the ``FusedMatcher`` shared by all declarative
+    rules of a run; the rule only reads its share of the result.
+    """
+
+    def __init__(self, spec: dict, matcher: FusedMatcher, slot: int):
+        unknown = set(spec) - _KEYS
+        if unknown:
+            raise ValueError(f"unknown keys {', '.join(sorted(unknown))}")
+        rule_id = spec.get('id')
+        tag = spec.get('tag')
+        if not isinstance(rule_id, str) or not rule_id:
+            raise ValueError('"id" is required')
+        if not isinstance(tag, str) or not tag:
+            raise ValueError('"tag" is required')
+        self.id = rule_id.upper()
+        self.tag = tag
+        self.per = spec.get('scope', 'workbook')
+        if self.per not in SCOPES:
+            raise ValueError(f'"scope" must be one of {", ".join(SCOPES)}')
+        self.min = spec.get('min')
+        self.max = spec.get('max')
+        for bound in (self.min, self.max):
+            if bound is not None and (isinstance(bound, bool) or
+                                      not isinstance(bound, int) or bound < 0):
+                raise ValueError('"min" and "max" must be non-negative '
+                                 'integers')
+        if self.min is None and self.max is None:
+            self.max = 0  # report any match
+        self.severity = str(spec.get('severity', Rule.severity)).upper()
+        if self.severity not in DEFAULT_WEIGHTS:
+            raise ValueError(f'unknown severity "{self.severity}"')
+        self.category = str(spec.get('category', 'NEEDS_REVIEW')).upper()
+        if self.category not in CATEGORIES:
+            raise ValueError(f'"category" must be one of '
+                             f'{", ".join(CATEGORIES)}')
+        self.group = spec.get('group', DEFAULT_GROUP)
+        self.description = spec.get('description') or _default_description(
+            self.per, tag, self.min, self.max)
+        where = spec.get('where', {})
+        if not isinstance(where, dict):
+            raise ValueError('"where" must be an object')
+        self.test = compile_where(where)
+        self.template = compile_template(
+            spec.get('message') or _default_message(self.per, tag),
+            {'id': self.id, 'tag': tag, 'min': self.min, 'max': self.max})
+        # Cache keys (rule_signature, incremental state, findings history)
+        # follow the definition, not the source of this module.
+        self.version = hashlib.sha1(json.dumps(
+            spec, sort_keys=True).encode()).hexdigest()[:12]
+        self._matcher = matcher
+        self._slot = slot
+
+    def judge(self, count: int, elem: ET.Element | None) -> Finding | None:
+        if (self.max is not None and count > self.max) or \
+                (self.min is not None and count < self.min):
+            name = '' if elem is None else elem.get('name', '')
+            return Finding(self.id, self.template, self.category,
+                           (name, count), elem)
+        return None
+
+    def check_index(self, index: WorkbookIndex) -> list[Finding]:
+        return self._matcher.findings(index, self._slot)
+
+    def stream(self) -> StreamHandler:
+        return self._matcher.handler(self._slot)
+
+
+class FusedMatcher:
+    """All declarative rules of a run, compiled into one dispatch table
+    from tag to (rule, test) pairs, so each element is looked at once
+    however many rules mention its tag.
+
+    In tree mode the first rule to run makes one pass over the index
+    buckets of the dispatched tags and counts for every rule; the others
+    take their findings from that result (kept per index, like
+    ``field_graph.graph_for``).  Under ``--stream`` the first rule's handler
+    does the counting in the shared parse and the others' handlers hand
+    out their share when it finishes.
+    """
+
+    def __init__(self):
+        self.rules: list[DeclarativeRule] = []
+        self.table: dict[str, list[tuple[int, Test | None]]] = \
+            defaultdict(list)
+        self._results: weakref.WeakKeyDictionary = \
+            weakref.WeakKeyDictionary()
+        self._live: _FusedHandler | None = None
+
+    def add(self, spec: dict) -> DeclarativeRule:
+        rule = DeclarativeRule(spec, self, len(self.rules))
+        self.table[rule.tag].append((rule._slot, rule.test))
+        self.rules.append(rule)
+        return rule
+
+    @property
+    def scopes(self) -> frozenset[str]:
+        return frozenset(r.per for r in self.rules) - {'workbook'}
+
+    # ── tree mode ────────────────────────────────────────────────
+    def findings(self, index: WorkbookIndex, slot: int) -> list[Finding]:
+        pending = self._results.get(index)
+        if pending is None or slot not in pending:
+            pending = self._results[index] = self._match(index)
+        return pending.pop(slot)
+
+    def _match(self, index: WorkbookIndex) -> dict[int, list[Finding]]:
+        rules = self.rules
+        scopes = self.scopes
+        parent = index.parent
+        counts: list[dict[ET.Element | None, int]] = [
+            defaultdict(int) for _ in rules]
+        for tag, entries in self.table.items():
+            for elem in index.findall(tag):
+                owners = None
+                for slot, test in entries:
+                    if test is not None and not test(elem):
+                        continue
+                    per = rules[slot].per
+                    if per == 'workbook':
+                        counts[slot][None] += 1
+                        continue
+                    if owners is None:
+                        owners = _owners(elem, parent, scopes)
+                    owner = owners.get(per)
+                    if owner is not None:
+                        counts[slot][owner] += 1
+        results: dict[int, list[Finding]] = {}
+        for slot, rule in enumerate(rules):
+            owners = [None] if rule.per == 'workbook' else \
+                index.findall(rule.per)
+            found = (rule.judge(counts[slot].get(owner, 0), owner)
+                     for owner in owners)
+            results[slot] = [f for f in found if f is not None]
+        return results
+
+    # ── stream mode ──────────────────────────────────────────────
+    def handler(self, slot: int) -> StreamHandler:
+        if slot == 0:
+            self._live = _FusedHandler(self)
+            return self._live
+        return _ShareHandler(self._live, slot)
+
+
+def _owners(elem: ET.Element, parent: dict[ET.Element, ET.Element],
+            scopes: frozenset[str]) -> dict[str, ET.Element]:
+    """Nearest element of each scope tag among *elem* and its ancestors."""
+    owners: dict[str, ET.Element] = {}
+    node = elem
+    while node is not None:
+        if node.tag in scopes and node.tag not in owners:
+            owners[node.tag] = node
+        node = parent.get(node)
+    return owners
+
+
+class _FusedHandler(StreamHandler):
+    """Counts for every declarative rule in one set of start/end events.
+    Each open scope element carries per-rule counts, judged when it
+    closes, so findings come out in document order as with
+    ``ScopedCountHandler``."""
+
+    def __init__(self, matcher: FusedMatcher):
+        self._rules = matcher.rules
+        self._table = matcher.table
+        self._scopes = matcher.scopes
+        self.tags = tuple(set(self._table) | self._scopes)
+        self._open: dict[str, list[tuple[ET.Element, dict[int, int]]]] = {
+            tag: [] for tag in self._scopes}
+        self._per_scope: dict[str, list[DeclarativeRule]] = defaultdict(list)
+        for rule in self._rules:
+            self._per_scope[rule.per].append(rule)
+        self._totals: dict[int, int] = defaultdict(int)
+        self.results: list[list[Finding]] = [[] for _ in self._rules]
+
+    def start(self, elem, ctx):
+        tag = elem.tag
+        if tag in self._scopes:
+            self._open[tag].append((elem, defaultdict(int)))
+        for slot, test in self._table.get(tag, ()):
+            if test is not None and not test(elem):
+                continue
+            per = self._rules[slot].per
+            if per == 'workbook':
+                self._totals[slot] += 1
+                continue
+            stack = self._open[per]
+            if stack:
+                stack[-1][1][slot] += 1
+
+    def end(self, elem, ctx):
+        stack = self._open.get(elem.tag)
+        if not stack:
+            return
+        scope_elem, counts = stack.pop()
+        for rule in self._per_scope[elem.tag]:
+            finding = rule.judge(counts.get(rule._slot, 0), scope_elem)
+            if finding is not None:
+                self.results[rule._slot].append(finding)
+
+    def finish(self, ctx: StreamContext) -> list[Finding]:
+        for rule in self._per_scope['workbook']:
+            finding = rule.judge(self._totals.get(rule._slot, 0), None)
+            if finding is not None:
+                self.results[rule._slot].append(finding)
+        self._per_scope['workbook'] = []  # judged once, however often asked
+        return self.results[0]
+
+
+class _ShareHandler(StreamHandler):
+    """A declarative rule's view of the fused handler: subscribes to no
+    tags and returns the rule's findings once the parse is over (handlers
+    finish in rule order, after the first rule's fused handler)."""
+
+    def __init__(self, fused: _FusedHandler, slot: int):
+        self._fused = fused
+        self._slot = slot
+
+    def finish(self, ctx):
+        return self._fused.results[self._slot]
+
+
+def load(config_path: Path | None, only: Iterable[str] = (),
+         skip: Iterable[str] = (), taken: Iterable[str] = ()
+         ) -> list[DeclarativeRule]:
+    """Compile the config's declarative rules selected by *only*/*skip*
+    into one FusedMatcher.  Ids must not clash with each other or with
+    *taken* (the built-in and plugin rule ids)."""
+    only, skip, taken = set(only), set(skip), set(taken)
+    matcher = FusedMatcher()
+    seen: set[str] = set()
+    for i, spec in enumerate(read_declarative_config(config_path)):
+        rule_id = spec.get('id') if isinstance(spec, dict) else None
+        where = f'{config_path}: rules[{i}]' + (
+            f' ({rule_id})' if isinstance(rule_id, str) else '')
+        if not isinstance(spec, dict):
+            raise ValueError(f'{where}: a rule must be an object')
+        if isinstance(rule_id, str):
+            rule_id = rule_id.upper()
+            if rule_id in taken or rule_id in seen:
+                raise ValueError(f'{where}: duplicate rule id')
+            seen.add(rule_id)
+            if (only and rule_id not in only) or rule_id in skip:
+                continue
+        try:
+            matcher.add(spec)
+        except (ValueError, re.error) as e:
+            raise ValueError(f'{where}: {e}') from None
+    return matcher.rules
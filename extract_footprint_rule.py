@@ -0,0 +1,180 @@
+from __future__ import annotations
+import xml.etree.ElementTree as ET
+from rule_base import Rule, Finding
+from streaming import StreamHandler
+from workbook_index import WorkbookIndex
+from workbook_loader import PackageContents
+
+# All extract-footprint rules read ZipInfo records only (sizes and dates from
+# the central directory); no archive member is ever decompressed.
+
+def _fmt_bytes(n: int) ->str:
+    size = float(n)
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f'{size:.0f} {unit}' if unit == 'B' else f'{size:.1f} {unit}'
+        size /= 1024
+    return f'{n} B'
+
+
+def _ratio(info) ->str:
+    if not info.compress_size:
+        return 'n/a'
+    return f'{info.file_size / info.compress_size:.1f}:1'
+
+
+def _norm(path: str) ->str:
+    return path.replace('\\', '/').lstrip('./').lower()
+
+
+def _owner_label(ds) ->str:
+    if ds is None:
+        return '(no datasource)'
+    return ds.get('caption') or ds.get('name') or '(unnamed)'
+
+
+class _ExtractRule(Rule):
+    """Shared plumbing: map each extract in the package to the datasource
+    whose ``<connection dbname=...>`` points at it, then report.
+
+    Findings about one extract sit on that connection element; extracts
+    nothing references have no element, so they are keyed by file name."""
+    group = 'Performance'
+    cost = 2
+
+    def _report(self, package: PackageContents, owners: dict[str, tuple[
+        str, ET.Element]]) ->list[Finding]:
+        raise NotImplementedError()
+
+    @staticmethod
+    def _owner(owners: dict[str, tuple[str, ET.Element]], extract
+        ) ->tuple[str, ET.Element | None]:
+        """(datasource label, connection element) of a packaged extract."""
+        return owners.get(_norm(extract.filename), ('(unreferenced)', None))
+
+    def _finding(self, message: str, category: str, extract, node
+        ) ->Finding:
+        return Finding(self.id, message, category, node=node, key=None if
+            node is not None else extract.filename)
+
+    @staticmethod
+    def _owner_key(conn) ->(str | None):
+        dbname = conn.get('dbname') or ''
+        if dbname.lower().endswith(('.hyper', '.tde')):
+            return _norm(dbname)
+        return None
+
+    def check_index(self, index: WorkbookIndex) ->list[Finding]:
+        if index.package is None:
+            return []
+        owners: dict[str, tuple[str, ET.Element]] = {}
+        for conn in index.findall('connection'):
+            key = self._owner_key(conn)
+            if key is not None:
+                owners.setdefault(key, (_owner_label(index.nearest(conn,
+                    'datasource')), conn))
+        return self._report(index.package, owners)
+
+    def stream(self) ->StreamHandler:
+        return _OwnerCollector(self)
+
+
+class _OwnerCollector(StreamHandler):
+    tags = ('connection',)
+
+    def __init__(self, rule: _ExtractRule):
+        self._rule = rule
+        self.owners: dict[str, tuple[str, ET.Element]] = {}
+
+    def start(self, elem, ctx):
+        if ctx.package is None:
+            return
+        key = self._rule._owner_key(elem)
+        if key is not None:
+            self.owners.setdefault(key, (_owner_label(ctx.nearest(
+                'datasource')), elem))
+
+    def finish(self, ctx):
+        if ctx.package is None:
+            return []
+        return self._rule._report(ctx.package, self.owners)
+
+
+class ExtractFootprintRule(_ExtractRule):
+    id = 'GEXTRACT_FOOTPRINT'
+    description = 'Size and compression of extracts packaged with the workbook.'
+    severity = 'INFO'
+
+    def _report(self, package, owners):
+        extracts = package.extracts()
+        if not extracts:
+            return []
+        total = sum(e.file_size for e in extracts)
+        packed = sum(e.compress_size for e in extracts)
+        findings = [Finding(self.id,
+            f'Package carries {len(extracts)} extract(s): {_fmt_bytes(total)} uncompressed, {_fmt_bytes(packed)} in the archive ({total / packed if packed else 0:.1f}:1).'
+            , 'NEEDS_REVIEW')]
+        for e in sorted(extracts, key=lambda e: -e.file_size):
+            owner, node = self._owner(owners, e)
+            name = e.filename.rsplit('/', 1)[-1]
+            findings.append(self._finding(
+                f"Extract '{name}' for datasource '{owner}': {_fmt_bytes(e.file_size)} ({_ratio(e)} compression)."
+                , 'NEEDS_REVIEW', e, node))
+        return findings
+
+
+class LargeExtractRule(_ExtractRule):
+    id = 'GEXTRACT_SIZE'
+    description = 'Packaged extracts large enough to slow publishing and opening.'
+    severity = 'MEDIUM'
+    max_extract_bytes = 512 << 20
+    max_total_bytes = 1 << 30
+
+    def _report(self, package, owners):
+        findings = []
+        extracts = package.extracts()
+        for e in extracts:
+            if e.file_size > self.max_extract_bytes:
+                owner, node = self._owner(owners, e)
+                findings.append(self._finding(
+                    f"Extract for datasource '{owner}' is {_fmt_bytes(e.file_size)}; filter, aggregate or hide unused fields before extracting."
+                    , 'TAKE_ACTION', e, node))
+        total = sum(e.file_size for e in extracts)
+        if total > self.max_total_bytes:
+            findings.append(Finding(self.id,
+                f'Extracts total {_fmt_bytes(total)} across {len(extracts)} file(s).'
+                , 'NEEDS_REVIEW'))
+        return findings
+
+
+class OrphanExtractRule(_ExtractRule):
+    id = 'GEXTRACT_ORPHAN'
+    description = 'Packaged extracts that no datasource connection references.'
+    severity = 'LOW'
+
+    def _report(self, package, owners):
+        return [self._finding(
+            f"Extract '{e.filename}' ({_fmt_bytes(e.file_size)}) is not referenced by any datasource."
+            , 'TAKE_ACTION', e, None) for e in package.extracts() if _norm(
+            e.filename) not in owners]
+
+
+class QueryCacheRule(_ExtractRule):
+    id = 'GQUERY_CACHE'
+    description = 'Stale query-result cache shipped inside the package.'
+    severity = 'LOW'
+    min_stale_bytes = 1 << 20
+
+    def _report(self, package, owners):
+        cache = package.query_cache()
+        # Entries written before the workbook XML was last saved can no
+        # longer match its queries; they only add to the package size.
+        saved = package.document.date_time
+        stale = [e for e in cache if e.date_time < saved]
+        stale_bytes = sum(e.file_size for e in stale)
+        if not stale or (stale_bytes < self.min_stale_bytes and len(stale
+            ) < len(cache)):
+            return []
+        return [Finding(self.id,
+            f'{len(stale)} of {len(cache)} query-cache entries ({_fmt_bytes(stale_bytes)}) predate the last workbook save; re-save the package to drop them.'
+            , 'TAKE_ACTION')]
@@ -0,0 +1,275 @@
+# field_graph.py
+
+from __future__ import annotations
+import re
+import sys
+import weakref
+import xml.etree.ElementTree as ET
+from array import array
+from typing import Iterable, Iterator
+
+from calc_parser import analyze
+from workbook_index import WorkbookIndex
+
+# Node kinds.
+FIELD, WORKSHEET, DASHBOARD, DATASOURCE = range(4)
+
+# [data source].[derivation:field:suffix] as used on shelves, filters,
+# encodings, rows/cols text and dashboard parameter controls.
+_QUALIFIED = re.compile(r'\[((?:[^\]]|\]\])+)\]\.\[((?:[^\]]|\]\])+)\]')
+_BARE = re.compile(r'\[((?:[^\]]|\]\])+)\]')
+
+# Data-source children that describe fields rather than use them.
+_DS_METADATA = frozenset({'column', 'connection', 'aliases', 'layout',
+                          'semantic-values', 'date-options', 'folder',
+                          'folders-common', 'drill-paths', 'object-graph'})
+
+PARAMETERS = 'Parameters'
+
+_graphs: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def graph_for(index: WorkbookIndex) -> FieldGraph:
+    """The FieldGraph of a workbook, built once per index and shared by
+    every rule that asks for it."""
+    graph = _graphs.get(index)
+    if graph is None:
+        graph = _graphs[index] = FieldGraph.from_index(index)
+    return graph
+
+
+class FieldGraph:
+    """Reference graph over fields, worksheets, dashboards and data sources.
+
+    Node names are interned to dense integer ids; edges are kept in
+    compressed adjacency arrays (``offsets``/``targets``) once the graph is
+    frozen, so reachability over 50k+ columns is a tight loop over two
+    ``array`` objects.  Edges point from user to used:
+
+    * dashboard → worksheets and dashboards it shows (zones, story points);
+    * worksheet → data sources and fields on its shelves, filters,
+      encodings and datasource-dependencies;
+    * calculated field → fields its formula (or bin/group) references;
+    * data source → fields its own filters use (extract/source filters).
+
+    Roots are the visible views: dashboards, and worksheets whose window is
+    not hidden; actions and parameter controls count as used too.
+    """
+
+    def __init__(self):
+        self._ids: dict[str, int] = {}
+        self.keys: list[str] = []
+        self.kinds = bytearray()
+        self.labels: list[str] = []
+        self.owner: list[int] = []     # data-source node of each field
+        # <column> / <datasource> element of each field / data source node
+        self.elements: list[ET.Element | None] = []
+        self.roots: list[int] = []
+        self._edges: list[tuple[int, int]] = []
+        self.offsets = array('l')
+        self.targets = array('l')
+        # 1 if some field references the node (to tell "referenced only by
+        # dead calculations" from "never referenced").
+        self.field_referenced = bytearray()
+
+    # ── construction ─────────────────────────────────────────────
+    def node(self, kind: int, key: str, label: str = '',
+             owner: int = -1, elem: ET.Element | None = None) -> int:
+        full = sys.intern(f'{kind}\0{key}')
+        nid = self._ids.get(full)
+        if nid is None:
+            nid = self._ids[full] = len(self.keys)
+            self.keys.append(full)
+            self.kinds.append(kind)
+            self.labels.append(label or key)
+            self.owner.append(owner)
+            self.elements.append(elem)
+            self.field_referenced.append(0)
+        return nid
+
+    def name(self, nid: int) -> str:
+        """Workbook name of a node (``[Sales]``, ``federated.1x2``, ...)."""
+        return self.keys[nid].rsplit('\0', 1)[1]
+
+    def lookup(self, kind: int, key: str) -> int | None:
+        return self._ids.get(f'{kind}\0{key}')
+
+    def edge(self, src: int, dst: int) -> None:
+        if src != dst:
+            self._edges.append((src, dst))
+            if self.kinds[src] == FIELD:
+                self.field_referenced[dst] = 1
+
+    def freeze(self) -> None:
+        """Pack edges into CSR arrays; call once after construction."""
+        n = len(self.keys)
+        counts = [0] * (n + 1)
+        for src, _ in self._edges:
+            counts[src + 1] += 1
+        for i in range(n):
+            counts[i + 1] += counts[i]
+        self.offsets = array('l', counts)
+        fill = counts[:-1]
+        targets = [0] * len(self._edges)
+        for src, dst in self._edges:
+            targets[fill[src]] = dst
+            fill[src] += 1
+        self.targets = array('l', targets)
+        self._edges = []
+
+    def neighbors(self, nid: int) -> array:
+        return self.targets[self.offsets[nid]:self.offsets[nid + 1]]
+
+    def reachable(self, roots: Iterable[int] | None = None) -> bytearray:
+        """Mark every node reachable from *roots* (default: visible views)."""
+        seen = bytearray(len(self.keys))
+        offsets, targets = self.offsets, self.targets
+        stack = list(self.roots if roots is None else roots)
+        for nid in stack:
+            seen[nid] = 1
+        while stack:
+            nid = stack.pop()
+            for i in range(offsets[nid], offsets[nid + 1]):
+                dst = targets[i]
+                if not seen[dst]:
+                    seen[dst] = 1
+                    stack.append(dst)
+        return seen
+
+    def nodes(self, kind: int) -> Iterator[int]:
+        return (i for i, k in enumerate(self.kinds) if k == kind)
+
+    # ── workbook → graph ─────────────────────────────────────────
+    @classmethod
+    def from_index(cls, index: WorkbookIndex) -> FieldGraph:
+        g = cls()
+        datasources = [ds for ds in index.findall('datasource')
+                       if index.nearest(ds, 'worksheet') is None
+                       and index.nearest(ds, 'dashboard') is None]
+        # Fields first, so references can be resolved by name.
+        fields_of: dict[str, dict[str, int]] = {}
+        calcs: list[tuple[int, str, ET.Element]] = []
+        for ds in datasources:
+            ds_name = ds.get('name', '')
+            ds_id = g.node(DATASOURCE, ds_name,
+                           ds.get('caption') or ds_name, elem=ds)
+            names = fields_of.setdefault(ds_name, {})
+            for col in ds:
+                if col.tag != 'column' or not col.get('name'):
+                    continue
+                name = col.get('name')
+                fid = g.node(FIELD, f'{ds_name}\0{name}',
+                             col.get('caption') or name.strip('[]'), ds_id,
+                             col)
+                names[name] = fid
+                calcs.append((fid, ds_name, col))
+        g._fields_of = fields_of
+
+        for fid, ds_name, col in calcs:
+            for sub in col:
+                for key, value in sub.attrib.items():
+                    if '[' not in value or key in ('name', 'caption'):
+                        continue
+                    info = analyze(value) if key == 'formula' else None
+                    if info is not None and info.ast is not None:
+                        for ref in info.fields:
+                            target = g._resolve(ds_name, ref.strip('[]'))
+                            if target is not None:
+                                g.edge(fid, target)
+                    else:
+                        # Bins, groups and unparseable formulas.
+                        for target in g._refs(value, ds_name):
+                            g.edge(fid, target)
+        for ds in datasources:
+            ds_name = ds.get('name', '')
+            ds_id = g.lookup(DATASOURCE, ds_name)
+            for child in ds:
+                if child.tag not in _DS_METADATA:
+                    for target in g._refs_in(child, ds_name):
+                        g.edge(ds_id, target)
+
+        sheets: dict[str, int] = {}
+        for ws in index.findall('worksheet'):
+            sheets[ws.get('name', '')] = g.node(WORKSHEET, ws.get('name', ''))
+        for dash in index.findall('dashboard'):
+            sheets[dash.get('name', '')] = g.node(DASHBOARD,
+                                                   dash.get('name', ''))
+        for ws in index.findall('worksheet'):
+            ws_id = sheets[ws.get('name', '')]
+            for dep in index.within(ws, 'datasource-dependencies'):
+                ds_name = dep.get('datasource', '')
+                ds_id = g.lookup(DATASOURCE, ds_name)
+                if ds_id is not None:
+                    g.edge(ws_id, ds_id)
+                for col in dep:
+                    name = col.get('column') if col.tag == 'column-instance' \
+                        else col.get('name')
+                    target = g._resolve(ds_name, (name or '').strip('[]'))
+                    if target is not None:
+                        g.edge(ws_id, target)
+            for ds in index.within(ws, 'datasource'):
+                ds_id = g.lookup(DATASOURCE, ds.get('name', ''))
+                if ds_id is not None:
+                    g.edge(ws_id, ds_id)
+            for target in g._refs_in(ws, None):
+                g.edge(ws_id, target)
+        for dash in index.findall('dashboard'):
+            dash_id = sheets[dash.get('name', '')]
+            for sub in dash.iter():
+                for key in ('name', 'captured-sheet'):
+                    target = sheets.get(sub.get(key))
+                    if target is not None and sub is not dash:
+                        g.edge(dash_id, target)
+            for target in g._refs_in(dash, None):
+                g.edge(dash_id, target)
+
+        hidden = {w.get('name') for w in index.findall('window')
+                  if w.get('hidden') == 'true'}
+        g.roots = [nid for name, nid in sheets.items() if name not in hidden]
+        for action in index.findall('action'):
+            source = action.find('source')
+            ds_name = source.get('datasource') if source is not None else None
+            g.roots.extend(g._refs_in(action, ds_name))
+        g.freeze()
+        del g._fields_of
+        return g
+
+    def _resolve(self, ds_name: str | None, field: str) -> int | None:
+        """Field id for a (possibly derived, e.g. ``sum:Sales:qk``) field
+        name in *ds_name*, falling back to parameters."""
+        for ds in (ds_name, PARAMETERS):
+            names = self._fields_of.get(ds) if ds is not None else None
+            if not names:
+                continue
+            nid = names.get(f'[{field}]')
+            if nid is None and ':' in field:
+                parts = field.split(':')
+                for cand in [':'.join(parts[1:-1]), *parts]:
+                    nid = names.get(f'[{cand}]')
+                    if nid is not None:
+                        break
+            if nid is not None:
+                return nid
+        return None
+
+    def _refs(self, text: str, ds_name: str | None) -> Iterator[int]:
+        found = False
+        for ds, field in _QUALIFIED.findall(text):
+            found = True
+            nid = self._resolve(ds.replace(']]', ']'), field.replace(']]', ']'))
+            if nid is not None:
+                yield nid
+        if not found and ds_name is not None:
+            for field in _BARE.findall(text):
+                nid = self._resolve(ds_name, field.replace(']]', ']'))
+                if nid is not None:
+                    yield nid
+
+    def _refs_in(self, elem: ET.Element, ds_name: str | None
+                 ) -> Iterator[int]:
+        for sub in elem.iter():
+            for value in sub.attrib.values():
+                if '[' in value:
+                    yield from self._refs(value, ds_name)
+            if sub.text and '[' in sub.text:
+                yield from self._refs(sub.text, ds_name)
@@ -1,19 +1,25 @@
 from __future__ import annotations
 from rule_base import Rule, Finding
-import xml.etree.ElementTree as ET
+from streaming import ScopedCountHandler, StreamHandler
+from workbook_index import WorkbookIndex
 
 class FilterCountRule(Rule):
     id = 'GFILTER_COUNT'
     description = 'Worksheets using too many filters (>10).'
     group = 'Performance'
     severity = 'MEDIUM'
+    scope = 'worksheet'
 
-    def check(self, tree: ET.ElementTree) ->list[Finding]:
-        findings = []
-        for ws in tree.findall('.//worksheet'):
-            filters = ws.findall('.//filter')
-            if len(filters) > 10:
-                findings.append(Finding(self.id,
-                    f"Worksheet '{ws.get('name')}' has {len(filters)} filters."
-                    , 'NEEDS_REVIEW'))
-        return findings
\ No newline at end of file
+    def _report(self, ws, filters: int) ->(Finding | None):
+        if filters > 10:
+            return Finding(self.id,
+                "Worksheet '{}' has {} filters.", 'NEEDS_REVIEW',
+                (ws.get('name'), filters), ws)
+        return None
+
+    def check_object(self, ws, index: WorkbookIndex) ->list[Finding]:
+        finding = self._report(ws, len(index.filters_of(ws)))
+        return [finding] if finding is not None else []
+
+    def stream(self) ->StreamHandler:
+        return ScopedCountHandler('worksheet', 'filter', self._report)
@@ -0,0 +1,136 @@
+# finding_batch.py
+
+from __future__ import annotations
+import sys
+from array import array
+from collections import Counter
+from typing import Iterable, Iterator, Mapping
+
+from locations import Location
+from rule_base import Finding
+
+TAKE_ACTION = 'TAKE_ACTION'
+
+# Category codes are shared by every batch (there are only a few).
+_CATEGORIES: list[str] = [TAKE_ACTION, 'NEEDS_REVIEW']
+_CATEGORY_CODE: dict[str, int] = {c: i for i, c in enumerate(_CATEGORIES)}
+
+
+def _category_code(category: str) -> int:
+    code = _CATEGORY_CODE.get(category)
+    if code is None:
+        code = _CATEGORY_CODE[category] = len(_CATEGORIES)
+        _CATEGORIES.append(sys.intern(category))
+    return code
+
+
+class FindingBatch:
+    """Columnar storage for the findings of a run.
+
+    A finding is a row across four parallel columns: a 2-byte rule code
+    (into the batch's rule table), a 1-byte category code, its message
+    template and its message args.  Templates are shared constants, so a
+    finding costs a few bytes plus its args instead of an object with a
+    formatted message.  Counting and grouping work on the code arrays;
+    ``Finding`` objects and message strings are only built on demand.
+    ``locations`` holds each finding's Location, or None when the run was
+    not located (it is all None then).
+    """
+
+    __slots__ = ('_rules', '_rule_code', 'rule_codes', 'category_codes',
+                 'templates', 'args', 'locations')
+
+    def __init__(self, findings: Iterable[Finding] = ()):
+        self._rules: list[str] = []
+        self._rule_code: dict[str, int] = {}
+        self.rule_codes = array('H')
+        self.category_codes = array('B')
+        self.templates: list[str] = []
+        self.args: list[tuple] = []
+        self.locations: list[Location | None] = []
+        self.extend(findings)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[tuple[str, str, str]]) -> FindingBatch:
+        """Batch from ``(rule, category, message)`` rows."""
+        batch = cls()
+        for rule, category, message in rows:
+            batch.add(rule, category, message)
+        return batch
+
+    # ── building ──────────────────────────────────────────────────
+    def add(self, rule: str, category: str, template: str,
+            args: tuple = (), location: Location | None = None) -> None:
+        code = self._rule_code.get(rule)
+        if code is None:
+            code = self._rule_code[rule] = len(self._rules)
+            self._rules.append(sys.intern(rule))
+        self.rule_codes.append(code)
+        self.category_codes.append(_category_code(category))
+        self.templates.append(template)
+        self.args.append(args)
+        self.locations.append(location)
+
+    def append(self, finding: Finding) -> None:
+        self.add(finding.rule, finding.category, finding.template,
+                 finding.args, finding.location)
+
+    def extend(self, findings: Iterable[Finding]) -> None:
+        add = self.add
+        for f in findings:
+            add(f.rule, f.category, f.template, f.args, f.location)
+
+    # ── access ────────────────────────────────────────────────────
+    def __len__(self) -> int:
+        return len(self.rule_codes)
+
+    def __getitem__(self, i: int) -> Finding:
+        return Finding(self._rules[self.rule_codes[i]], self.templates[i],
+                       _CATEGORIES[self.category_codes[i]], self.args[i],
+                       location=self.locations[i])
+
+    def __iter__(self) -> Iterator[Finding]:
+        for i in range(len(self.rule_codes)):
+            yield self[i]
+
+    def rule(self, i: int) -> str:
+        return self._rules[self.rule_codes[i]]
+
+    def category(self, i: int) -> str:
+        return _CATEGORIES[self.category_codes[i]]
+
+    def message(self, i: int) -> str:
+        args = self.args[i]
+        return self.templates[i].format(*args) if args else self.templates[i]
+
+    def take_action(self, i: int) -> bool:
+        return self.category_codes[i] == 0
+
+    def rows(self) -> list[tuple[str, str, str]]:
+        """``(rule, category, message)`` per finding, in order."""
+        return [(self.rule(i), self.category(i), self.message(i))
+                for i in range(len(self.rule_codes))]
+
+    # ── aggregation ───────────────────────────────────────────────
+    def rule_counts(self) -> dict[str, int]:
+        """Findings per rule id, in order of first appearance."""
+        counts = Counter(self.rule_codes)
+        return {rule: counts[code] for code, rule in enumerate(self._rules)
+                if counts[code]}
+
+    def group_by_rule(self) -> dict[str, list[int]]:
+        """Row indices per rule id, each list in finding order."""
+        groups: list[list[int]] = [[] for _ in self._rules]
+        for i, code in enumerate(self.rule_codes):
+            groups[code].append(i)
+        return {rule: groups[code] for code, rule in enumerate(self._rules)
+                if groups[code]}
+
+    def severity_counts(self, severity_of: Mapping[str, str]
+                        ) -> dict[str, int]:
+        """Findings per severity, from the per-rule counts."""
+        totals: dict[str, int] = {}
+        for rule, n in self.rule_counts().items():
+            sev = severity_of[rule]
+            totals[sev] = totals.get(sev, 0) + n
+        return totals
@@ -0,0 +1,278 @@
+# findings_store.py
+
+from __future__ import annotations
+import datetime
+import sqlite3
+from pathlib import Path
+from typing import Iterable
+
+from result_cache import rule_version
+from rule_base import Rule
+
+SCHEMA_VERSION = 1
+
+DEFAULT_DB = Path('tabsca.db')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id        INTEGER PRIMARY KEY,
+    started   TEXT NOT NULL,
+    finished  TEXT,
+    command   TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS workbooks (
+    id    INTEGER PRIMARY KEY,
+    path  TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS rules (
+    id        INTEGER PRIMARY KEY,
+    rule_id   TEXT NOT NULL,
+    version   TEXT NOT NULL,
+    severity  TEXT NOT NULL,
+    grp       TEXT NOT NULL,
+    UNIQUE (rule_id, version, severity)
+);
+CREATE TABLE IF NOT EXISTS scores (
+    run_id       INTEGER NOT NULL REFERENCES runs(id),
+    workbook_id  INTEGER NOT NULL REFERENCES workbooks(id),
+    score        INTEGER NOT NULL,
+    findings     INTEGER NOT NULL,
+    PRIMARY KEY (run_id, workbook_id)
+);
+CREATE TABLE IF NOT EXISTS findings (
+    run_id       INTEGER NOT NULL REFERENCES runs(id),
+    workbook_id  INTEGER NOT NULL REFERENCES workbooks(id),
+    rule_ref     INTEGER NOT NULL REFERENCES rules(id),
+    category     TEXT NOT NULL,
+    message      TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scores_by_workbook ON scores (workbook_id, run_id);
+CREATE INDEX IF NOT EXISTS findings_by_workbook
+    ON findings (workbook_id, run_id);
+CREATE INDEX IF NOT EXISTS findings_by_run_rule ON findings (run_id, rule_ref);
+CREATE INDEX IF NOT EXISTS rules_by_id ON rules (rule_id);
+"""
+
+
+def _now() -> str:
+    return datetime.datetime.utcnow().isoformat(timespec='seconds') + 'Z'
+
+
+def connect(path: Path) -> sqlite3.Connection:
+    """Open (creating if needed) a findings database."""
+    path = Path(path)
+    if path.parent != Path('.'):
+        path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA busy_timeout=10000')
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    if version not in (0, SCHEMA_VERSION):
+        conn.close()
+        raise ValueError(f'{path}: unsupported findings database version '
+                         f'{version}')
+    conn.executescript(_SCHEMA)
+    conn.execute(f'PRAGMA user_version={SCHEMA_VERSION}')
+    return conn
+
+
+class FindingsStore:
+    """Records one analyzer run into the SQLite findings database.
+
+    Everything a run writes goes into a single transaction, opened by the
+    constructor and committed by ``close`` (rolled back by ``abort``), so
+    queries never see half a run.  Findings are inserted with one
+    ``executemany`` per workbook.
+    """
+
+    def __init__(self, path: Path, rules: Iterable[Rule], command: str = ''):
+        self.conn = connect(path)
+        self.conn.execute('BEGIN')
+        cur = self.conn.execute(
+            'INSERT INTO runs (started, command) VALUES (?, ?)',
+            (_now(), command))
+        self.run_id = cur.lastrowid
+        self._rule_ref: dict[str, int] = {}
+        for rule in rules:
+            version = rule_version(rule)
+            self.conn.execute(
+                'INSERT OR IGNORE INTO rules (rule_id, version, severity, grp)'
+                ' VALUES (?, ?, ?, ?)',
+                (rule.id, version, rule.severity, rule.group))
+            self._rule_ref[rule.id] = self.conn.execute(
+                'SELECT id FROM rules WHERE rule_id = ? AND version = ? '
+                'AND severity = ?', (rule.id, version, rule.severity)
+            ).fetchone()[0]
+
+    def _workbook_id(self, path: str) -> int:
+        self.conn.execute('INSERT OR IGNORE INTO workbooks (path) VALUES (?)',
+                          (path,))
+        return self.conn.execute('SELECT id FROM workbooks WHERE path = ?',
+                                 (path,)).fetchone()[0]
+
+    def add_workbook(self, path: str | Path, score: int,
+                     rows: list[tuple[str, str, str]]) -> None:
+        """Record one workbook's score and ``(rule, category, message)``
+        findings."""
+        wb = self._workbook_id(workbook_key(path))
+        run = self.run_id
+        ref = self._rule_ref
+        self.conn.execute(
+            'INSERT OR REPLACE INTO scores (run_id, workbook_id, score, '
+            'findings) VALUES (?, ?, ?, ?)', (run, wb, score, len(rows)))
+        self.conn.executemany(
+            'INSERT INTO findings (run_id, workbook_id, rule_ref, category, '
+            'message) VALUES (?, ?, ?, ?, ?)',
+            [(run, wb, ref[rule], category, message)
+             for rule, category, message in rows])
+
+    def carry_forward(self, path: str | Path) -> bool:
+        """Record a workbook skipped as unchanged with the score and
+        findings of the latest finished run that has it, so the run still
+        covers it.  False when no earlier run recorded the workbook."""
+        row = self.conn.execute(
+            'SELECT s.workbook_id, MAX(s.run_id) FROM workbooks w '
+            'JOIN scores s ON s.workbook_id = w.id '
+            'JOIN runs r ON r.id = s.run_id '
+            'WHERE w.path = ? AND r.finished IS NOT NULL',
+            (workbook_key(path),)).fetchone()
+        if row[1] is None:
+            return False
+        args = (self.run_id, row[1], row[0])
+        self.conn.execute(
+            'INSERT OR REPLACE INTO scores (run_id, workbook_id, score, '
+            'findings) SELECT ?, workbook_id, score, findings FROM scores '
+            'WHERE run_id = ? AND workbook_id = ?', args)
+        self.conn.execute(
+            'INSERT INTO findings (run_id, workbook_id, rule_ref, category, '
+            'message) SELECT ?, workbook_id, rule_ref, category, message '
+            'FROM findings WHERE run_id = ? AND workbook_id = ?', args)
+        return True
+
+    def close(self) -> None:
+        self.conn.execute('UPDATE runs SET finished = ? WHERE id = ?',
+                          (_now(), self.run_id))
+        self.conn.execute('COMMIT')
+        self.conn.close()
+
+    def abort(self) -> None:
+        self.conn.execute('ROLLBACK')
+        self.conn.close()
+
+
+def workbook_key(path: str | Path) -> str:
+    """How a workbook is identified in the store: its resolved path, or the
+    URL-like key of a workbook fetched from a server, as given."""
+    if isinstance(path, str) and '://' in path:
+        return path
+    return Path(path).resolve().as_posix()
+
+
+# ── queries ──────────────────────────────────────────────────────────
+def _path_range(workbook: str) -> tuple[str, str]:
+    """Bounds of the stored paths starting with *workbook* (a file, a
+    directory, a file-name prefix or a server URL prefix, resolved like
+    stored paths; empty for all), so lookups are range scans of the unique
+    ``path`` index."""
+    if not workbook:
+        return '', '\U0010ffff'
+    prefix = workbook_key(workbook)
+    if Path(workbook).is_dir():
+        prefix += '/'
+    return prefix, prefix + '\U0010ffff'
+
+
+def runs(conn: sqlite3.Connection, limit: int = 20) -> list[tuple]:
+    """(run, started, workbooks, findings, mean score), newest first."""
+    return conn.execute(
+        'SELECT r.id, r.started, COUNT(s.workbook_id), '
+        'COALESCE(SUM(s.findings), 0), ROUND(AVG(s.score), 1) '
+        'FROM runs r LEFT JOIN scores s ON s.run_id = r.id '
+        'WHERE r.finished IS NOT NULL '
+        'GROUP BY r.id ORDER BY r.id DESC LIMIT ?', (limit,)).fetchall()
+
+
+def _latest_runs(conn: sqlite3.Connection, n: int) -> list[int]:
+    return [r for r, in conn.execute(
+        'SELECT id FROM runs WHERE finished IS NOT NULL '
+        'ORDER BY id DESC LIMIT ?', (n,))]
+
+
+def score_trend(conn: sqlite3.Connection, workbook: str = '',
+                since: str = '') -> list[tuple]:
+    """(workbook, run, started, score, findings) for workbooks whose path
+    starts with *workbook* (see ``_path_range``), oldest run first."""
+    return conn.execute(
+        'SELECT w.path, r.id, r.started, s.score, s.findings '
+        'FROM workbooks w JOIN scores s ON s.workbook_id = w.id '
+        'JOIN runs r ON r.id = s.run_id '
+        'WHERE w.path >= ? AND w.path < ? AND r.started >= ? '
+        'ORDER BY w.path, r.id', (*_path_range(workbook), since)).fetchall()
+
+
+def got_worse(conn: sqlite3.Connection, since: str = '') -> list[tuple]:
+    """(workbook, first score, latest score) for workbooks whose latest
+    score is below their first score since *since*, biggest drop first."""
+    return conn.execute(
+        'WITH span AS ('
+        '  SELECT s.workbook_id, MIN(s.run_id) AS first, MAX(s.run_id) AS last'
+        '  FROM scores s JOIN runs r ON r.id = s.run_id'
+        '  WHERE r.started >= ? GROUP BY s.workbook_id)'
+        'SELECT w.path, a.score, b.score FROM span '
+        'JOIN scores a ON a.workbook_id = span.workbook_id '
+        '  AND a.run_id = span.first '
+        'JOIN scores b ON b.workbook_id = span.workbook_id '
+        '  AND b.run_id = span.last '
+        'JOIN workbooks w ON w.id = span.workbook_id '
+        'WHERE b.score < a.score ORDER BY b.score - a.score, w.path',
+        (since,)).fetchall()
+
+
+def finding_diff(conn: sqlite3.Connection, old_run: int | None = None,
+                 new_run: int | None = None, workbook: str = ''
+                 ) -> tuple[int, int, list[tuple], list[tuple]]:
+    """New and resolved findings between two runs (default: the latest
+    two), limited to workbooks analyzed in both.  Findings are matched on
+    workbook, rule id and message.  Returns (old, new, added, resolved)
+    with rows of (workbook, rule, message)."""
+    if old_run is None or new_run is None:
+        latest = _latest_runs(conn, 2)
+        if len(latest) < 2:
+            raise ValueError('need at least two recorded runs')
+        new_run = latest[0] if new_run is None else new_run
+        old_run = latest[1] if old_run is None else old_run
+    side = ('SELECT f.workbook_id, r.rule_id, f.message FROM findings f '
+            'JOIN rules r ON r.id = f.rule_ref '
+            'JOIN scores o ON o.workbook_id = f.workbook_id AND o.run_id = ? '
+            'JOIN workbooks w ON w.id = f.workbook_id '
+            'WHERE f.run_id = ? AND w.path >= ? AND w.path < ?')
+    bounds = _path_range(workbook)
+
+    def between(a: int, b: int) -> list[tuple]:
+        return conn.execute(
+            'SELECT w.path, d.rule_id, d.message FROM '
+            f'({side} EXCEPT {side}) d '
+            'JOIN workbooks w ON w.id = d.workbook_id '
+            'ORDER BY w.path, d.rule_id, d.message',
+            (a, b, *bounds, b, a, *bounds)).fetchall()
+
+    return old_run, new_run, between(old_run, new_run), between(new_run,
+                                                                 old_run)
+
+
+def top_rules(conn: sqlite3.Connection, run: int | None = None,
+              limit: int = 10) -> list[tuple]:
+    """(rule, severity, group, findings, workbooks) for one run (default:
+    the latest), most findings first."""
+    if run is None:
+        latest = _latest_runs(conn, 1)
+        if not latest:
+            return []
+        run = latest[0]
+    return conn.execute(
+        'SELECT r.rule_id, r.severity, r.grp, COUNT(*), '
+        'COUNT(DISTINCT f.workbook_id) FROM findings f '
+        'JOIN rules r ON r.id = f.rule_ref WHERE f.run_id = ? '
+        'GROUP BY r.rule_id ORDER BY COUNT(*) DESC, r.rule_id LIMIT ?',
+        (run, limit)).fetchall()
@@ -0,0 +1,84 @@
+# gating.py
+
+from __future__ import annotations
+import argparse
+from typing import Iterable, Mapping
+
+from rule_base import Rule
+from scoring import ScoringModel
+
+
+class FailFast(Exception):
+    """Raised by the analyzer under ``--fail-fast`` as soon as the gate's
+    verdict is failing, before the remaining rules run."""
+
+    def __init__(self, reason: str, ran: int, total: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.ran = ran
+        self.total = total
+
+
+class Gate:
+    """The CI exit conditions of a run (``--fail-on``, ``--fail-if-high``,
+    ``--min-score``) as predicates over per-rule finding counts.
+
+    Findings only ever add to the counts and scores only ever drop, so a
+    failing verdict on the rules run so far is final; that is what lets
+    ``--fail-fast`` stop early.
+    """
+
+    def __init__(self, scoring: ScoringModel, fail_on: Iterable[str] = (),
+                 fail_if_high: bool = False, min_score: int | None = None):
+        self.scoring = scoring
+        self.fail_on = frozenset(fail_on)
+        self.fail_if_high = fail_if_high
+        self.min_score = min_score
+
+    @classmethod
+    def from_args(cls, args: argparse.Namespace, scoring: ScoringModel
+                  ) -> Gate:
+        return cls(scoring, {r.upper() for r in args.fail_on.split(',') if r},
+                   args.fail_if_high, args.min_score)
+
+    def __bool__(self) -> bool:
+        return bool(self.fail_on or self.fail_if_high or
+                    self.min_score is not None)
+
+    def gating(self, rule: Rule) -> bool:
+        """Whether findings of *rule* can fail the gate."""
+        return (rule.id in self.fail_on or
+                self.fail_if_high and rule.severity == 'HIGH' or
+                self.min_score is not None and
+                self.scoring.weights[rule.severity] > 0)
+
+    def high(self, counts: Mapping[str, int]) -> bool:
+        severity_of = self.scoring.severity_of
+        return self.fail_if_high and any(severity_of[r] == 'HIGH'
+                                         for r in counts)
+
+    def below(self, score: int) -> bool:
+        return self.min_score is not None and score < self.min_score
+
+    def failed_rules(self, counts: Mapping[str, int]) -> list[str]:
+        return [r for r in counts if r in self.fail_on]
+
+    def verdict(self, counts: Mapping[str, int]) -> str | None:
+        """Why *counts* fail the gate, or None while they pass."""
+        failed = self.failed_rules(counts)
+        if failed:
+            return f"--fail-on rule {', '.join(failed)} reported findings"
+        if self.high(counts):
+            return 'HIGH-severity findings detected'
+        score = self.scoring.score(counts)
+        if self.below(score):
+            return f'health score {score} < threshold {self.min_score}'
+        return None
+
+
+def schedule(rules: Iterable[Rule], gate: Gate) -> list[Rule]:
+    """*rules* in the order ``--fail-fast`` runs them: rules that can fail
+    the gate first, cheapest (then short-circuiting) first; ties keep the
+    configured order."""
+    return sorted(rules, key=lambda r: (not gate.gating(r), r.cost,
+                                        not r.short_circuit))
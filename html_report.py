@@ -0,0 +1,405 @@
+# html_report.py
+
+from __future__ import annotations
+import datetime
+import html
+import json
+from collections import defaultdict
+from pathlib import Path
+from typing import IO, TYPE_CHECKING
+
+from rule_base import Rule
+
+if TYPE_CHECKING:
+    from finding_batch import FindingBatch
+    from portfolio import PortfolioSummary
+    from scoring import ScoringModel
+
+
+# Findings are rendered by the page in pages of this many list items, when
+# their section is first expanded; until then they are inert JSON.
+PAGE_SIZE = 200
+
+# Escape '<' so no message can close the embedding <script> element.
+_JSON_SAFE = str.maketrans({'<': '\\u003c'})
+
+_STYLE = """
+    body{font-family:sans-serif;margin:2em}
+    h1{font-size:1.8em;margin-bottom:0.5em}
+    .summary-block{background:#eef;border:1px solid #ccd;padding:1em;margin-bottom:1.5em}
+    details{margin-bottom:1em;border:1px solid #ccc;border-radius:4px;padding:0.75em;background:#f9f9f9}
+    summary{font-size:1.1em;cursor:pointer}
+    ul{padding-left:1.5em;margin-top:0.5em}
+    li{margin:0.4em 0}
+    .take{color:#c00;font-weight:bold}
+    .review{color:#b8860b;font-weight:bold}
+    .desc{font-size:0.95em;color:#333;margin:0.5em 0}
+    .more{margin:0.3em 0 0 1.5em;cursor:pointer}
+    .score-bar{position:relative;height:22px;background:#ddd;border-radius:4px;margin:0.4em 0 0.8em}
+    .score-fill{background:#4caf50;height:100%;border-radius:4px}
+    .score-label{position:absolute;top:0;left:50%;transform:translateX(-50%);font-weight:bold;font-size:0.9em;color:#000}
+    .sev.HIGH{color:#c00;font-weight:bold}
+    .sev.MEDIUM{color:#b8860b;font-weight:bold}
+    .sev.LOW{color:#0066cc;font-weight:bold}
+    table.scorecard{border-collapse:collapse;margin-top:0.8em}
+    .scorecard th, .scorecard td{border:1px solid #bbb;padding:4px 8px}
+    .scorecard th{background:#f0f0f8}
+    .filter-bar{
+      display: flex;
+      flex-wrap: wrap;
+      align-items: center;
+      gap: 1rem;
+      margin-bottom: 1.5em;
+      position: sticky;
+      top: 0;
+      background: inherit;
+      padding-top: 1em;
+      padding-bottom: 0.5em;
+      z-index: 10;
+    }
+    /* OS‑dark only when NOT in light‑mode */
+    @media (prefers-color-scheme: dark) {
+      :root:not(.light-mode) body {
+        background: #121212; color: #e0e0e0;
+      }
+      :root:not(.light-mode) details {
+        background: #1e1e1e; border-color: #333;
+      }
+      :root:not(.light-mode) summary { color: #eee; }
+      :root:not(.light-mode) .summary-block,
+      :root:not(.light-mode) .filter-bar {
+        background: #1a1a1a; border-color: #333;
+      }
+      :root:not(.light-mode) .score-bar { background: #333; }
+      :root:not(.light-mode) .score-fill { background: #76c7c0; }
+      :root:not(.light-mode) table.scorecard th,
+      :root:not(.light-mode) table.scorecard td { border-color: #555; }
+    }
+
+    /* Manual dark‑mode override */
+    .dark-mode body { background: #121212; color: #e0e0e0; }
+    .dark-mode details { background: #1e1e1e; border-color: #333; }
+    .dark-mode summary { color: #eee; }
+    .dark-mode .summary-block,
+    .dark-mode .filter-bar { background: #1a1a1a; border-color: #333; }
+    .dark-mode .score-bar { background: #333; }
+    .dark-mode .score-fill { background: #76c7c0; }
+    .dark-mode table.scorecard th,
+    .dark-mode table.scorecard td { border-color: #555; }
+    @media (max-width: 600px) {
+      body { font-size: 0.9em; }
+      h1 { font-size: 1.4em; }
+      .scorecard td, .scorecard th { padding: 2px 4px; }
+    }
+"""
+
+_SCRIPT = """
+    const PAGE_SIZE = %d;
+
+    // Only the per-rule <details> are toggled, never individual findings.
+    function filterGroups () {
+      const catSel = document.getElementById('categoryFilter').value;
+      const sevSel = document.getElementById('severityFilter').value;
+      document.querySelectorAll('details[data-group]').forEach(d => {
+        const g   = d.getAttribute('data-group');
+        const sev = d.getAttribute('data-sev');
+        const showCat = (catSel === 'All' || g === catSel);
+        const showSev = (sevSel === 'All' || sev === sevSel);
+        d.style.display = (showCat && showSev) ? 'block' : 'none';
+      });
+    }
+
+    // ── Lazy findings: parse a section's JSON on first expand, then
+    //    append list items one page at a time.
+    function renderPage (d) {
+      if (!d._items) {
+        d._items = JSON.parse(document.getElementById(d.dataset.src).textContent);
+        d._shown = 0;
+      }
+      const ul = d.querySelector('ul');
+      const end = Math.min(d._shown + PAGE_SIZE, d._items.length);
+      const frag = document.createDocumentFragment();
+      for (let i = d._shown; i < end; i++) {
+        const [msg, take] = d._items[i];
+        const li = document.createElement('li');
+        li.className = take ? 'take' : 'review';
+        li.textContent = '❌ ' + msg + (take ? ' (TAKE_ACTION)' : ' (NEEDS_REVIEW)');
+        frag.appendChild(li);
+      }
+      ul.appendChild(frag);
+      d._shown = end;
+      const more = d.querySelector('button.more');
+      const left = d._items.length - end;
+      more.hidden = left <= 0;
+      more.textContent = 'Show ' + Math.min(PAGE_SIZE, left) + ' more (' + left + ' remaining)';
+    }
+
+    // ── Theme toggle with light‑mode gating ──────────────────────
+    document.addEventListener('DOMContentLoaded', function() {
+      document.querySelectorAll('details[data-src]').forEach(d => {
+        d.addEventListener('toggle', () => { if (d.open && !d._items) renderPage(d); });
+        d.querySelector('button.more').addEventListener('click', () => renderPage(d));
+      });
+      const btn = document.getElementById('themeToggle');
+      // decide initial mode: stored → else OS → else default light
+      const stored = localStorage.getItem('theme');
+      if (stored === 'dark') {
+        document.documentElement.classList.add('dark-mode');
+      } else if (stored === 'light') {
+        document.documentElement.classList.add('light-mode');
+      } else if (window.matchMedia('(prefers-color-scheme: dark)').matches) {
+        document.documentElement.classList.add('dark-mode');
+      } else {
+        document.documentElement.classList.add('light-mode');
+      }
+      // set correct icon
+      btn.textContent = document.documentElement.classList.contains('dark-mode')
+                        ? '☀️' : '🌙';
+
+      btn.addEventListener('click', function() {
+        const isDark = document.documentElement.classList.toggle('dark-mode');
+        // ensure light‑mode is the opposite
+        if (isDark) {
+          document.documentElement.classList.remove('light-mode');
+          localStorage.setItem('theme', 'dark');
+          btn.textContent = '☀️';
+        } else {
+          document.documentElement.classList.add('light-mode');
+          localStorage.setItem('theme', 'light');
+          btn.textContent = '🌙';
+        }
+      });
+    });
+""" % PAGE_SIZE
+
+
+def _filter_bar(group_names: list[str]) -> str:
+    options = ''.join(f'<option value="{html.escape(g)}">{html.escape(g)}'
+                      '</option>' for g in group_names)
+    return f"""
+<div class="filter-bar">
+  <label for="categoryFilter"><strong>Category:</strong></label>
+  <select id="categoryFilter" onchange="filterGroups()">
+    <option value="All">All</option>
+    {options}
+  </select>
+&nbsp;&nbsp;
+  <label for="severityFilter"><strong>Severity:</strong></label>
+  <select id="severityFilter" onchange="filterGroups()">
+    <option value="All">All</option>
+    <option value="HIGH">HIGH</option>
+    <option value="MEDIUM">MEDIUM</option>
+    <option value="LOW">LOW</option>
+    <option value="INFO">INFO</option>
+  </select>
+  <button id="themeToggle" title="Toggle light/dark mode"
+          style="margin-left:auto; border:none; background:transparent; font-size:1.2em; cursor:pointer">
+    🌙
+  </button>
+</div>
+"""
+
+
+def _write_items(out: IO[str], findings: FindingBatch, rows: list[int]
+                 ) -> None:
+    """Write ``[[message, take_action], …]`` for *rows* of *findings* in
+    slices, so a 100k-finding section never becomes one giant string."""
+    out.write('[')
+    for start in range(0, len(rows), 1000):
+        chunk = json.dumps([(findings.message(i), findings.take_action(i))
+                            for i in rows[start:start + 1000]],
+                           ensure_ascii=False, separators=(',', ':'))
+        if start:
+            out.write(',')
+        out.write(chunk[1:-1].translate(_JSON_SAFE))
+    out.write(']')
+
+
+def write_report(out_file: Path, workbook: str, findings: FindingBatch,
+                 rules: list[Rule], scoring: ScoringModel) -> Path:
+    """Stream an HTML report for *findings* into *out_file*.
+
+    Findings are grouped by rule code in one pass over the batch and scored
+    from the per-rule counts; each rule's findings are embedded as compact
+    JSON and only turned into list items by the page when their section is
+    opened, one page at a time.
+    """
+    generated = datetime.datetime.now().strftime('%Y‑%m‑%d\xa0%H:%M:%S\xa0%Z')
+    grouped = findings.group_by_rule()
+    counts = {rule_id: len(rows) for rule_id, rows in grouped.items()}
+    sev_totals = findings.severity_counts(scoring.severity_of)
+    total = len(findings)
+    health_score = scoring.score(counts)
+    group_names = scoring.groups
+    group_scores = scoring.group_scores(counts)
+    passed_by_group: dict[str, list[tuple[str, str]]] = defaultdict(list)
+    for r in rules:
+        if r.id not in grouped:
+            passed_by_group[r.group].append((r.id, r.description))
+
+    esc = html.escape
+    with open(out_file, 'w', encoding='utf-8') as out:
+        w = out.write
+        w(f"""<!doctype html>
+<html><head>
+  <meta charset='utf-8'>
+  <meta name="viewport" content="width=device-width, initial-scale=1">
+  <title>{esc(workbook)} • Tableau Optimizer Report • {generated}</title>
+  <style>{_STYLE}  </style>
+    <script>{_SCRIPT}  </script>
+</head><body>
+  <h1>Static Code Analysis Report</h1>
+    <p style="margin-top:-0.5em;font-size:0.95em;color:#555;">
+        <strong>Workbook:</strong> {esc(workbook)} &nbsp;|&nbsp;
+        <strong>Generated:</strong> {generated}
+    </p>
+  <div class='summary-block'>
+    <strong>Health&nbsp;Score:</strong>
+    <div class="score-bar">
+      <div class="score-fill" style="width:{health_score}%;"></div>
+      <span class="score-label">{health_score}</span>
+    </div>
+
+    <table class="scorecard">
+      <tr><th>Category</th><th>Score</th></tr>
+      {''.join(f'<tr><td>{esc(g)}</td><td>{s}</td></tr>' for g, s in group_scores.items())}
+    </table>
+
+    <p>
+      <strong>Total Findings:</strong> {total}<br>
+      <span class='sev HIGH'>HIGH:</span> {sev_totals.get('HIGH', 0)} &nbsp;
+      <span class='sev MEDIUM'>MED:</span> {sev_totals.get('MEDIUM', 0)} &nbsp;
+      <span class='sev LOW'>LOW:</span> {sev_totals.get('LOW', 0)}
+    </p>
+  </div>
+  {_filter_bar(group_names)}
+""")
+        for grp in group_names:
+            passed = passed_by_group.get(grp)
+            if not passed:
+                continue
+            w(f"<details data-group='{esc(grp)}' data-status='Passed' "
+              f"data-sev='INFO'><summary><strong>✅ Rules Passed — "
+              f"{esc(grp)} ({len(passed)})</strong></summary><ul>")
+            for r_id, desc in sorted(passed):
+                w(f'<li>{esc(r_id)} — {esc(desc)}</li>')
+            w('</ul></details>\n')
+        for n, rule in enumerate(rules):
+            rows = grouped.get(rule.id)
+            if not rows:
+                continue
+            w(f"<details data-group='{esc(rule.group)}' "
+              f"data-sev='{esc(rule.severity)}' data-src='f{n}'><summary>"
+              f"<strong>{esc(rule.id)} — {len(rows)} findings</strong>"
+              f"</summary><p class='desc'>{esc(rule.description)}</p><ul></ul>"
+              "<button type='button' class='more' hidden></button>"
+              f"<script type='application/json' id='f{n}'>")
+            _write_items(out, findings, rows)
+            w('</script></details>\n')
+        w('</body></html>')
+    return out_file
+
+
+def _dash(value):
+    return '–' if value is None else value
+
+
+def write_portfolio_report(out_file: Path, root: str,
+                           summary: PortfolioSummary) -> Path:
+    """Write the summary page of a ``scan``: score distribution and
+    percentiles, per-group scores, outliers, worst workbooks and finding
+    counts per rule and per group."""
+    generated = datetime.datetime.now().strftime('%Y‑%m‑%d\xa0%H:%M:%S\xa0%Z')
+    esc = html.escape
+    stats = summary.stats()
+    bands = stats['distribution']
+    peak = max((n for _, n in bands), default=0) or 1
+    pct = stats['percentiles']
+    with open(out_file, 'w', encoding='utf-8') as out:
+        w = out.write
+        w(f"""<!doctype html>
+<html><head>
+  <meta charset='utf-8'>
+  <meta name="viewport" content="width=device-width, initial-scale=1">
+  <title>{esc(root)} • Tableau Optimizer Portfolio • {generated}</title>
+  <style>{_STYLE}
+    .dist td.bar{{width:60%}}
+    .dist .fill{{background:#4caf50;height:14px;border-radius:3px}}
+  </style>
+</head><body>
+  <h1>Portfolio Analysis Report</h1>
+    <p style="margin-top:-0.5em;font-size:0.95em;color:#555;">
+        <strong>Scanned:</strong> {esc(root)} &nbsp;|&nbsp;
+        <strong>Generated:</strong> {generated}
+    </p>
+  <div class='summary-block'>
+    <p>
+      <strong>Workbooks:</strong> {summary.workbooks}
+      ({len(summary.failed)} failed) &nbsp;
+      <strong>Mean score:</strong> {_dash(stats['mean_score'])} &nbsp;
+      <strong>Median score:</strong> {_dash(pct['p50'])} &nbsp;
+      <strong>P10 score:</strong> {_dash(pct['p10'])}<br>
+      <strong>Percentiles:</strong>
+      {' &nbsp; '.join(f'{k.upper()}&nbsp;{_dash(v)}' for k, v in pct.items())}<br>
+      <strong>Total Findings:</strong> {summary.findings}<br>
+      <span class='sev HIGH'>HIGH:</span> {summary.by_severity.get('HIGH', 0)} &nbsp;
+      <span class='sev MEDIUM'>MED:</span> {summary.by_severity.get('MEDIUM', 0)} &nbsp;
+      <span class='sev LOW'>LOW:</span> {summary.by_severity.get('LOW', 0)}
+    </p>
+  </div>
+""")
+        w("<details open><summary><strong>Score distribution</strong></summary>"
+          "<table class='scorecard dist'><tr><th>Score</th><th>Workbooks</th>"
+          "<th></th></tr>")
+        for label, n in reversed(bands):
+            w(f"<tr><td>{label}</td><td>{n}</td><td class='bar'><div "
+              f"class='fill' style='width:{100 * n / peak:.1f}%'></div></td></tr>")
+        w('</table></details>\n')
+        w("<details open><summary><strong>Scores per group</strong></summary>"
+          "<table class='scorecard'><tr><th>Group</th><th>Median</th>"
+          "<th>P10</th><th>Distribution (0 → 100)</th></tr>")
+        for group, g in stats['groups'].items():
+            spark = ' '.join(str(n) for _, n in g['distribution'])
+            w(f"<tr><td>{esc(group)}</td><td>{_dash(g['median'])}</td>"
+              f"<td>{_dash(g['p10'])}</td><td>{spark}</td></tr>")
+        w('</table></details>\n')
+        if stats['outliers']:
+            w(f"<details open><summary><strong>Outliers "
+              f"({len(stats['outliers'])})</strong></summary><p class='desc'>"
+              f"Scores below {stats['low_fence']:g} (Q1 − 1.5 × IQR)</p>"
+              "<table class='scorecard'><tr><th>Workbook</th><th>Score</th>"
+              "</tr>")
+            for wb, score in stats['outliers']:
+                w(f'<tr><td>{esc(str(wb))}</td><td>{score}</td></tr>')
+            w('</table></details>\n')
+        w(f"<details open><summary><strong>Worst {len(summary.worst())} "
+          "workbooks</strong></summary><table class='scorecard'><tr>"
+          "<th>Workbook</th><th>Score</th><th>Findings</th><th>Top rule</th>"
+          "</tr>")
+        for wb, score, total, top in summary.worst():
+            w(f'<tr><td>{esc(wb)}</td><td>{score}</td><td>{total}</td>'
+              f'<td>{esc(top)}</td></tr>')
+        w('</table></details>\n')
+        w("<details open><summary><strong>Findings per rule</strong></summary>"
+          "<table class='scorecard'><tr><th>Rule</th><th>Group</th>"
+          "<th>Severity</th><th>Findings</th><th>Workbooks</th></tr>")
+        for rule_id, n in summary.by_rule.most_common():
+            rule = summary.rules[rule_id]
+            w(f"<tr><td title='{esc(rule.description)}'>{esc(rule_id)}</td>"
+              f"<td>{esc(rule.group)}</td><td class='sev {esc(rule.severity)}'>"
+              f"{esc(rule.severity)}</td><td>{n}</td>"
+              f"<td>{summary.workbooks_by_rule[rule_id]}</td></tr>")
+        w('</table></details>\n')
+        w("<details open><summary><strong>Findings per group</strong></summary>"
+          "<table class='scorecard'><tr><th>Group</th><th>Findings</th></tr>")
+        for group, n in summary.by_group.most_common():
+            w(f'<tr><td>{esc(group)}</td><td>{n}</td></tr>')
+        w('</table></details>\n')
+        if summary.failed:
+            w(f"<details><summary><strong>Failed ({len(summary.failed)})"
+              "</strong></summary><ul>")
+            for wb, error in summary.failed:
+                w(f"<li class='take'>{esc(wb)} — {esc(error)}</li>")
+            w('</ul></details>\n')
+        w('</body></html>')
+    return out_file
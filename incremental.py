@@ -0,0 +1,142 @@
+# incremental.py
+
+from __future__ import annotations
+import hashlib
+import json
+import os
+import tempfile
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+from result_cache import CACHE_FORMAT, rule_version
+from rule_base import Finding, Rule
+from workbook_index import WorkbookIndex
+
+
+def fingerprint(elem: ET.Element) -> str:
+    """Digest of an element's serialized subtree (tag, attributes, text and
+    children), so any edit inside a worksheet changes its fingerprint."""
+    return hashlib.blake2b(ET.tostring(elem), digest_size=16).hexdigest()
+
+
+class IncrementalState:
+    """Findings of per-object rules from the previous run of one workbook.
+
+    For every rule with a ``scope`` the state maps the fingerprint of each
+    worksheet / dashboard / datasource to the findings ``check_object``
+    returned for it, each with where it sits inside that subtree.
+    ``check`` re-runs the rule only on subtrees whose fingerprint is new
+    and merges the rest from the previous run, in document order, so the
+    result (locations included) is identical to a full run.  A rule whose
+    version changed starts from scratch; workbook-wide rules always run.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._previous = self._load()
+        self._current: dict[str, dict] = {}
+        self._fingerprints: dict[ET.Element, str] = {}
+        self.reused = 0
+        self.checked = 0
+
+    @classmethod
+    def for_workbook(cls, cache_dir: Path, workbook: Path
+                     ) -> IncrementalState:
+        name = hashlib.sha256(str(Path(workbook).resolve()).encode())
+        return cls(Path(cache_dir) / 'incremental'
+                   / f'{name.hexdigest()[:32]}.json')
+
+    def _load(self) -> dict:
+        try:
+            data = json.loads(self.path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return {}
+        if data.get('format') != CACHE_FORMAT:
+            return {}
+        return data.get('rules', {})
+
+    def _fingerprint(self, elem: ET.Element) -> str:
+        fp = self._fingerprints.get(elem)
+        if fp is None:
+            fp = self._fingerprints[elem] = fingerprint(elem)
+        return fp
+
+    def check(self, rule: Rule, index: WorkbookIndex) -> list[Finding]:
+        if rule.scope is None:
+            return rule.check_index(index)
+        version = rule_version(rule)
+        previous = self._previous.get(rule.id)
+        if previous is None or previous.get('version') != version:
+            previous = {}
+        else:
+            previous = previous.get('objects', {})
+        objects: dict[str, list] = {}
+        findings: list[Finding] = []
+        for elem in index.findall(rule.scope):
+            fp = self._fingerprint(elem)
+            rows = objects.get(fp)
+            if rows is None:
+                rows = previous.get(fp)
+                if rows is None:
+                    found = rule.check_object(elem, index)
+                    rows = self._rows(found, elem)
+                    self.checked += 1
+                else:
+                    self.reused += 1
+                objects[fp] = rows
+            findings.extend(self._restore(rows, elem))
+        self._current[rule.id] = {'version': version, 'objects': objects}
+        return findings
+
+    @staticmethod
+    def _rows(found: list[Finding], elem: ET.Element) -> list[list]:
+        """Stored form of *found*: rule, message, category, the position
+        of each finding's element in ``elem.iter()`` (0: *elem* itself)
+        and its key.  The subtree is unchanged whenever the rows are
+        reused, so the position finds the same element again."""
+        positions = None
+        rows = []
+        for f in found:
+            at = 0
+            if f.node is not None and f.node is not elem:
+                if positions is None:
+                    positions = {e: i for i, e in enumerate(elem.iter())}
+                at = positions[f.node]
+            rows.append([f.rule, f.message, f.category, at, f.key])
+        return rows
+
+    @staticmethod
+    def _restore(rows: list[list], elem: ET.Element) -> list[Finding]:
+        nodes = None
+        findings = []
+        for rule, message, category, at, key in rows:
+            node = elem
+            if at:
+                if nodes is None:
+                    nodes = list(elem.iter())
+                node = nodes[at]
+            findings.append(Finding(rule, message, category, node=node,
+                                    key=key))
+        return findings
+
+    def advance(self) -> None:
+        """Start the next run from this one's findings without re-reading
+        the saved state (``--watch`` keeps the object between runs)."""
+        if self._current:
+            self._previous = self._current
+        self._current = {}
+        self._fingerprints = {}
+        self.reused = 0
+        self.checked = 0
+
+    def save(self) -> None:
+        """Persist the fingerprints seen in this run (stale ones drop out)."""
+        if not self._current:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = json.dumps({'format': CACHE_FORMAT, 'rules': self._current},
+                          separators=(',', ':'))
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as fh:
+            fh.write(data)
+        os.replace(tmp, self.path)
@@ -1,14 +1,28 @@
 from __future__ import annotations
 from rule_base import Rule, Finding
-import xml.etree.ElementTree as ET
+from streaming import StreamHandler, TagCountHandler
+from workbook_index import WorkbookIndex
 
 class LiveConnectionRule(Rule):
     id = 'GLIVE_CONN'
     description = 'Detect live connections (prefer extracts).'
     group = 'Connectivity'
     severity = 'HIGH'
+    cost = 1
+    short_circuit = True
 
-    def check(self, tree: ET.ElementTree) ->list[Finding]:
-        live = tree.findall('.//connection[@class="sqlproxy"]')
+    @staticmethod
+    def _is_live(conn) ->bool:
+        return conn.get('class') == 'sqlproxy'
+
+    def _report(self, live: int) ->list[Finding]:
         return [Finding(self.id, 'Workbook uses live connections.',
-            'NEEDS_REVIEW')] if live else []
\ No newline at end of file
+            'NEEDS_REVIEW')] if live else []
+
+    def check_index(self, index: WorkbookIndex) ->list[Finding]:
+        live = any(self._is_live(c) for c in index.findall('connection'))
+        return self._report(live)
+
+    def stream(self) ->StreamHandler:
+        return TagCountHandler('connection', self._report, self._is_live,
+            limit=1)
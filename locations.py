@@ -0,0 +1,198 @@
+# locations.py
+
+from __future__ import annotations
+import hashlib
+import itertools
+import re
+import xml.etree.ElementTree as ET
+from typing import IO, Callable, Iterable, Mapping, NamedTuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from rule_base import Finding
+
+SCAN_CHUNK = 1 << 20
+# UTF-8 continuation bytes; deleting them leaves one byte per code point.
+_CONTINUATION = bytes(range(0x80, 0xC0))
+# Markup that can contain a '<' which does not open an element, else any
+# other '<' (a start tag, an end tag, or a construct cut off by the end of
+# the buffer).
+_MARKUP = re.compile(rb'<(?:!--.*?-->|!\[CDATA\[.*?\]\]>|\?.*?\?>'
+                     rb'|!DOCTYPE(?:[^>\[]|\[[^\]]*\])*>|)', re.S)
+
+
+class Location(NamedTuple):
+    xpath: str
+    line: int
+    column: int      # in code points, 1-based
+    fingerprint: str
+
+
+class LocatedElement(ET.Element):
+    """Element of a located stream that knows where it is after it has
+    been cleared: ``ordinal`` (the number of its start tag in document
+    order) is set by ``located_parser``, ``up`` (its parent) and ``step``
+    (its XPath step) by the streaming engine.
+
+    Trees are not built from these: the C accelerator only takes its fast
+    paths for plain Elements, and a tree can still number its elements
+    and find their parents after the fact."""
+
+    __slots__ = ('ordinal', 'up', 'step')
+
+
+def located_parser() -> ET.XMLParser:
+    """An XMLParser for ``ET.iterparse`` that builds LocatedElements;
+    numbering the elements is all it adds."""
+    counter = itertools.count()
+
+    def factory(tag: str, attrib: dict) -> LocatedElement:
+        elem = LocatedElement(tag, attrib)
+        elem.ordinal = next(counter)
+        return elem
+    return ET.XMLParser(target=ET.TreeBuilder(element_factory=factory))
+
+
+def step_of(elem: ET.Element, position: int) -> tuple[str, str | None, int]:
+    """XPath step of *elem*, the *position*-th child with its tag."""
+    return elem.tag, elem.get('name'), position
+
+
+def _format_step(step: tuple[str, str | None, int]) -> str:
+    tag, name, position = step
+    # Names make paths (and so fingerprints) survive reordering.
+    if name is not None and "'" not in name:
+        return f"{tag}[@name='{name}']"
+    if name is not None and '"' not in name:
+        return f'{tag}[@name="{name}"]'
+    return f'{tag}[{position}]'
+
+
+class XPaths:
+    """Absolute XPaths of elements: from the ``parent`` map of a
+    WorkbookIndex, else from the ``up``/``step`` links set while
+    streaming.  Paths (and sibling positions) are memoized, so each
+    ancestor is formatted once however many findings sit below it."""
+
+    def __init__(self, parent: Mapping[ET.Element, ET.Element] | None =
+                 None):
+        self._parent = parent
+        self._paths: dict[ET.Element, str] = {}
+        self._positions: dict[ET.Element, dict[ET.Element, int]] = {}
+
+    def _position(self, elem: ET.Element, up: ET.Element) -> int:
+        place = self._positions.get(up)
+        if place is None:
+            seen: dict[str, int] = {}
+            place = self._positions[up] = {}
+            for child in up:
+                seen[child.tag] = place[child] = seen.get(child.tag, 0) + 1
+        return place[elem]
+
+    def __call__(self, elem: ET.Element) -> str:
+        path = self._paths.get(elem)
+        if path is None:
+            if self._parent is None:
+                up = elem.up
+                step = None if up is None else elem.step
+            else:
+                up = self._parent.get(elem)
+                step = None if up is None else step_of(
+                    elem, self._position(elem, up))
+            path = '/' + elem.tag if up is None else \
+                f'{self(up)}/{_format_step(step)}'
+            self._paths[elem] = path
+        return path
+
+
+def scan_start_tags(fh: IO[bytes], ordinals: Iterable[int]
+                    ) -> dict[int, tuple[int, int]]:
+    """Line and column of the start tags numbered *ordinals* (document
+    order, from 0), in one chunked regex pass over the raw document that
+    stops after the last one asked for."""
+    wanted = sorted(set(ordinals))
+    found: dict[int, tuple[int, int]] = {}
+    if not wanted:
+        return found
+    target = iter(wanted)
+    goal = next(target)
+    ordinal = -1
+    line = 1          # line of buf[mark]
+    column = 0        # code points between that line's start and buf[mark]
+    buf = b''
+    while True:
+        chunk = fh.read(SCAN_CHUNK)
+        buf += chunk
+        cut = len(buf)  # bytes of buf fully scanned
+        mark = 0        # line/column are known up to here
+        for m in _MARKUP.finditer(buf):
+            start = m.start()
+            if m.end() - start > 1:
+                continue
+            nxt = buf[start + 1:start + 2]
+            if nxt in (b'!', b'?', b'') and chunk:
+                cut = start  # unterminated construct: rescan with more data
+                break
+            if nxt in (b'/', b'!', b'?', b''):
+                continue
+            ordinal += 1
+            if ordinal != goal:
+                continue
+            line += buf.count(b'\n', mark, start)
+            nl = buf.rfind(b'\n', mark, start)
+            if nl >= 0:
+                column = 0
+                mark = nl + 1
+            column += len(buf[mark:start].translate(None, _CONTINUATION))
+            mark = start
+            found[goal] = (line, column + 1)
+            goal = next(target, None)
+            if goal is None:
+                return found
+        line += buf.count(b'\n', mark, cut)
+        nl = buf.rfind(b'\n', mark, cut)
+        if nl >= 0:
+            column = 0
+            mark = nl + 1
+        column += len(buf[mark:cut].translate(None, _CONTINUATION))
+        buf = buf[cut:]
+        if not chunk:
+            return found
+
+
+def locate(findings: list[Finding], root: ET.Element,
+           open_source: Callable[[], IO[bytes]],
+           parent: Mapping[ET.Element, ET.Element] | None = None) -> None:
+    """Set ``location`` on every finding from its ``node`` (the document
+    root when it has none): elements of a tree given its *parent* map,
+    else LocatedElements of a located stream.  The fingerprint hashes the
+    rule, the XPath and the finding's ``key`` if it has one, suffixed
+    ``-n`` for the n-th finding of that rule, element and key, so it does
+    not depend on message text (counts, thresholds)."""
+    if not findings:
+        return
+    nodes = [root if f.node is None else f.node for f in findings]
+    if parent is None:
+        ordinals = {n: n.ordinal for n in nodes}
+    else:
+        wanted = set(nodes)
+        ordinals = {e: i for i, e in enumerate(root.iter()) if e in wanted}
+    with open_source() as fh:
+        lines = scan_start_tags(fh, ordinals.values())
+    xpath = XPaths(parent)
+    # (rule, element, key) -> [digest, findings so far]
+    seen: dict[tuple[str, ET.Element, str | None], list] = {}
+    make = tuple.__new__
+    for finding, node in zip(findings, nodes):
+        path = xpath(node)
+        key = finding.rule, node, finding.key
+        entry = seen.get(key)
+        if entry is None:
+            text = f'{finding.rule}\0{path}' if finding.key is None else \
+                f'{finding.rule}\0{path}\0{finding.key}'
+            entry = seen[key] = [hashlib.blake2b(
+                text.encode(), digest_size=16).hexdigest(), 0]
+        entry[1] += 1
+        fp = entry[0] if entry[1] == 1 else f'{entry[0]}-{entry[1]}'
+        line, column = lines.get(ordinals[node], (0, 0))
+        finding.location = make(Location, (path, line, column, fp))
+        finding.node = finding.key = None
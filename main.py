@@ -3,395 +3,1069 @@
 from __future__ import annotations
 import argparse
 import datetime
-import html
 import json
+import os
+import sys
 import xml.etree.ElementTree as ET
-from collections import defaultdict
-from pathlib import Path
-from typing import Sequence
-import importlib.util
-import inspect
+from collections import Counter
 from pathlib import Path
+from typing import Iterator, Sequence, TYPE_CHECKING
+import declarative_rules
+import gating
+from finding_batch import FindingBatch
+from incremental import IncrementalState
+from profiling import NULL_PROFILER, NullProfiler, Profiler
+from result_cache import (DEFAULT_CACHE_DIR, DEFAULT_CACHE_MB, ResultCache,
+    hash_stream, rule_signature)
 from rule_base import Rule, Finding
+from rule_registry import RuleRegistry, read_rule_config
+from scoring import ScoringModel, read_scoring_config
+from streaming import stream_findings
+from workbook_index import WorkbookIndex
+from workbook_loader import resolve_source
+
+if TYPE_CHECKING:
+    from daemon import DaemonClient
+    from findings_store import FindingsStore
+    from portfolio import NdjsonWriter, PortfolioSummary
 
 # Config file
 # Create tableau_optimizer.json (or pass --config yourconfig.json) in the working directory:
 # {
  #  "only": ["GBLEND","GUNUSED_DS"],
-  # "skip": ["GCALC_LEN","GUNUSED_FIELDS"]
+  # "skip": ["GCALC_LEN","GUNUSED_FIELDS"],
+  # "rules": [{"id": "CUSTOM_FILTERS", "tag": "filter", "scope": "worksheet", "max": 8}]
 # }
 
-def load_rules() ->list[Rule]:
-    """Dynamically import all modules in rules/ and collect Rule subclasses."""
-    rules: list[Rule] = []
-    rules_dir = Path(__file__).parent / 'rules'
-    for path in sorted(rules_dir.glob('*.py')):
-        if path.name == '__init__.py':
-            continue
-        spec = importlib.util.spec_from_file_location(path.stem, path)
-        mod = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(mod)
-        for obj in vars(mod).values():
-            if inspect.isclass(obj) and issubclass(obj, Rule
-                ) and obj is not Rule:
-                rules.append(obj())
-    return rules
-
-def apply_rule_config(rules: list[Rule], config_path: Path) -> list[Rule]:
-    """Read JSON config and filter the rules list accordingly."""
-    if not config_path.exists():
-        return rules
-
-    cfg = json.loads(config_path.read_text())
-    only = {r.upper() for r in cfg.get("only", [])}
-    skip = {r.upper() for r in cfg.get("skip", [])}
-
-    if only:
-        # keep only those explicitly listed
-        rules = [r for r in rules if r.id in only]
-    if skip:
-        # drop any in skip-list
-        rules = [r for r in rules if r.id not in skip]
-
-    return rules
-
-# After loading dynamically:
-RULES = load_rules()
+def load_rules(config_path: (Path | None)=None) ->list[Rule]:
+    """Import only the rules the config selects (all when there is none).
+
+    Discovery goes through the cached rule manifest, so ``only``/``skip``
+    are applied before any rule module is imported.  The config's
+    declarative ``rules`` follow the module rules, in config order.
+    """
+    only, skip = read_rule_config(config_path)
+    registry = RuleRegistry()
+    specs = registry.specs()
+    return registry.load(registry.select(specs, only, skip)
+        ) + declarative_rules.load(config_path, only, skip, (s.id for s in
+        specs))
+
+# Populated by main() (or a pool initializer); importing main has no side
+# effects.
+RULES: list[Rule] = []
+# Health scores for RULES, with the config's weights and group caps.
+SCORING: ScoringModel | None = None
+# Set by main() when a running ``serve`` daemon does the analysis.
+DAEMON: DaemonClient | None = None
+# daemon.DISCOVERY_FILE, looked for without importing daemon (and with it
+# the HTTP stack) on every run.
+DAEMON_DISCOVERY = 'daemon.json'
+# watcher.DEFAULT_DEBOUNCE, for --help without importing watcher (and
+# with it ctypes) on every run.
+WATCH_DEBOUNCE = 0.3
+# --watch keeps each workbook's incremental state in memory between runs.
+WATCH_STATE: dict[Path, IncrementalState] | None = None
 
 
 REPORT_DIR = Path('reports')
-REPORT_DIR.mkdir(exist_ok=True)
 
 
-def write_html_report(wb_path: Path, findings: list[Finding]) ->Path:
-    """Generate an HTML report with category filter and return the file path."""
+def _report_file(wb_path: Path, suffix: str, stamp: bool) ->Path:
+    """Timestamped report path, or the stable one --watch rewrites."""
+    REPORT_DIR.mkdir(exist_ok=True)
+    if not stamp:
+        return REPORT_DIR / f'{wb_path.stem}{suffix}'
     ts = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-    generated = datetime.datetime.now().strftime('%Y‑%m‑%d\xa0%H:%M:%S\xa0%Z')
-    out_file = REPORT_DIR / f'{wb_path.stem}_{ts}.html'
-    grouped = defaultdict(list)
-    for f in findings:
-        grouped[f.rule].append(f)
-    severity_of = {r.id: r.severity for r in RULES}
-    weight = {'INFO': 0, 'LOW': 1, 'MEDIUM': 3, 'HIGH': 5}
-    penalty = sum(weight[severity_of[f.rule]] for f in findings)
-    health_score = max(0, 100 - penalty)
-    rule_by_id = {r.id: r for r in RULES}
-    group_penalty: dict[str, int] = defaultdict(int)
-    for f in findings:
-        grp = rule_by_id[f.rule].group
-        group_penalty[grp] += weight[severity_of[f.rule]]
-    group_scores = {g: max(0, 100 - p) for g, p in group_penalty.items()}
-    for g in {r.group for r in RULES}:
-        group_scores.setdefault(g, 100)
-    sev_totals = defaultdict(int)
-    for f in findings:
-        sev_totals[severity_of[f.rule]] += 1
-    totals = {'total': len(findings), 'take_action': sum(1 for f in
-        findings if f.category == 'TAKE_ACTION'), 'needs_review': sum(1 for
-        f in findings if f.category == 'NEEDS_REVIEW')}
-    rules_with_findings = set(grouped.keys())
-    rules_passed = [(rule.id, rule.description, rule.group) for rule in
-        RULES if rule.id not in rules_with_findings]
-    rules_total = len(RULES)
-    rules_ok = len(rules_passed)
-    group_names = sorted({rule.group for rule in RULES})
-    filter_html = f"""
-<div class="filter-bar">
-  <label for="categoryFilter"><strong>Category:</strong></label>
-  <select id="categoryFilter" onchange="filterGroups()">
-    <option value="All">All</option>
-    {''.join(f'<option value="{html.escape(g)}">{html.escape(g)}</option>' for g in group_names)}
-  </select>
-&nbsp;&nbsp;
-  <label for="severityFilter"><strong>Severity:</strong></label>
-  <select id="severityFilter" onchange="filterGroups()">
-    <option value="All">All</option>
-    <option value="HIGH">HIGH</option>
-    <option value="MEDIUM">MEDIUM</option>
-    <option value="LOW">LOW</option>
-    <option value="INFO">INFO</option>
-  </select>
-  <button id="themeToggle" title="Toggle light/dark mode"
-          style="margin-left:auto; border:none; background:transparent; font-size:1.2em; cursor:pointer">
-    🌙
-  </button>
-</div>
-"""
-    html_sections: list[str] = []
-    passed_by_group: dict[str, list[tuple[str, str]]] = defaultdict(list)
-    for r_id, desc, grp in rules_passed:
-        passed_by_group[grp].append((r_id, desc))
-    for grp in group_names:
-        passed_rules = passed_by_group.get(grp)
-        if not passed_rules:
-            continue
-        html_sections.append(
-            f"<details data-group='{html.escape(grp)}' data-status='Passed' data-sev='INFO'><summary><strong>✅\u202fRules\u202fPassed — {html.escape(grp)} ({len(passed_rules)})</strong></summary><ul>"
-            )
-        for r_id, desc in sorted(passed_rules):
-            html_sections.append(
-                f'<li>{html.escape(r_id)} — {html.escape(desc)}</li>')
-        html_sections.append('</ul></details>')
-    for rule in RULES:
-        items = grouped.get(rule.id, [])
-        if not items:
-            continue
-        html_sections.append(
-            f"<details data-group='{html.escape(rule.group)}' data-sev='{html.escape(rule.severity)}'><summary><strong>{html.escape(rule.id)} — {len(items)} findings</strong></summary><p class='desc'>{html.escape(rule.description)}</p><ul>"
-            )
-        for f in items:
-            style = 'take' if f.category == 'TAKE_ACTION' else 'review'
-            html_sections.append(
-                f"<li class='{style}'>❌ {html.escape(f.message)} ({f.category})</li>"
-                )
-        html_sections.append('</ul></details>')
-    out_file.write_text(
-        f"""<!doctype html>
-<html><head>
-  <meta charset='utf-8'>
-  <meta name="viewport" content="width=device-width, initial-scale=1">
-  <title>{html.escape(wb_path.name)} • Tableau Optimizer Report • {generated}</title>
-  <style>
-    body{{font-family:sans-serif;margin:2em}}
-    h1{{font-size:1.8em;margin-bottom:0.5em}}
-    .summary-block{{background:#eef;border:1px solid #ccd;padding:1em;margin-bottom:1.5em}}
-    details{{margin-bottom:1em;border:1px solid #ccc;border-radius:4px;padding:0.75em;background:#f9f9f9}}
-    summary{{font-size:1.1em;cursor:pointer}}
-    ul{{padding-left:1.5em;margin-top:0.5em}}
-    li{{margin:0.4em 0}}
-    .take{{color:#c00;font-weight:bold}}
-    .review{{color:#b8860b;font-weight:bold}}
-    .desc{{font-size:0.95em;color:#333;margin:0.5em 0}}
-    .score-bar{{position:relative;height:22px;background:#ddd;border-radius:4px;margin:0.4em 0 0.8em}}
-    .score-fill{{background:#4caf50;height:100%;border-radius:4px}}
-    .score-label{{position:absolute;top:0;left:50%;transform:translateX(-50%);font-weight:bold;font-size:0.9em;color:#000}}
-    .sev.HIGH{{color:#c00;font-weight:bold}}
-    .sev.MEDIUM{{color:#b8860b;font-weight:bold}}
-    .sev.LOW{{color:#0066cc;font-weight:bold}}
-    table.scorecard{{border-collapse:collapse;margin-top:0.8em}}
-    .scorecard th, .scorecard td{{border:1px solid #bbb;padding:4px 8px}}
-    .scorecard th{{background:#f0f0f8}}
-    .filter-bar{{
-      display: flex;
-      flex-wrap: wrap;
-      align-items: center;
-      gap: 1rem;
-      margin-bottom: 1.5em;
-      position: sticky;
-      top: 0;
-      background: inherit;
-      padding-top: 1em;
-      padding-bottom: 0.5em;
-      z-index: 10;
-    }}
-    /* OS‑dark only when NOT in light‑mode */
-    @media (prefers-color-scheme: dark) {{
-      :root:not(.light-mode) body {{
-        background: #121212; color: #e0e0e0;
-      }}
-      :root:not(.light-mode) details {{
-        background: #1e1e1e; border-color: #333;
-      }}
-      :root:not(.light-mode) summary {{ color: #eee; }}
-      :root:not(.light-mode) .summary-block,
-      :root:not(.light-mode) .filter-bar {{
-        background: #1a1a1a; border-color: #333;
-      }}
-      :root:not(.light-mode) .score-bar {{ background: #333; }}
-      :root:not(.light-mode) .score-fill {{ background: #76c7c0; }}
-      :root:not(.light-mode) table.scorecard th,
-      :root:not(.light-mode) table.scorecard td {{ border-color: #555; }}
-    }}
-
-    /* Manual dark‑mode override */
-    .dark-mode body {{ background: #121212; color: #e0e0e0; }}
-    .dark-mode details {{ background: #1e1e1e; border-color: #333; }}
-    .dark-mode summary {{ color: #eee; }}
-    .dark-mode .summary-block,
-    .dark-mode .filter-bar {{ background: #1a1a1a; border-color: #333; }}
-    .dark-mode .score-bar {{ background: #333; }}
-    .dark-mode .score-fill {{ background: #76c7c0; }}
-    .dark-mode table.scorecard th,
-    .dark-mode table.scorecard td {{ border-color: #555; }}
-    @media (max-width: 600px) {{
-      body {{ font-size: 0.9em; }}
-      h1 {{ font-size: 1.4em; }}
-      .scorecard td, .scorecard th {{ padding: 2px 4px; }}
-    }}
-  </style>
-    <script>
-    function filterGroups () {{
-      const catSel = document.getElementById('categoryFilter').value;
-      const sevSel = document.getElementById('severityFilter').value;
-      document.querySelectorAll('details[data-group]').forEach(d => {{
-        const g   = d.getAttribute('data-group');
-        const sev = d.getAttribute('data-sev');
-        const showCat = (catSel === 'All' || g === catSel);
-        const showSev = (sevSel === 'All' || sev === sevSel);
-        d.style.display = (showCat && showSev) ? 'block' : 'none';
-      }});
-    }}
-
-    // ── Theme toggle with light‑mode gating ──────────────────────
-    document.addEventListener('DOMContentLoaded', function() {{
-      const btn = document.getElementById('themeToggle');
-      // decide initial mode: stored → else OS → else default light
-      const stored = localStorage.getItem('theme');
-      if (stored === 'dark') {{
-        document.documentElement.classList.add('dark-mode');
-      }} else if (stored === 'light') {{
-        document.documentElement.classList.add('light-mode');
-      }} else if (window.matchMedia('(prefers-color-scheme: dark)').matches) {{
-        document.documentElement.classList.add('dark-mode');
-      }} else {{
-        document.documentElement.classList.add('light-mode');
-      }}
-      // set correct icon
-      btn.textContent = document.documentElement.classList.contains('dark-mode')
-                        ? '☀️' : '🌙';
-
-      btn.addEventListener('click', function() {{
-        const isDark = document.documentElement.classList.toggle('dark-mode');
-        // ensure light‑mode is the opposite
-        if (isDark) {{
-          document.documentElement.classList.remove('light-mode');
-          localStorage.setItem('theme', 'dark');
-          btn.textContent = '☀️';
-        }} else {{
-          document.documentElement.classList.add('light-mode');
-          localStorage.setItem('theme', 'light');
-          btn.textContent = '🌙';
-        }}
-      }});
-    }});
-  </script>
-</head><body>
-  <h1>Static Code Analysis Report</h1>
-    <p style="margin-top:-0.5em;font-size:0.95em;color:#555;">
-        <strong>Workbook:</strong> {html.escape(wb_path.name)} &nbsp;|&nbsp;
-        <strong>Generated:</strong> {generated}
-    </p>
-  <div class='summary-block'>
-    <strong>Health&nbsp;Score:</strong>
-    <div class="score-bar">
-      <div class="score-fill" style="width:{health_score}%;"></div>
-      <span class="score-label">{health_score}</span>
-    </div>
-
-    <table class="scorecard">
-      <tr><th>Category</th><th>Score</th></tr>
-      {''.join(f'<tr><td>{html.escape(g)}</td><td>{s}</td></tr>' for g, s in sorted(group_scores.items()))}
-    </table>
-
-    <p>
-      <strong>Total Findings:</strong> {totals['total']}<br>
-      <span class='sev HIGH'>HIGH:</span> {sev_totals.get('HIGH', 0)} &nbsp;
-      <span class='sev MEDIUM'>MED:</span> {sev_totals.get('MEDIUM', 0)} &nbsp;
-      <span class='sev LOW'>LOW:</span> {sev_totals.get('LOW', 0)}
-    </p>
-  </div>
-  {filter_html}
-  {''.join(html_sections)}
-</body></html>"""
-        )
+    return REPORT_DIR / f'{wb_path.stem}_{ts}{suffix}'
+
+
+def _replace_into(out_file: Path, write) ->Path:
+    """Write via a temporary sibling and rename, so a browser reloading a
+    report that is rewritten in place never sees half a page."""
+    tmp = out_file.with_name(out_file.name + '.tmp')
+    write(tmp)
+    os.replace(tmp, out_file)
     return out_file
 
 
-def _load_workbook_xml(path: Path) ->str:
-    import zipfile
-    with zipfile.ZipFile(path) as z:
-        for name in z.namelist():
-            if name.endswith('.twb'):
-                return z.read(name).decode('utf-8')
-    raise FileNotFoundError('Workbook XML (.twb) not found inside .twbx')
+def write_html_report(wb_path: Path, findings: FindingBatch, stamp: bool=True
+    ) ->Path:
+    """Generate an HTML report with category filter and return the file path."""
+    import html_report
+    out_file = _report_file(wb_path, '.html', stamp)
+    return _replace_into(out_file, lambda tmp: html_report.write_report(tmp,
+        wb_path.name, findings, RULES, SCORING))
 
 
-def analyze_workbook(path: Path) ->list[Finding]:
-    tree = ET.ElementTree(ET.fromstring(_load_workbook_xml(path)))
-    findings: list[Finding] = []
-    for rule in RULES:
-        findings.extend(rule.check(tree))
-    return findings
+def analyze_workbook(path: Path, stream: bool=False, profiler: (Profiler |
+    NullProfiler)=NULL_PROFILER, incremental: (IncrementalState | None)=None,
+    gate: (gating.Gate | None)=None, locate: bool=False) ->FindingBatch:
+    """Run RULES over one workbook.  With *incremental*, per-object rules
+    only re-check worksheets/dashboards/datasources that changed since the
+    previous run (tree mode only).  With a *gate* (--fail-fast), rules run
+    cheapest gating rule first and ``gating.FailFast`` is raised as soon as
+    the gate fails; otherwise findings come out in RULES order as usual.
+    With *locate*, every finding gets its Location (XPath, line/column and
+    fingerprint; see ``locations``)."""
+    with profiler.phase('open'):
+        source = resolve_source(path)
+    include_root = source.kind == 'datasource'
+    if stream:
+        with source.open() as fh, profiler.phase('parse'):
+            found, _ = stream_findings(profiler.reader(fh), RULES,
+                include_root, source.package, profiler, gate, source.open if
+                locate else None)
+        findings = FindingBatch(found)
+        if profiler.enabled:
+            for rule_id, n in findings.rule_counts().items():
+                profiler.count_findings(rule_id, n)
+        return findings
+    with source.open() as fh, profiler.phase('parse'):
+        tree = ET.parse(profiler.reader(fh))
+    with profiler.phase('index'):
+        index = WorkbookIndex(tree, include_root, source.package)
+    rules = RULES if gate is None else gating.schedule(RULES, gate)
+    by_rule: dict[str, list[Finding]] = {}
+    counts: dict[str, int] = {}
+    for ran, rule in enumerate(rules, 1):
+        with profiler.rule(rule.id):
+            if incremental is not None:
+                found = incremental.check(rule, index)
+            else:
+                found = rule.check_index(index)
+        profiler.count_findings(rule.id, len(found))
+        by_rule[rule.id] = found
+        if gate is not None and found and gate.gating(rule):
+            counts[rule.id] = len(found)
+            reason = gate.verdict(counts)
+            if reason is not None:
+                raise gating.FailFast(reason, ran, len(rules))
+    ordered = [f for rule in RULES for f in by_rule[rule.id]]
+    if locate:
+        import locations
+        with profiler.phase('locate'):
+            locations.locate(ordered, tree.getroot(), source.open, index.
+                parent)
+    return FindingBatch(ordered)
 
 
-def write_json_report(wb_path: Path, findings: list[Finding]) ->Path:
-    """Dump a machine‑readable report."""
-    ts = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-    out_file = REPORT_DIR / f'{wb_path.stem}_{ts}.json'
-    severity_of = {r.id: r.severity for r in RULES}
-    weight = {'INFO': 0, 'LOW': 1, 'MEDIUM': 3, 'HIGH': 5}
-    health_score = max(0, 100 - sum(weight[severity_of[f.rule]] for f in
-        findings))
+# Formats whose findings carry XPath, line/column and a fingerprint.
+LOCATED_FORMATS = ('ndjson', 'sarif')
+
+
+def write_json_report(wb_path: Path, findings: FindingBatch, profile: (
+    dict | None)=None, stamp: bool=True) ->Path:
+    """Dump a machine‑readable report (with --profile timings if given)."""
+    out_file = _report_file(wb_path, '.json', stamp)
+    severity_of = SCORING.severity_of
+    health_score = SCORING.score(findings.rule_counts())
     payload = {'workbook': wb_path.name, 'generated': datetime.datetime.
         utcnow().isoformat(timespec='seconds') + 'Z', 'health_score':
-        health_score, 'findings': [{'rule': f.rule, 'severity': severity_of
-        [f.rule], 'category': f.category, 'message': f.message} for f in
-        findings]}
-    out_file.write_text(json.dumps(payload, indent=2))
-    return out_file
+        health_score, 'findings': [{'rule': rule, 'severity': severity_of[
+        rule], 'category': category, 'message': message} for rule,
+        category, message in findings.rows()]}
+    if profile is not None:
+        payload['profile'] = profile
+    return _replace_into(out_file, lambda tmp: tmp.write_text(json.dumps(
+        payload, indent=2)))
+
+
+def write_ndjson_report(wb_path: Path, findings: FindingBatch, cached:
+    bool, stamp: bool=True) ->Path:
+    """One JSON line per finding, with its XPath, line/column and
+    fingerprint, then one with the workbook's score."""
+    import portfolio
+    out_file = _report_file(wb_path, '.ndjson', stamp)
+
+    def write(tmp: Path) ->None:
+        with open(tmp, 'w', encoding='utf-8') as out:
+            portfolio.NdjsonWriter(out, RULES).workbook(wb_path.name,
+                SCORING.score(findings.rule_counts()), findings.rows(),
+                cached, findings.locations)
+    return _replace_into(out_file, write)
+
+
+def _artifact_uri(path: Path) ->str:
+    path = path.resolve()
+    try:
+        relative = path.relative_to(Path.cwd().resolve())
+    except ValueError:
+        return path.as_uri()
+    from urllib.parse import quote
+    return quote(relative.as_posix())
+
+
+def write_sarif_report(wb_path: Path, findings: FindingBatch, stamp: bool
+    =True) ->Path:
+    """SARIF 2.1.0 log for code-review tools, written result by result."""
+    import sarif
+    out_file = _report_file(wb_path, '.sarif', stamp)
+    source = resolve_source(wb_path)
+    member = source.member.filename if source.is_package else None
+
+    def write(tmp: Path) ->None:
+        with open(tmp, 'w', encoding='utf-8') as out:
+            log = sarif.SarifWriter(out, RULES, _artifact_uri(wb_path), member)
+            for i in range(len(findings)):
+                log.result(findings.rule(i), findings.category(i), findings
+                    .message(i), findings.locations[i])
+            log.close(SCORING.score(findings.rule_counts()))
+    return _replace_into(out_file, write)
+
+
+def _analyze_cached(path: Path, args: argparse.Namespace, profiler: (
+    Profiler | NullProfiler)=NULL_PROFILER, gate: (gating.Gate | None)=None,
+    locate: bool=False) ->tuple[FindingBatch, bool, IncrementalState | None]:
+    """Return (findings, from_cache, incremental), consulting the result
+    cache unless --no-cache.  A hit only hashes the .twb member; nothing is
+    parsed.  On a miss, per-object rules reuse the findings of subtrees
+    that are unchanged since the previous run of the same workbook.  With
+    a daemon, all of that happens in the daemon.  *gate* is passed on to
+    ``analyze_workbook``; a run it stops early is not cached.  Located runs
+    (*locate*) are cached separately; ``main`` does not connect to a daemon
+    for them."""
+    if DAEMON is not None:
+        import daemon
+        payload = DAEMON.analyze(path, args.stream, args.no_cache)
+        return FindingBatch(daemon.findings_of(payload)), payload['cached'
+            ], None
+    if args.no_cache:
+        return analyze_workbook(path, args.stream, profiler, None, gate,
+            locate), False, None
+    with profiler.phase('cache'):
+        cache = ResultCache(args.cache_dir, args.cache_size << 20)
+        source = resolve_source(path)
+        with source.open() as fh:
+            digest = hash_stream(fh)
+        if source.package is not None:
+            # Extract-footprint rules read the archive listing, not the XML.
+            digest += ':' + source.package.fingerprint()
+        signature = rule_signature(RULES)
+        if args.stream and any(r.stream() is None for r in RULES):
+            signature += ':stream'
+        if locate:
+            signature += ':located'
+        key = cache.key(digest, signature)
+        issues = cache.get(key)
+    if issues is not None:
+        return FindingBatch(issues), True, None
+    incremental = None
+    if not args.stream:
+        with profiler.phase('cache'):
+            incremental = _incremental_state(path, args)
+    issues = analyze_workbook(path, args.stream, profiler, incremental,
+        gate, locate)
+    with profiler.phase('cache'):
+        cache.put(key, issues)
+        if incremental is not None:
+            incremental.save()
+    return issues, False, incremental
+
+
+def _incremental_state(path: Path, args: argparse.Namespace
+    ) ->IncrementalState:
+    if WATCH_STATE is None:
+        return IncrementalState.for_workbook(args.cache_dir, path)
+    state = WATCH_STATE.get(path)
+    if state is None:
+        state = WATCH_STATE[path] = IncrementalState.for_workbook(args.
+            cache_dir, path)
+    else:
+        state.advance()
+    return state
+
+
+def _process_workbook(path: Path, args: argparse.Namespace) ->tuple[list
+    [str], int, tuple | None]:
+    """Analyze one workbook and write its reports.
+
+    Returns the console lines to print, the exit code it contributes and,
+    with --db, the ``(score, rows)`` record to store, so the same function
+    serves the sequential loop and pool workers.
+    """
+    lines = [f'▶ {path.name}']
+    if args.profile or args.profile_alloc:
+        profiler = Profiler(track_alloc=args.profile_alloc)
+    else:
+        profiler = NULL_PROFILER
+    cprof = None
+    if args.pstats:
+        import cProfile
+        cprof = cProfile.Profile()
+        cprof.enable()
+    try:
+        lines, exit_code, record = _check_workbook(path, args, profiler,
+            lines)
+    finally:
+        if cprof is not None:
+            cprof.disable()
+            cprof.dump_stats(args.pstats)
+            lines.append(f'  🔬  cProfile stats written to {args.pstats}')
+        profiler.close()
+    return lines, exit_code, record
+
+
+def _check_workbook(path: Path, args: argparse.Namespace, profiler: (
+    Profiler | NullProfiler), lines: list[str]) ->tuple[list[str], int,
+    tuple | None]:
+    exit_code = 0
+    gate = gating.Gate.from_args(args, SCORING)
+    fmt = args.format
+    try:
+        issues, cached, incremental = _analyze_cached(path, args, profiler,
+            gate if args.fail_fast else None, fmt in LOCATED_FORMATS)
+        if cached:
+            lines.append('  ♻️  Unchanged since last run; reused cached findings')
+        elif incremental is not None and incremental.reused:
+            lines.append(
+                f'  🧩  Incremental: reused {incremental.reused} unchanged objects, re-checked {incremental.checked}'
+                )
+        elif args.stream:
+            skipped = [r.id for r in RULES if r.stream() is None]
+            if skipped:
+                lines.append('  ℹ️  Skipped in streaming mode: ' + ', '.
+                    join(skipped))
+        counts = issues.rule_counts()
+        health_score = SCORING.score(counts)
+        lines.append(f'  🎯  Health Score: {health_score}')
+        if gate.high(counts):
+            lines.append('⚠️  Aborting: HIGH-severity findings detected')
+            exit_code = 1
+        if gate.below(health_score):
+            lines.append(
+                f'⚠️  Aborting: health score {health_score} < threshold {args.min_score}'
+                )
+            exit_code = 1
+        if gate.failed_rules(counts):
+            exit_code = 1
+    except gating.FailFast as e:
+        lines.append(
+            f'  ⛔  Failing fast: {e.reason} ({e.ran} of {e.total} rules run; reports skipped)'
+            )
+        return lines, 1, None
+    except Exception as e:
+        lines.append(f'  ⚠️  {e}')
+        return lines, 1, None
+    record = None
+    if args.db is not None:
+        record = health_score, issues.rows()
+    if args.fail_fast and exit_code:
+        lines.append('  ⛔  Failing fast: reports skipped')
+        return lines, exit_code, record
+    if fmt in ('html', 'both'):
+        with profiler.phase('report:html'):
+            html_file = write_html_report(path, issues, not args.watch)
+        lines.append(f'  📄  HTML report written to {html_file}')
+    if fmt in ('json', 'both'):
+        profile = profiler.as_dict() if profiler.enabled else None
+        with profiler.phase('report:json'):
+            json_file = write_json_report(path, issues, profile, not args.
+                watch)
+        lines.append(f'  📦  JSON report written to {json_file}')
+    if fmt == 'ndjson':
+        with profiler.phase('report:ndjson'):
+            ndjson_file = write_ndjson_report(path, issues, cached, not
+                args.watch)
+        lines.append(f'  📦  NDJSON report written to {ndjson_file}')
+    if fmt == 'sarif':
+        with profiler.phase('report:sarif'):
+            sarif_file = write_sarif_report(path, issues, not args.watch)
+        lines.append(f'  📦  SARIF report written to {sarif_file}')
+    if profiler.enabled:
+        lines.extend(profiler.summary_lines())
+    return lines, exit_code, record
+
+
+def _run_workbook(path: Path, args: argparse.Namespace) ->tuple[list[str],
+    int, tuple | None]:
+    """``_process_workbook`` that never raises, so one bad workbook cannot
+    end the batch (report-writing errors included)."""
+    try:
+        return _process_workbook(path, args)
+    except Exception as e:
+        return [f'▶ {path.name}', f'  ⚠️  {e}'], 1, None
+
+
+def _init_worker(config_path: Path) ->None:
+    """Pool initializer: rebuild the filtered rule list (and its scoring)
+    in the worker."""
+    global RULES, SCORING
+    RULES = load_rules(config_path)
+    SCORING = ScoringModel.from_config(RULES, config_path)
+
+
+def _warm() ->int:
+    return len(RULES)
+
+
+def _crashed(path: Path) ->tuple[list[str], int, None]:
+    return [f'▶ {path.name}',
+        '  ⚠️  worker process crashed while analyzing this workbook'], 1, None
+
+
+def _iter_parallel(paths: list[Path], args: argparse.Namespace,
+    config_path: Path, worker=_run_workbook, on_crash=_crashed) ->Iterator:
+    """Yield ``worker(path, args)`` results in input order from a process
+    pool, keeping at most a few tasks per process in flight so finished
+    results never pile up behind a slow workbook.
+
+    If a worker dies hard (segfault, OOM kill) the pool is broken and every
+    pending future fails.  The first affected workbook is then retried in a
+    single-use pool of its own, so only the real culprit is reported as a
+    crash (``on_crash``), and the remaining workbooks continue in a fresh
+    pool.
+    """
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor
+    from concurrent.futures.process import BrokenProcessPool
+    jobs = min(args.jobs, len(paths))
+    window = jobs * 4
+    start = 0
+    while start < len(paths):
+        ex = ProcessPoolExecutor(jobs, initializer=_init_worker, initargs=(
+            config_path,))
+        pending: deque = deque()
+        queued = start
+        resume = len(paths)
+        try:
+            for i in range(start, len(paths)):
+                try:
+                    while queued < len(paths) and len(pending) < window:
+                        pending.append(ex.submit(worker, paths[queued], args))
+                        queued += 1
+                    yield pending.popleft().result()
+                except BrokenProcessPool:
+                    yield _run_isolated(paths[i], args, config_path, worker,
+                        on_crash)
+                    resume = i + 1
+                    break
+        finally:
+            ex.shutdown(wait=True, cancel_futures=True)
+        start = resume
+
+
+def _run_isolated(path: Path, args: argparse.Namespace, config_path: Path,
+    worker=_run_workbook, on_crash=_crashed):
+    from concurrent.futures import ProcessPoolExecutor
+    from concurrent.futures.process import BrokenProcessPool
+    with ProcessPoolExecutor(1, initializer=_init_worker, initargs=(
+        config_path,)) as ex:
+        try:
+            return ex.submit(worker, path, args).result()
+        except BrokenProcessPool:
+            return on_crash(path)
+
+
+def _scan_workbook(path: Path, args: argparse.Namespace) ->dict:
+    """Pool task for ``scan``: findings as plain rows plus the score, so
+    only one workbook's findings cross the process boundary at a time."""
+    try:
+        issues, cached, _ = _analyze_cached(path, args)
+    except Exception as e:
+        return {'path': path, 'error': str(e)}
+    return {'path': path, 'score': SCORING.score(issues.rule_counts()),
+        'cached': cached, 'rows': issues.rows()}
+
+
+def _scan_crashed(path: Path) ->dict:
+    return {'path': path, 'error':
+        'worker process crashed while analyzing this workbook'}
+
+
+def _add_analysis_args(p: argparse.ArgumentParser) ->None:
+    """Options shared by the per-workbook CLI and ``scan``."""
+    p.add_argument('--config', type=Path, default=None, help=
+        'Path to JSON config file with "only"/"skip" rule lists, scoring and declarative "rules"'
+    )
+    p.add_argument('--stream', action='store_true', help=
+        'Analyze with a bounded-memory iterparse pass instead of building the full tree'
+        )
+    p.add_argument('--jobs', '-j', type=int, default=1, help=
+        'Analyze workbooks in N worker processes (default: 1)')
+    p.add_argument('--no-cache', action='store_true', help=
+        'Bypass the result cache (neither read nor write entries)')
+    p.add_argument('--cache-dir', type=Path, default=DEFAULT_CACHE_DIR,
+        help=f'Result cache directory (default: {DEFAULT_CACHE_DIR})')
+    p.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_MB, help
+        =f'Result cache size limit in MB (default: {DEFAULT_CACHE_MB})')
+    p.add_argument('--db', type=Path, default=None, help=
+        'Also record the run in this SQLite findings database (see "query")'
+        )
+
+
+def _open_store(args: argparse.Namespace, command: str) ->(FindingsStore |
+    None):
+    """Start recording a run when --db is given (written by this process
+    only; pool workers just return their records)."""
+    if args.db is None:
+        return None
+    from findings_store import FindingsStore
+    return FindingsStore(args.db, RULES, command)
+
+
+def _record_scan(name: str, res: dict, writer: NdjsonWriter, summary:
+    PortfolioSummary, store: (FindingsStore | None), key: (str | None)=None
+    ) ->None:
+    """Report one ``_scan_workbook`` result and add it to the outputs; the
+    store records it under *key* (default: its path)."""
+    if 'error' in res:
+        print(f"▶ {name}  ⚠️  {res['error']}")
+        writer.error(name, res['error'])
+        summary.fail(name, res['error'])
+        return
+    rows = res['rows']
+    print(f"▶ {name}  🎯 {res['score']}  ({len(rows)} findings)")
+    writer.workbook(name, res['score'], rows, res['cached'])
+    summary.add(name, res['score'], Counter(r[0] for r in rows))
+    if store is not None:
+        store.add_workbook(res['path'] if key is None else key, res[
+            'score'], rows)
+
+
+def scan_main(argv: Sequence[str]) ->None:
+    """``main.py scan DIR``: analyze every workbook below DIR into one NDJSON
+    file and one summary HTML page, holding one workbook's findings at a
+    time."""
+    import html_report
+    import portfolio
+    p = argparse.ArgumentParser(prog='main.py scan', description=
+        'Analyze all workbooks below a directory into consolidated reports')
+    p.add_argument('directory', type=Path)
+    p.add_argument('--out', type=Path, default=None, help=
+        'Output path prefix (default: reports/portfolio_<timestamp>)')
+    p.add_argument('--include-datasources', action='store_true', help=
+        'Also scan published data sources (.tds/.tdsx)')
+    p.add_argument('--worst', type=int, default=25, help=
+        'Number of lowest-scoring workbooks to list (default: 25)')
+    _add_analysis_args(p)
+    args = p.parse_args(argv)
+    if not args.directory.is_dir():
+        p.error(f'not a directory: {args.directory}')
+    config_path = args.config or Path('tableau_optimizer.json')
+
+    global RULES, SCORING
+    RULES = load_rules(config_path)
+    SCORING = ScoringModel.from_config(RULES, config_path)
+
+    suffixes = portfolio.SCAN_SUFFIXES
+    if args.include_datasources:
+        suffixes += ('.tds', '.tdsx')
+    paths = list(portfolio.discover(args.directory, suffixes))
+    if args.out is None:
+        ts = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+        REPORT_DIR.mkdir(exist_ok=True)
+        args.out = REPORT_DIR / f'portfolio_{ts}'
+    else:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+    ndjson_file = args.out.with_name(args.out.name + '.ndjson')
+    html_file = args.out.with_name(args.out.name + '.html')
+    print(f'🔎  {len(paths)} workbooks under {args.directory}')
+
+    summary = portfolio.PortfolioSummary(RULES, SCORING, args.worst)
+    if args.jobs > 1 and len(paths) > 1:
+        results = _iter_parallel(paths, args, config_path, _scan_workbook,
+            _scan_crashed)
+    else:
+        results = (_scan_workbook(path, args) for path in paths)
+    store = _open_store(args, 'scan ' + str(args.directory))
+    try:
+        with open(ndjson_file, 'w', encoding='utf-8') as out:
+            writer = portfolio.NdjsonWriter(out, RULES)
+            for res in results:
+                name = res['path'].relative_to(args.directory).as_posix()
+                _record_scan(name, res, writer, summary, store)
+            writer.summary(summary)
+    except BaseException:
+        if store is not None:
+            store.abort()
+        raise
+    if store is not None:
+        store.close()
+    html_report.write_portfolio_report(html_file, str(args.directory),
+        summary)
+    median = summary.percentile(0.5)
+    print(f"  📊  {summary.workbooks} analyzed, {len(summary.failed)} failed, "
+        f"{summary.findings} findings, median score {'–' if median is None else median}"
+        )
+    print(f'  📦  NDJSON written to {ndjson_file}')
+    print(f'  📄  HTML summary written to {html_file}')
+    if store is not None:
+        print(f'  🗄️  Run recorded in {args.db}')
+    if not args.no_cache:
+        ResultCache(args.cache_dir, args.cache_size << 20).prune()
+    raise SystemExit(1 if summary.failed else 0)
+
+
+def fetch_main(argv: Sequence[str]) ->None:
+    """``main.py fetch URL``: page through a Tableau Server / Cloud site's
+    workbooks and analyze each download as it arrives, into the same
+    NDJSON and HTML outputs as ``scan``.  Workbooks whose ``updatedAt`` is
+    unchanged since the last run are skipped (``--force`` re-analyzes)."""
+    import asyncio
+    import html_report
+    import portfolio
+    import server_ingest
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+    from concurrent.futures.process import BrokenProcessPool
+    p = argparse.ArgumentParser(prog='main.py fetch', description=
+        'Download and analyze the workbooks of a Tableau Server site')
+    p.add_argument('url', help='Server URL, e.g. https://tableau.example.com'
+        )
+    p.add_argument('--site', default='', help=
+        'Site content URL (default: the Default site)')
+    p.add_argument('--token-name', default=os.environ.get(
+        'TABSCA_TOKEN_NAME', ''), help=
+        'Personal access token name (default: $TABSCA_TOKEN_NAME); the secret is read from $TABSCA_TOKEN_SECRET'
+        )
+    p.add_argument('--api-version', default=server_ingest.
+        DEFAULT_API_VERSION, help=
+        f'REST API version (default: {server_ingest.DEFAULT_API_VERSION})')
+    p.add_argument('--project', default=None, help=
+        'Only workbooks of this project')
+    p.add_argument('--include-extracts', action='store_true', help=
+        'Download packaged workbooks with their extracts')
+    p.add_argument('--downloads', type=int, default=4, help=
+        'Downloads in flight at once (default: 4)')
+    p.add_argument('--rate', type=float, default=10.0, help=
+        'Requests per second, 0 for no limit (default: 10)')
+    p.add_argument('--retries', type=int, default=4, help=
+        'Retries per request on connection errors, 429 and 5xx (default: 4)')
+    p.add_argument('--page-size', type=int, default=server_ingest.
+        DEFAULT_PAGE_SIZE, help=
+        f'Workbooks per listing page (default: {server_ingest.DEFAULT_PAGE_SIZE})'
+        )
+    p.add_argument('--force', action='store_true', help=
+        'Analyze workbooks even if unchanged since the last run')
+    p.add_argument('--out', type=Path, default=None, help=
+        'Output path prefix (default: reports/server_<timestamp>)')
+    p.add_argument('--worst', type=int, default=25, help=
+        'Number of lowest-scoring workbooks to list (default: 25)')
+    _add_analysis_args(p)
+    args = p.parse_args(argv)
+    secret = os.environ.get('TABSCA_TOKEN_SECRET', '')
+    if not args.token_name or not secret:
+        p.error('set --token-name (or $TABSCA_TOKEN_NAME) and '
+            '$TABSCA_TOKEN_SECRET')
+    if args.downloads < 1 or args.jobs < 1:
+        p.error('--downloads and --jobs must be at least 1')
+    config_path = args.config or Path('tableau_optimizer.json')
+
+    global RULES, SCORING
+    RULES = load_rules(config_path)
+    SCORING = ScoringModel.from_config(RULES, config_path)
+
+    if args.out is None:
+        ts = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+        REPORT_DIR.mkdir(exist_ok=True)
+        args.out = REPORT_DIR / f'server_{ts}'
+    else:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+    ndjson_file = args.out.with_name(args.out.name + '.ndjson')
+    html_file = args.out.with_name(args.out.name + '.html')
+    home = server_ingest.site_dir(args.cache_dir, args.url, args.site)
+    state = server_ingest.SyncState(home / 'state.json', _rule_selection(
+        config_path))
+    summary = portfolio.PortfolioSummary(RULES, SCORING, args.worst)
+    store = _open_store(args, f'fetch {args.url} {args.site}'.rstrip())
+    unchanged = 0
+
+    def new_pool():
+        if args.jobs == 1:
+            # One analysis at a time in this process; a thread keeps the
+            # event loop (and the downloads) going meanwhile.
+            return ThreadPoolExecutor(1)
+        return ProcessPoolExecutor(args.jobs, initializer=_init_worker,
+            initargs=(config_path,))
+    pool = [new_pool()]
+
+    async def analyze(path: Path) ->dict:
+        loop = asyncio.get_running_loop()
+        ex = pool[0]
+        try:
+            return await loop.run_in_executor(ex, _scan_workbook, path, args)
+        except BrokenProcessPool:
+            # As in _iter_parallel: replace the pool once and retry alone,
+            # so only the workbook that kills its worker is reported.
+            if pool[0] is ex:
+                pool[0] = new_pool()
+            return await loop.run_in_executor(None, _run_isolated, path,
+                args, config_path, _scan_workbook, _scan_crashed)
+
+    def on_result(entry, res: dict) ->None:
+        nonlocal unchanged
+        name = entry.label
+        key = server_ingest.workbook_key(args.url, args.site, entry)
+        if 'unchanged' in res:
+            unchanged += 1
+            score = res['unchanged'].get('score')
+            print(f'▶ {name}  ⏭️  unchanged since {entry.updated_at}')
+            writer.unchanged(name, score, entry.updated_at)
+            if store is not None:
+                store.carry_forward(key)
+            return
+        res.setdefault('path', None)
+        _record_scan(name, res, writer, summary, store, key)
+        if 'error' not in res:
+            state.record(entry, res['score'], len(res['rows']))
+
+    async def run() ->tuple[int, int]:
+        http = server_ingest.HttpPool(args.url, args.downloads + 1, args.
+            rate, args.retries)
+        client = server_ingest.TableauClient(http, args.site, args.
+            token_name, secret, args.api_version)
+        await client.sign_in()
+        try:
+            await server_ingest.ingest(client, home / 'spool', analyze,
+                on_result, None if args.force else state, args.downloads,
+                args.downloads + 2 * args.jobs, args.include_extracts, args
+                .page_size, args.project)
+        finally:
+            await client.sign_out()
+            await http.close()
+        return http.requests, http.retried
+
+    print(f"🌐  {args.url} site '{args.site or 'Default'}'")
+    fatal = None
+    requests = retried = 0
+    try:
+        with open(ndjson_file, 'w', encoding='utf-8') as out:
+            writer = portfolio.NdjsonWriter(out, RULES)
+            try:
+                requests, retried = asyncio.run(run())
+            except (server_ingest.HttpError, OSError, asyncio.TimeoutError
+                ) as e:
+                fatal = str(e) or type(e).__name__
+            finally:
+                state.save()
+            writer.summary(summary)
+    except BaseException:
+        if store is not None:
+            store.abort()
+        pool[0].shutdown(wait=False, cancel_futures=True)
+        raise
+    pool[0].shutdown()
+    if store is not None:
+        store.close()
+    html_report.write_portfolio_report(html_file, args.url, summary)
+    median = summary.percentile(0.5)
+    print(f"  📊  {summary.workbooks} analyzed, {unchanged} unchanged, {len(summary.failed)} failed, "
+        f"{summary.findings} findings, median score {'–' if median is None else median}"
+        )
+    if fatal is not None:
+        print(f'  ⚠️  {args.url}: {fatal}')
+    else:
+        print(f'  🌐  {requests} requests, {retried} retried')
+    print(f'  📦  NDJSON written to {ndjson_file}')
+    print(f'  📄  HTML summary written to {html_file}')
+    if store is not None:
+        print(f'  🗄️  Run recorded in {args.db}')
+    if not args.no_cache:
+        ResultCache(args.cache_dir, args.cache_size << 20).prune()
+    raise SystemExit(2 if fatal is not None else 1 if summary.failed else 0)
+
+
+def _print_table(head: Sequence[str], rows: list[tuple]) ->None:
+    table = [tuple(map(str, head))] + [tuple('–' if v is None else str(v) for
+        v in row) for row in rows]
+    widths = [max(len(r[i]) for r in table) for i in range(len(head))]
+    for row in table:
+        print('  '.join(v.ljust(w) for v, w in zip(row, widths)).rstrip())
+
+
+def query_main(argv: Sequence[str]) ->None:
+    """``main.py query``: answer history questions from the --db store."""
+    import findings_store
+    p = argparse.ArgumentParser(prog='main.py query', description=
+        'Query the SQLite findings database written with --db')
+    p.add_argument('--db', type=Path, default=findings_store.DEFAULT_DB,
+        help=f'Findings database (default: {findings_store.DEFAULT_DB})')
+    sub = p.add_subparsers(dest='what', required=True)
+    r = sub.add_parser('runs', help='Recorded runs, newest first')
+    r.add_argument('--limit', type=int, default=20)
+    t = sub.add_parser('trend', help='Health score per run')
+    t.add_argument('workbook', nargs='?', default='', help=
+        'Only workbooks whose path starts with this (a file, directory or file-name prefix)'
+        )
+    t.add_argument('--since', default='', help='ISO date, e.g. 2024-05-01')
+    w = sub.add_parser('worse', help=
+        'Workbooks whose latest score is below their first one since a date')
+    w.add_argument('--since', default='', help='ISO date, e.g. 2024-05-01')
+    d = sub.add_parser('diff', help=
+        'New and resolved findings between two runs (default: latest two)')
+    d.add_argument('workbook', nargs='?', default='', help=
+        'Only workbooks whose path starts with this (a file, directory or file-name prefix)'
+        )
+    d.add_argument('--from', dest='old', type=int, default=None, help=
+        'Older run id')
+    d.add_argument('--to', dest='new', type=int, default=None, help=
+        'Newer run id')
+    k = sub.add_parser('top-rules', help='Rules with the most findings')
+    k.add_argument('--run', type=int, default=None, help=
+        'Run id (default: latest)')
+    k.add_argument('--limit', type=int, default=10)
+    args = p.parse_args(argv)
+    if not args.db.exists():
+        p.error(f'no findings database at {args.db} (record runs with --db)')
+    conn = findings_store.connect(args.db)
+    try:
+        if args.what == 'runs':
+            _print_table(('run', 'started', 'workbooks', 'findings',
+                'mean score'), findings_store.runs(conn, args.limit))
+        elif args.what == 'trend':
+            _print_table(('workbook', 'run', 'started', 'score', 'findings'
+                ), findings_store.score_trend(conn, args.workbook, args.since))
+        elif args.what == 'worse':
+            _print_table(('workbook', 'was', 'now'), findings_store.
+                got_worse(conn, args.since))
+        elif args.what == 'diff':
+            try:
+                old, new, added, resolved = findings_store.finding_diff(conn,
+                    args.old, args.new, args.workbook)
+            except ValueError as e:
+                p.error(str(e))
+            print(f'Run {old} → {new}: {len(added)} new, {len(resolved)} resolved'
+                )
+            for mark, rows in (('+', added), ('-', resolved)):
+                for wb, rule_id, message in rows:
+                    print(f'{mark} {wb}  {rule_id}  {message}')
+        else:
+            _print_table(('rule', 'severity', 'group', 'findings',
+                'workbooks'), findings_store.top_rules(conn, args.run, args.
+                limit))
+    finally:
+        conn.close()
+    raise SystemExit(0)
+
+
+def _watch(args: argparse.Namespace) ->None:
+    """Re-analyze watched workbooks as they are saved, until Ctrl-C."""
+    import time
+    import watcher
+    w = watcher.Watcher([Path(wb) for wb in args.workbooks], debounce=args
+        .debounce, polling=args.poll)
+    print(f'👀  Watching {len(w.files())} workbooks ({w.backend}); press Ctrl-C to stop'
+        )
+    try:
+        for batch in w.batches():
+            for path in batch:
+                start = time.perf_counter()
+                lines, _, _ = _run_workbook(path, args)
+                elapsed = time.perf_counter() - start
+                lines[0] += f"  [{datetime.datetime.now():%H:%M:%S}, {elapsed * 1000:.0f} ms]"
+                for line in lines:
+                    print(line)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        w.close()
+
+
+def _rule_selection(config_path: Path) ->dict:
+    """The config's rule selection and scoring, as compared between daemon
+    and client."""
+    only, skip = read_rule_config(config_path)
+    weights, caps = read_scoring_config(config_path)
+    return {'only': sorted(only), 'skip': sorted(skip), 'weights': weights,
+        'group_caps': caps, 'rules': declarative_rules.
+        read_declarative_config(config_path)}
+
+
+def serve_main(argv: Sequence[str]) ->None:
+    """``main.py serve``: keep the rules loaded in a pool of worker
+    processes and answer analysis requests over local HTTP (or a Unix
+    socket) until interrupted."""
+    import signal
+    import threading
+    from concurrent.futures import ProcessPoolExecutor
+    import daemon
+    p = argparse.ArgumentParser(prog='main.py serve', description=
+        'Run a local analysis daemon with warm rules and a worker pool')
+    p.add_argument('--host', default=daemon.DEFAULT_HOST, help=
+        f'Interface to listen on (default: {daemon.DEFAULT_HOST})')
+    p.add_argument('--port', type=int, default=daemon.DEFAULT_PORT, help=
+        f'TCP port (default: {daemon.DEFAULT_PORT}; 0 picks a free one)')
+    p.add_argument('--socket', type=Path, default=None, help=
+        'Listen on this Unix socket instead of TCP')
+    p.add_argument('--queue', type=int, default=None, help=
+        'Requests that may wait for a worker before the daemon answers 503 (default: 4 per worker)'
+        )
+    p.add_argument('--max-upload', type=int, default=daemon.
+        DEFAULT_MAX_UPLOAD_MB, help=
+        f'Largest accepted upload in MB (default: {daemon.DEFAULT_MAX_UPLOAD_MB})'
+        )
+    p.add_argument('--verbose', action='store_true', help=
+        'Log every request')
+    _add_analysis_args(p)
+    p.set_defaults(jobs=os.cpu_count() or 1)
+    args = p.parse_args(argv)
+    if args.db is not None:
+        p.error('--db is not supported by serve')
+    config_path = args.config or Path('tableau_optimizer.json')
+
+    global RULES, SCORING
+    RULES = load_rules(config_path)
+    SCORING = ScoringModel.from_config(RULES, config_path)
+
+    jobs = max(1, args.jobs)
+    queue = daemon.WorkQueue(lambda : ProcessPoolExecutor(jobs,
+        initializer=_init_worker, initargs=(config_path,)), jobs, jobs * 4 if
+        args.queue is None else args.queue)
+    queue.warm(_warm)
+    prune_lock = threading.Lock()
+
+    def prune(analyzed: int) ->None:
+        if not args.no_cache and analyzed % daemon.PRUNE_EVERY == 0:
+            with prune_lock:
+                ResultCache(args.cache_dir, args.cache_size << 20).prune()
+    service = daemon.AnalysisService(queue, _scan_workbook, args, RULES,
+        _rule_selection(config_path), args.cache_dir / 'uploads', prune)
+    server = daemon.make_server(service, args.host, args.port, args.socket)
+    server.verbose = args.verbose
+    server.max_upload = args.max_upload << 20
+    address = daemon.address_of(server)
+    daemon.write_discovery(args.cache_dir, address)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f'🛰️  Serving {len(RULES)} rules on {address} with {jobs} workers')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.remove_discovery(args.cache_dir)
+        server.server_close()
+        queue.shutdown()
+        if args.socket is not None:
+            args.socket.unlink(missing_ok=True)
+        if not args.no_cache:
+            ResultCache(args.cache_dir, args.cache_size << 20).prune()
+    raise SystemExit(0)
+
+
+# Subcommands; anything else is the classic ``main.py WORKBOOK…`` form.
+COMMANDS = {'scan': scan_main, 'fetch': fetch_main, 'query': query_main,
+    'serve': serve_main}
 
 
 def main(argv: (Sequence[str] | None)=None) ->None:
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv and argv[0] in COMMANDS:
+        COMMANDS[argv[0]](argv[1:])
     p = argparse.ArgumentParser(description='Tableau Workbook Optimizer checks'
         )
-    p.add_argument('workbooks', nargs='+')
-    p.add_argument('--format', choices=['html', 'json', 'both'], default=
-        'html', help='Report output format (default: html)')
+    p.add_argument('workbooks', nargs='*')
+    p.add_argument('--format', choices=['html', 'json', 'both', *
+        LOCATED_FORMATS], default='html', help=
+        'Report output format; ndjson and sarif locate each finding (default: html)'
+        )
     p.add_argument('--fail-if-high', action='store_true', help=
         'Exit non-zero if any HIGH-severity findings are present')
     p.add_argument('--min-score', type=int, default=None, help=
         'Exit non-zero if health score falls below this threshold')
     p.add_argument('--fail-on', default='', help=
         'Comma‑separated rule IDs that trigger non‑zero exit')
-    p.add_argument('--config', type=Path, default=None, help=
-        'Path to JSON config file with "only" and/or "skip" rule lists'
-    )
+    p.add_argument('--fail-fast', action='store_true', help=
+        'Run the cheapest rules that can fail --fail-on/--fail-if-high/--min-score first and stop (skipping reports) as soon as the verdict is failing'
+        )
+    _add_analysis_args(p)
+    p.add_argument('--prune-cache', action='store_true', help=
+        'Evict least-recently-used cache entries down to --cache-size')
+    p.add_argument('--profile', action='store_true', help=
+        'Time each phase and rule and print a summary (also embedded in JSON reports)'
+        )
+    p.add_argument('--profile-alloc', action='store_true', help=
+        'Like --profile, and also track peak allocations per phase (slower)')
+    p.add_argument('--pstats', type=Path, default=None, help=
+        'Write cProfile stats for the analyzed workbook to this file')
+    p.add_argument('--daemon', default=None, metavar='ADDRESS', help=
+        'Analyze through the "serve" daemon at http://HOST:PORT or unix:PATH (default: the one advertised in --cache-dir, if running)'
+        )
+    p.add_argument('--no-daemon', action='store_true', help=
+        'Always analyze in this process, even if a daemon is running')
+    p.add_argument('--watch', action='store_true', help=
+        'Keep running and re-analyze workbooks (files, or directories searched recursively) when they are saved; reports are rewritten in place'
+        )
+    p.add_argument('--debounce', type=float, default=WATCH_DEBOUNCE, help=
+        f'--watch: seconds without writes before re-analyzing (default: {WATCH_DEBOUNCE})'
+        )
+    p.add_argument('--poll', action='store_true', help=
+        '--watch: poll for changes instead of using inotify')
 
     args = p.parse_args(argv)
-    fail_set = {r.upper() for r in args.fail_on.split(',') if r}
-    fmt = args.format
-    fail_if_high = args.fail_if_high
-    min_score = args.min_score
+    if args.prune_cache:
+        removed, kept = ResultCache(args.cache_dir, args.cache_size << 20
+            ).prune()
+        print(f'🧹  Cache pruned: {removed} entries removed, {kept / 1048576:.1f} MB kept')
+        if not args.workbooks:
+            raise SystemExit(0)
+    if not args.workbooks:
+        p.error('the following arguments are required: workbooks')
+    if args.pstats and len(args.workbooks) > 1:
+        p.error('--pstats profiles a single workbook')
+    if args.watch and (args.db is not None or args.pstats):
+        p.error('--watch cannot be combined with --db or --pstats')
+    if args.fail_fast and not (args.fail_on or args.fail_if_high or args.
+        min_score is not None):
+        p.error('--fail-fast needs --fail-on, --fail-if-high or --min-score')
     config_path  = args.config or Path("tableau_optimizer.json")
 
-    # then apply it to the already‐loaded RULES
-    global RULES
-    RULES = apply_rule_config(RULES, config_path)
+    global RULES, SCORING, DAEMON, WATCH_STATE
+    # Profiling measures this process, and the daemon does not locate
+    # findings, so neither goes through a daemon.
+    if not (args.no_daemon or args.profile or args.profile_alloc or args.
+        pstats or args.format in LOCATED_FORMATS):
+        if args.daemon is not None:
+            import daemon
+            DAEMON = daemon.connect(args.daemon, _rule_selection(config_path))
+            if DAEMON is None:
+                print(f'⚠️  No compatible daemon at {args.daemon}; analyzing locally')
+        elif (args.cache_dir / DAEMON_DISCOVERY).exists():
+            import daemon
+            DAEMON = daemon.discover(args.cache_dir, _rule_selection(
+                config_path))
+    if DAEMON is not None:
+        RULES = DAEMON.rules
+        print(f'🛰️  Analyzing through the daemon at {DAEMON.address}')
+    else:
+        RULES = load_rules(config_path)
+    SCORING = ScoringModel.from_config(RULES, config_path)
 
     exit_code = 0
-
-    for wb in args.workbooks:
-        path = Path(wb)
-        print(f'▶ {path.name}')
-        try:
-            issues = analyze_workbook(path)
-            weight = {'INFO': 0, 'LOW': 1, 'MEDIUM': 3, 'HIGH': 5}
-            severity_of = {r.id: r.severity for r in RULES}
-            penalty = sum(weight[severity_of[f.rule]] for f in issues)
-            health_score = max(0, 100 - penalty)
-            print(f'  🎯  Health Score: {health_score}')
-            if fail_if_high and any(severity_of[f.rule] == 'HIGH' for f in
-                issues):
-                print('⚠️  Aborting: HIGH-severity findings detected')
-                exit_code = 1
-            if min_score is not None and health_score < min_score:
-                print(
-                    f'⚠️  Aborting: health score {health_score} < threshold {min_score}'
-                    )
-                exit_code = 1
-        except Exception as e:
-            print(f'  ⚠️  {e}')
-            exit_code = 1
-            continue
-        if fmt in ('html', 'both'):
-            html_file = write_html_report(path, issues)
-            print(f'  📄  HTML report written to {html_file}')
-        if fmt in ('json', 'both'):
-            json_file = write_json_report(path, issues)
-            print(f'  📦  JSON report written to {json_file}')
-        if any(f.rule in fail_set for f in issues):
-            exit_code = 1
-    raise SystemExit(exit_code)
+    paths = [Path(wb) for wb in args.workbooks]
+    if args.watch:
+        from portfolio import discover
+        WATCH_STATE = {}
+        paths = [p for path in paths for p in (discover(path) if
+            path.is_dir() else [path])]
+    if DAEMON is not None and DAEMON.jobs > 1 and len(paths) > 1:
+        # The daemon's pool does the work; keep it busy from threads.
+        from concurrent.futures import ThreadPoolExecutor
+        pool = ThreadPoolExecutor(min(DAEMON.jobs, len(paths)))
+        results = pool.map(lambda path: _run_workbook(path, args), paths)
+    elif DAEMON is None and args.jobs > 1 and len(paths) > 1:
+        results = _iter_parallel(paths, args, config_path)
+    else:
+        results = (_run_workbook(path, args) for path in paths)
+    store = _open_store(args, ' '.join(args.workbooks))
+    try:
+        for path, (lines, code, record) in zip(paths, results):
+            for line in lines:
+                print(line)
+            exit_code = max(exit_code, code)
+            if store is not None and record is not None:
+                store.add_workbook(path, *record)
+    except BaseException:
+        if store is not None:
+            store.abort()
+        raise
+    if store is not None:
+        store.close()
+        print(f'🗄️  Run recorded in {args.db}')
+    if args.watch:
+        _watch(args)
+    if not args.no_cache and DAEMON is None:
+        ResultCache(args.cache_dir, args.cache_size << 20).prune()
+    raise SystemExit(0 if args.watch else exit_code)
 
 
 if __name__ == '__main__':
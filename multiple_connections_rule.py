@@ -1,19 +1,25 @@
 from __future__ import annotations
 from rule_base import Rule, Finding
-import xml.etree.ElementTree as ET
+from streaming import ScopedCountHandler, StreamHandler
+from workbook_index import WorkbookIndex
 
 class MultipleConnectionsRule(Rule):
     id = 'GMULTI_CONN'
     description = 'Single datasource uses many DB connections.'
     group = 'Connectivity'
     severity = 'MEDIUM'
+    scope = 'datasource'
 
-    def check(self, tree: ET.ElementTree) ->list[Finding]:
-        findings = []
-        for ds in tree.findall('.//datasource'):
-            conns = ds.findall('.//connection')
-            if len(conns) > 3:
-                findings.append(Finding(self.id,
-                    f"Datasource '{ds.get('name')}' has {len(conns)} connections."
-                    , 'NEEDS_REVIEW'))
-        return findings
\ No newline at end of file
+    def _report(self, ds, conns: int) ->(Finding | None):
+        if conns > 3:
+            return Finding(self.id,
+                "Datasource '{}' has {} connections.", 'NEEDS_REVIEW',
+                (ds.get('name'), conns), ds)
+        return None
+
+    def check_object(self, ds, index: WorkbookIndex) ->list[Finding]:
+        finding = self._report(ds, len(index.connections_of(ds)))
+        return [finding] if finding is not None else []
+
+    def stream(self) ->StreamHandler:
+        return ScopedCountHandler('datasource', 'connection', self._report)
@@ -0,0 +1,156 @@
+# portfolio.py
+
+from __future__ import annotations
+import heapq
+import json
+import os
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import IO, Iterator, Sequence
+
+from locations import Location
+from rule_base import Rule
+from scoring import ScoringModel, bands, percentile
+
+SCAN_SUFFIXES = ('.twb', '.twbx')
+
+
+def discover(root: Path, suffixes: tuple[str, ...] = SCAN_SUFFIXES
+             ) -> Iterator[Path]:
+    """Yield workbooks below *root* in a stable (sorted) order."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if name.lower().endswith(suffixes):
+                yield Path(dirpath) / name
+
+
+class PortfolioSummary:
+    """Running aggregates over a scan.  Findings are never kept: each
+    workbook adds one row of per-rule counts to a ``CountMatrix`` (4 bytes
+    per rule) and one byte of score, and ``stats`` scores the whole matrix
+    in one ``ScoringModel.portfolio`` call at the end.
+    """
+
+    def __init__(self, rules: list[Rule], scoring: ScoringModel,
+                 worst: int = 25):
+        self.rules = {r.id: r for r in rules}
+        self.scoring = scoring
+        self.worst_n = worst
+        self.workbooks = 0
+        self.findings = 0
+        self.failed: list[tuple[str, str]] = []
+        self.names: list[str] = []
+        self.scores = array('B')
+        self.counts = scoring.matrix()
+        self._stats: dict | None = None
+        self.by_rule: Counter[str] = Counter()
+        self.workbooks_by_rule: Counter[str] = Counter()
+        self.by_group: Counter[str] = Counter()
+        self.by_severity: Counter[str] = Counter()
+        # Max-heap on score (negated) holding the ``worst`` lowest scores.
+        self._worst: list[tuple[int, int, str, int, str]] = []
+
+    def add(self, workbook: str, score: int, counts: Counter[str]) -> None:
+        self.workbooks += 1
+        self.names.append(workbook)
+        self.scores.append(score)
+        self.counts.add(counts)
+        self._stats = None
+        total = sum(counts.values())
+        self.findings += total
+        for rule_id, n in counts.items():
+            rule = self.rules[rule_id]
+            self.by_rule[rule_id] += n
+            self.workbooks_by_rule[rule_id] += 1
+            self.by_group[rule.group] += n
+            self.by_severity[rule.severity] += n
+        top = counts.most_common(1)[0][0] if counts else ''
+        entry = (-score, -self.workbooks, workbook, total, top)
+        if len(self._worst) < self.worst_n:
+            heapq.heappush(self._worst, entry)
+        elif entry > self._worst[0]:
+            heapq.heapreplace(self._worst, entry)
+
+    def fail(self, workbook: str, error: str) -> None:
+        self.failed.append((workbook, error))
+
+    def worst(self) -> list[tuple[str, int, int, str]]:
+        """(workbook, score, findings, most frequent rule), lowest score
+        first; ties keep scan order."""
+        return [(wb, -neg, total, top) for neg, _, wb, total, top in
+                sorted(self._worst, key=lambda e: (-e[0], -e[1]))]
+
+    def percentile(self, q: float) -> int | None:
+        return percentile(sorted(self.scores), q)
+
+    def distribution(self) -> list[tuple[str, int]]:
+        """Workbook counts per score band (0–9, 10–19, …, 90–100)."""
+        return bands(self.scores)
+
+    def stats(self) -> dict:
+        """Percentiles, per-group score distributions and low outliers."""
+        if self._stats is None:
+            self._stats = self.scoring.portfolio(self.counts, self.names)
+        return self._stats
+
+    def as_dict(self) -> dict:
+        stats = self.stats()
+        return {
+            'workbooks': self.workbooks,
+            'failed': len(self.failed),
+            'findings': self.findings,
+            'median_score': self.percentile(0.5),
+            'mean_score': stats['mean_score'],
+            'percentiles': stats['percentiles'],
+            'group_scores': {g: {'median': v['median'], 'p10': v['p10']}
+                             for g, v in stats['groups'].items()},
+            'outliers': [{'workbook': wb, 'score': score}
+                         for wb, score in stats['outliers']],
+            'by_severity': dict(self.by_severity),
+            'by_group': dict(self.by_group),
+            'by_rule': dict(self.by_rule),
+        }
+
+
+class NdjsonWriter:
+    """One JSON object per line: a ``finding`` record for each finding,
+    then a ``workbook`` record with that workbook's score and counts."""
+
+    def __init__(self, out: IO[str], rules: list[Rule]):
+        self.out = out
+        self.rules = {r.id: r for r in rules}
+
+    def _line(self, record: dict) -> None:
+        self.out.write(json.dumps(record, ensure_ascii=False))
+        self.out.write('\n')
+
+    def workbook(self, workbook: str, score: int,
+                 rows: list[tuple[str, str, str]], cached: bool,
+                 locations: Sequence[Location | None] = ()) -> None:
+        """*locations*, if given, are per row and add ``xpath``, ``line``,
+        ``column`` and ``fingerprint`` to the finding records."""
+        for i, (rule_id, category, message) in enumerate(rows):
+            rule = self.rules[rule_id]
+            record = {'type': 'finding', 'workbook': workbook,
+                      'rule': rule_id, 'severity': rule.severity,
+                      'group': rule.group, 'category': category,
+                      'message': message}
+            location = locations[i] if locations else None
+            if location is not None:
+                record.update(location._asdict())
+            self._line(record)
+        self._line({'type': 'workbook', 'workbook': workbook, 'score': score,
+                    'findings': len(rows), 'cached': cached})
+
+    def unchanged(self, workbook: str, score: int, updated_at: str) -> None:
+        self._line({'type': 'workbook', 'workbook': workbook, 'score': score,
+                    'unchanged': True, 'updated_at': updated_at})
+
+    def error(self, workbook: str, error: str) -> None:
+        self._line({'type': 'workbook', 'workbook': workbook, 'score': None,
+                    'error': error})
+
+    def summary(self, summary: PortfolioSummary) -> None:
+        self._line({'type': 'summary', **summary.as_dict()})
@@ -0,0 +1,180 @@
+# profiling.py
+
+from __future__ import annotations
+import contextlib
+import time
+import tracemalloc
+from collections import defaultdict
+from typing import IO, Iterator, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from streaming import StreamHandler
+
+
+class Profiler:
+    """Collects wall time (and optionally allocation peaks) per phase.
+
+    Phases are free-form names; the analyzer uses ``open``, ``read``
+    (decompressing the XML member), ``parse``, ``index``, ``stream``,
+    ``cache``, ``rule:<ID>`` and ``report:<format>``.
+    """
+
+    enabled = True
+
+    def __init__(self, track_alloc: bool = False):
+        self.track_alloc = track_alloc
+        self.times: dict[str, float] = defaultdict(float)
+        self.alloc_peak: dict[str, int] = {}
+        self.findings: dict[str, int] = {}
+        self._booked = 0.0
+        self._started_tracing = False
+        if track_alloc and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        if self.track_alloc:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        booked0 = self._booked
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            # Phases are exclusive of time booked elsewhere while they ran
+            # (decompression via ``reader``, rule callbacks via ``handler``).
+            elapsed = time.perf_counter() - t0
+            self.times[name] += elapsed - (self._booked - booked0)
+            if self.track_alloc:
+                peak = tracemalloc.get_traced_memory()[1] - base
+                self.alloc_peak[name] = max(self.alloc_peak.get(name, 0), peak)
+
+    def rule(self, rule_id: str):
+        return self.phase(f'rule:{rule_id}')
+
+    def add_time(self, name: str, seconds: float) -> None:
+        self.times[name] += seconds
+        self._booked += seconds
+
+    def count_findings(self, rule_id: str, n: int) -> None:
+        self.findings[rule_id] = self.findings.get(rule_id, 0) + n
+
+    def reader(self, fh: IO[bytes]) -> IO[bytes]:
+        """Wrap a stream so time spent decompressing it is booked to
+        ``read`` rather than to whichever phase consumed it."""
+        return _TimedReader(fh, self)
+
+    def handler(self, handler: StreamHandler, rule_id: str) -> StreamHandler:
+        """Wrap a streaming handler so its callbacks are booked to the
+        rule, like ``check_index`` is in the tree-based path."""
+        return _TimedHandler(handler, self, f'rule:{rule_id}')
+
+    def close(self) -> None:
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    # ── output ───────────────────────────────────────────────────
+    def as_dict(self) -> dict:
+        out: dict = {
+            'phases': {k: round(v, 6) for k, v in self.times.items()
+                       if not k.startswith('rule:')},
+            'rules': {k[5:]: {'seconds': round(v, 6),
+                              'findings': self.findings.get(k[5:], 0)}
+                      for k, v in self.times.items() if k.startswith('rule:')},
+        }
+        if self.track_alloc:
+            out['alloc_peak_bytes'] = dict(self.alloc_peak)
+        return out
+
+    def summary_lines(self) -> list[str]:
+        rows = sorted(((k, v) for k, v in self.times.items() if v),
+                      key=lambda kv: -kv[1])
+        total = sum(v for _, v in rows) or 1.0
+        width = max((len(k) for k, _ in rows), default=5)
+        head = f"  {'phase':<{width}}  {'seconds':>9}  {'share':>6}  {'found':>6}"
+        if self.track_alloc:
+            head += f"  {'peak KB':>9}"
+        lines = ['  ⏱️  Profile', head]
+        for name, secs in rows:
+            found = self.findings.get(name[5:], 0) if name.startswith(
+                'rule:') else ''
+            line = (f'  {name:<{width}}  {secs:>9.4f}  {secs / total:>6.1%}'
+                    f'  {found!s:>6}')
+            if self.track_alloc:
+                line += f'  {self.alloc_peak.get(name, 0) / 1024:>9.1f}'
+            lines.append(line)
+        return lines
+
+
+class NullProfiler:
+    """Drop-in Profiler that records nothing; every hook is a constant."""
+
+    enabled = False
+    track_alloc = False
+    _NULL = contextlib.nullcontext()
+
+    def phase(self, name: str):
+        return self._NULL
+
+    def rule(self, rule_id: str):
+        return self._NULL
+
+    def add_time(self, name: str, seconds: float) -> None:
+        pass
+
+    def count_findings(self, rule_id: str, n: int) -> None:
+        pass
+
+    def reader(self, fh):
+        return fh
+
+    def handler(self, handler, rule_id):
+        return handler
+
+    def close(self) -> None:
+        pass
+
+
+NULL_PROFILER = NullProfiler()
+
+
+class _TimedReader:
+    def __init__(self, fh: IO[bytes], profiler: Profiler):
+        self._fh = fh
+        self._profiler = profiler
+
+    def read(self, size: int = -1) -> bytes:
+        t0 = time.perf_counter()
+        data = self._fh.read(size)
+        self._profiler.add_time('read', time.perf_counter() - t0)
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self._fh, name)
+
+
+class _TimedHandler:
+    def __init__(self, handler: StreamHandler, profiler: Profiler, name: str):
+        self._handler = handler
+        self._profiler = profiler
+        self._name = name
+        self.tags = handler.tags
+        self.keep = handler.keep
+
+    def _timed(self, fn, *args):
+        t0 = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self._profiler.add_time(self._name, time.perf_counter() - t0)
+
+    def start(self, elem, ctx):
+        return self._timed(self._handler.start, elem, ctx)
+
+    def end(self, elem, ctx):
+        self._timed(self._handler.end, elem, ctx)
+
+    def finish(self, ctx):
+        return self._timed(self._handler.finish, ctx)
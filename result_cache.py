@@ -0,0 +1,151 @@
+# result_cache.py
+
+from __future__ import annotations
+import hashlib
+import inspect
+import json
+import os
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+from typing import IO, Iterable
+
+from locations import Location
+from rule_base import Finding, Rule
+
+# Bump when the on-disk entry layout changes; old entries simply miss.
+CACHE_FORMAT = 2
+
+DEFAULT_CACHE_DIR = Path('.tabsca_cache')
+DEFAULT_CACHE_MB = 256
+
+_CHUNK = 1 << 20
+
+# Modules next to this one whose code decides what rules find (parsing,
+# indexing, streaming, locating); part of every rule's version.
+ANALYZER_MODULES = ('rule_base.py', 'workbook_index.py', 'workbook_loader.py',
+                    'streaming.py', 'calc_parser.py', 'sql_parser.py',
+                    'field_graph.py', 'locations.py')
+
+
+def hash_stream(fh: IO[bytes]) -> str:
+    """SHA-256 of a binary stream, read in chunks (no full copy in memory)."""
+    h = hashlib.sha256()
+    for chunk in iter(lambda: fh.read(_CHUNK), b''):
+        h.update(chunk)
+    return h.hexdigest()
+
+
+@lru_cache(maxsize=None)
+def _source_digest(filename: str) -> str:
+    try:
+        return hashlib.sha1(Path(filename).read_bytes()).hexdigest()[:12]
+    except OSError:
+        return ''
+
+
+@lru_cache(maxsize=None)
+def analyzer_version() -> str:
+    """Digest of the shared modules rules are built on; editing any of them
+    can change findings without touching a rule file."""
+    here = Path(__file__).resolve().parent
+    return hashlib.sha1(''.join(_source_digest(str(here / name))
+                                for name in ANALYZER_MODULES).encode()
+                        ).hexdigest()[:12]
+
+
+def rule_version(rule: Rule) -> str:
+    """Version of a rule: its optional ``version`` attribute plus digests
+    of the module source and of the analyzer's shared modules, so editing
+    a rule file or anything it builds on invalidates its entries."""
+    cls = type(rule)
+    try:
+        source = inspect.getsourcefile(cls) or ''
+    except TypeError:
+        # Modules exec'd from a file path are not in sys.modules; the code
+        # objects of the class's own methods still know where they live.
+        source = next((fn.__code__.co_filename for fn in vars(cls).values()
+                       if inspect.isfunction(fn)), '')
+    return (f"{getattr(rule, 'version', '')}:{_source_digest(source)}:"
+            f'{analyzer_version()}')
+
+
+def rule_signature(rules: Iterable[Rule]) -> str:
+    """Digest of the active rule set: ids, severities and versions, in the
+    order the analyzer runs them (findings are stored in that order)."""
+    h = hashlib.sha256(f'format={CACHE_FORMAT}'.encode())
+    for rule in rules:
+        h.update(f'\0{rule.id}|{rule.severity}|{rule_version(rule)}'.encode())
+    return h.hexdigest()
+
+
+class ResultCache:
+    """On-disk findings cache keyed by workbook XML and rule set.
+
+    Entries are small JSON files under ``directory``.  A hit refreshes the
+    entry's mtime, and ``prune`` evicts least-recently-used entries until
+    the cache fits in ``max_bytes`` (the CLI prunes once after each run).
+    """
+
+    def __init__(self, directory: Path = DEFAULT_CACHE_DIR,
+                 max_bytes: int = DEFAULT_CACHE_MB << 20):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def key(xml_digest: str, signature: str) -> str:
+        return hashlib.sha256(f'{xml_digest}:{signature}'.encode()).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f'{key}.json'
+
+    def get(self, key: str) -> list[Finding] | None:
+        path = self._path(key)
+        try:
+            rows = json.loads(path.read_text(encoding='utf-8'))
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        # Located runs store the Location after the three columns.
+        return [Finding(rule, message, category, location=Location(*where)
+                        if where else None)
+                for rule, message, category, *where in rows]
+
+    def put(self, key: str, findings: list[Finding]) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = json.dumps([[f.rule, f.message, f.category,
+                            *(f.location or ())] for f in findings],
+                          separators=(',', ':'))
+        # Write-then-rename keeps concurrent workers from seeing torn files.
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as fh:
+            fh.write(data)
+        os.replace(tmp, path)
+
+    def prune(self, max_bytes: int | None = None) -> tuple[int, int]:
+        """Evict oldest entries until the cache fits; returns (removed, kept
+        bytes)."""
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        entries = []
+        total = 0
+        for path in self.directory.glob('*/*.json'):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+        removed = 0
+        if total > limit:
+            entries.sort()
+            for _, size, path in entries:
+                if total <= limit:
+                    break
+                try:
+                    path.unlink()
+                except OSError:
+                    continue
+                total -= size
+                removed += 1
+        return removed, total
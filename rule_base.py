@@ -1,27 +1,112 @@
 # rule_base.py
 
+from __future__ import annotations
+import sys
 import xml.etree.ElementTree as ET
-from typing import List
+from typing import List, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from locations import Location
+    from streaming import StreamHandler
+    from workbook_index import WorkbookIndex
 
 class Finding:
-    """Represents a single rule violation (or informational message)."""
+    """Represents a single rule violation (or informational message).
+
+    Rule ids and categories are interned, so millions of findings share a
+    handful of strings.  Rules that report many objects pass a ``str.format``
+    template plus ``args`` instead of a formatted message; the template is
+    a shared constant and ``message`` is only built when read.
+
+    ``node`` is the element the finding is about (None: the workbook as a
+    whole).  Findings about something no element stands for (an archive
+    member, say) give a stable ``key`` (its name) instead.  Both are only
+    kept until ``locations.locate`` has turned them into a ``location``
+    (XPath, line/column and fingerprint).
+    """
+
+    __slots__ = ('rule', 'category', 'template', 'args', 'node', 'key',
+                 'location')
+
+    def __init__(self, rule: str, message: str, category: str,
+                 args: tuple = (), node: Optional[ET.Element] = None,
+                 location: Optional[Location] = None,
+                 key: Optional[str] = None):
+        self.rule     = sys.intern(rule)      # Rule ID (e.g. GBLEND)
+        self.category = sys.intern(category)  # TAKE_ACTION | NEEDS_REVIEW
+        self.template = message  # message, or its template when args given
+        self.args     = args
+        self.node     = node
+        self.key      = key
+        self.location = location
 
-    def __init__(self, rule: str, message: str, category: str):
-        self.rule     = rule      # Rule ID (e.g. GBLEND)
-        self.message  = message   # Human-readable finding message
-        self.category = category  # TAKE_ACTION | NEEDS_REVIEW
+    @property
+    def message(self) -> str:
+        """Human-readable finding message."""
+        if self.args:
+            return self.template.format(*self.args)
+        return self.template
 
     def __repr__(self) -> str:
         return f"<Finding {self.rule}: {self.message[:40]} …>"
 
+def anchor(findings: List[Finding], node: ET.Element) -> List[Finding]:
+    """Attach *findings* that have no element yet to *node*.  Per-object
+    findings are located at their scope element (or an element inside it
+    that the rule chose), however they were produced (fresh, streamed or
+    reused by an incremental run), so their fingerprints agree."""
+    for f in findings:
+        if f.node is None:
+            f.node = node
+    return findings
+
 class Rule:
-    """Abstract base class for all workbook rules."""
+    """Abstract base class for all workbook rules.
+
+    Subclasses implement one of:
+    - ``check(tree)`` – raw ElementTree;
+    - ``check_index(index)`` – shared WorkbookIndex built once per workbook;
+    - ``scope`` + ``check_object(elem, index)`` – per-object rules judged
+      one worksheet/dashboard/datasource at a time, which lets incremental
+      runs reuse findings for subtrees that did not change.
+    The analyzer always calls ``check_index``; the default dispatches to
+    ``check_object`` or ``check`` so older rules keep working unchanged.
+    """
 
     id: str          = "RULE"
     description: str = ""
     group: str       = "Uncategorized"
     severity: str    = "MEDIUM"  # INFO | LOW | MEDIUM | HIGH
+    scope: Optional[str] = None  # worksheet | dashboard | datasource
+    # Scheduling hints for --fail-fast: a relative cost estimate (1 = a
+    # constant-time index lookup, 10 = one pass over a scope's elements)
+    # and whether the rule stops at its first match or threshold.
+    cost: int            = 10
+    short_circuit: bool  = False
 
     def check(self, tree: ET.ElementTree) -> List[Finding]:
         """Return a list of findings for the given workbook XML tree."""
+        if type(self).check_index is Rule.check_index and self.scope is None:
+            raise NotImplementedError()
+        from workbook_index import WorkbookIndex
+        return self.check_index(WorkbookIndex(tree))
+
+    def check_index(self, index: WorkbookIndex) -> List[Finding]:
+        """Return a list of findings using the shared workbook index."""
+        if self.scope is not None:
+            findings: List[Finding] = []
+            for elem in index.findall(self.scope):
+                findings.extend(anchor(self.check_object(elem, index), elem))
+            return findings
+        return self.check(index.tree)
+
+    def check_object(self, elem: ET.Element, index: WorkbookIndex
+                     ) -> List[Finding]:
+        """Findings for one ``scope`` element.  Must depend only on that
+        element's subtree, so results can be reused while it is unchanged."""
         raise NotImplementedError()
+
+    def stream(self) -> Optional[StreamHandler]:
+        """Return a fresh handler for the streaming engine, or None if the
+        rule needs the whole tree (it is then skipped in --stream mode)."""
+        return None
@@ -0,0 +1,254 @@
+# rule_registry.py
+
+from __future__ import annotations
+import ast
+import importlib
+import importlib.util
+import inspect
+import json
+import os
+import sys
+from pathlib import Path
+from types import ModuleType
+from typing import Iterable
+
+from rule_base import Rule
+
+MANIFEST_VERSION = 1
+ENTRY_POINT_GROUP = 'tabsca.rules'
+RULE_GLOB = '*_rule.py'
+
+HERE = Path(__file__).resolve().parent
+# Built-in *_rule.py modules live next to main.py; rules/ is still honoured
+# for drop-in modules.
+DEFAULT_SEARCH_DIRS = (HERE, HERE / 'rules')
+DEFAULT_MANIFEST = Path('.tabsca_cache') / 'rule_manifest.json'
+
+_DEFAULTS = {'id': Rule.id, 'group': Rule.group, 'severity': Rule.severity,
+             'description': Rule.description}
+
+
+class RuleSpec:
+    """Everything known about a rule without importing its module."""
+
+    __slots__ = ('id', 'group', 'severity', 'description', 'module',
+                 'cls', 'entry_point')
+
+    def __init__(self, id: str, group: str, severity: str, description: str,
+                 module: str, cls: str, entry_point: bool = False):
+        self.id = id
+        self.group = group
+        self.severity = severity
+        self.description = description
+        self.module = module        # file path, or dotted name for plugins
+        self.cls = cls
+        self.entry_point = entry_point
+
+    def as_dict(self) -> dict:
+        return {'id': self.id, 'group': self.group, 'severity': self.severity,
+                'description': self.description, 'class': self.cls}
+
+    def __repr__(self) -> str:
+        return f'<RuleSpec {self.id} {self.module}:{self.cls}>'
+
+
+def _scan_module(path: Path) -> list[dict] | None:
+    """Read rule class attributes from source with ``ast``.
+
+    Returns None when some rule attribute is not a literal, in which case
+    the caller imports the module to find out.
+    """
+    tree = ast.parse(path.read_bytes(), filename=str(path))
+    known: dict[str, dict] = {'Rule': dict(_DEFAULTS)}
+    rules = []
+    for node in tree.body:
+        if not isinstance(node, ast.ClassDef):
+            continue
+        bases = [b.id if isinstance(b, ast.Name) else
+                 b.attr if isinstance(b, ast.Attribute) else None
+                 for b in node.bases]
+        parent = next((known[b] for b in bases if b in known), None)
+        if parent is None:
+            if any(b and b.endswith('Rule') for b in bases):
+                return None  # rule base imported from elsewhere
+            continue
+        attrs = dict(parent)
+        for stmt in node.body:
+            if isinstance(stmt, ast.Assign):
+                targets, value = stmt.targets, stmt.value
+            elif isinstance(stmt, ast.AnnAssign) and stmt.value is not None:
+                targets, value = [stmt.target], stmt.value
+            else:
+                continue
+            for target in targets:
+                if isinstance(target, ast.Name) and target.id in _DEFAULTS:
+                    if not isinstance(value, ast.Constant):
+                        return None
+                    attrs[target.id] = value.value
+        known[node.name] = attrs
+        if not node.name.startswith('_'):
+            rules.append({**attrs, 'class': node.name})
+    return rules
+
+
+def _rule_classes(mod: ModuleType) -> list[type[Rule]]:
+    """Public Rule subclasses defined in *mod*, in definition order.
+    Underscore classes are shared bases, not rules of their own."""
+    return [obj for name, obj in vars(mod).items()
+            if inspect.isclass(obj) and issubclass(obj, Rule)
+            and obj is not Rule and not name.startswith('_')
+            and obj.__module__ == mod.__name__]
+
+
+class RuleRegistry:
+    """Discovers rules through a cached manifest and imports them lazily.
+
+    The manifest records, per ``*_rule.py`` file, its mtime/size and the
+    id, group, severity and description of each rule class, so selecting
+    rules by ``only``/``skip`` needs no imports at all.  Rules shipped in
+    separate packages register under the ``tabsca.rules`` entry-point
+    group, with the rule id as the entry-point name.
+    """
+
+    def __init__(self, search_dirs: Iterable[Path] = DEFAULT_SEARCH_DIRS,
+                 manifest_path: Path | None = DEFAULT_MANIFEST,
+                 entry_points: bool = True):
+        self.search_dirs = [Path(d) for d in search_dirs]
+        self.manifest_path = manifest_path
+        self.entry_points = entry_points
+        self._modules: dict[str, ModuleType] = {}
+        self._specs: list[RuleSpec] | None = None
+
+    # ── discovery ────────────────────────────────────────────────
+    def specs(self) -> list[RuleSpec]:
+        if self._specs is None:
+            self._specs = self._file_specs()
+            if self.entry_points:
+                self._specs.extend(self._entry_point_specs())
+        return self._specs
+
+    def _read_manifest(self) -> dict:
+        if self.manifest_path is None:
+            return {}
+        try:
+            data = json.loads(self.manifest_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return {}
+        if data.get('version') != MANIFEST_VERSION:
+            return {}
+        return data.get('files', {})
+
+    def _write_manifest(self, files: dict) -> None:
+        if self.manifest_path is None:
+            return
+        try:
+            self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.manifest_path.with_suffix('.tmp')
+            tmp.write_text(json.dumps({'version': MANIFEST_VERSION,
+                                       'files': files}), encoding='utf-8')
+            os.replace(tmp, self.manifest_path)
+        except OSError:
+            pass  # read-only checkout: just rescan next time
+
+    def _file_specs(self) -> list[RuleSpec]:
+        cached = self._read_manifest()
+        files: dict[str, dict] = {}
+        seen: set[str] = set()
+        for directory in self.search_dirs:
+            if not directory.is_dir():
+                continue
+            for path in sorted(directory.glob(RULE_GLOB)):
+                key = str(path.resolve())
+                if key in seen:
+                    continue
+                seen.add(key)
+                st = path.stat()
+                entry = cached.get(key)
+                if not (entry and entry['mtime_ns'] == st.st_mtime_ns
+                        and entry['size'] == st.st_size):
+                    entry = {'mtime_ns': st.st_mtime_ns, 'size': st.st_size,
+                             'rules': self._describe(path)}
+                files[key] = entry
+        if files != cached:
+            self._write_manifest(files)
+        return [RuleSpec(r['id'], r['group'], r['severity'],
+                         r['description'], path, r['class'])
+                for path, entry in files.items() for r in entry['rules']]
+
+    def _describe(self, path: Path) -> list[dict]:
+        rules = _scan_module(path)
+        if rules is None:
+            mod = self._import_file(str(path))
+            rules = [{'id': c.id, 'group': c.group, 'severity': c.severity,
+                      'description': c.description, 'class': c.__name__}
+                     for c in _rule_classes(mod)]
+        return rules
+
+    def _entry_point_specs(self) -> list[RuleSpec]:
+        try:
+            from importlib.metadata import entry_points
+            eps = entry_points(group=ENTRY_POINT_GROUP)
+        except Exception:
+            return []
+        # group/severity are only known once the plugin is imported.
+        return [RuleSpec(ep.name.upper(), '', '', '', ep.value, '', True)
+                for ep in eps]
+
+    # ── selection / import ───────────────────────────────────────
+    @staticmethod
+    def select(specs: list[RuleSpec], only: set[str] = frozenset(),
+               skip: set[str] = frozenset()) -> list[RuleSpec]:
+        """Keep the *only* rules (all when empty), minus the *skip* ones;
+        applied before import."""
+        if only:
+            specs = [s for s in specs if s.id in only]
+        if skip:
+            specs = [s for s in specs if s.id not in skip]
+        return specs
+
+    def load(self, specs: Iterable[RuleSpec]) -> list[Rule]:
+        rules: list[Rule] = []
+        for spec in specs:
+            if spec.entry_point:
+                rules.extend(self._load_entry_point(spec))
+                continue
+            mod = self._import_file(spec.module)
+            rules.append(getattr(mod, spec.cls)())
+        return rules
+
+    def _import_file(self, path: str) -> ModuleType:
+        mod = self._modules.get(path)
+        if mod is not None:
+            return mod
+        stem = Path(path).stem
+        existing = sys.modules.get(stem)
+        if existing is not None and getattr(existing, '__file__', None) and \
+                Path(existing.__file__).resolve() == Path(path).resolve():
+            mod = existing
+        else:
+            spec = importlib.util.spec_from_file_location(stem, path)
+            mod = importlib.util.module_from_spec(spec)
+            # Registered so pickling, inspect and plain imports find it.
+            sys.modules.setdefault(stem, mod)
+            spec.loader.exec_module(mod)
+        self._modules[path] = mod
+        return mod
+
+    @staticmethod
+    def _load_entry_point(spec: RuleSpec) -> list[Rule]:
+        mod_name, _, attr = spec.module.partition(':')
+        obj = importlib.import_module(mod_name)
+        for part in filter(None, attr.split('.')):
+            obj = getattr(obj, part)
+        if inspect.isclass(obj) and issubclass(obj, Rule):
+            return [obj()]
+        return [cls() for cls in _rule_classes(obj)]
+
+
+def read_rule_config(config_path: Path | None) -> tuple[set[str], set[str]]:
+    """Return the upper-cased ``only`` and ``skip`` sets of a config file."""
+    if config_path is None or not config_path.exists():
+        return set(), set()
+    cfg = json.loads(config_path.read_text())
+    return ({r.upper() for r in cfg.get('only', [])},
+            {r.upper() for r in cfg.get('skip', [])})
@@ -0,0 +1,82 @@
+# sarif.py
+
+from __future__ import annotations
+import json
+import urllib.parse
+from typing import IO, Iterable
+
+from locations import Location
+from rule_base import Rule
+
+SCHEMA = 'https://json.schemastore.org/sarif-2.1.0.json'
+LEVELS = {'HIGH': 'error', 'MEDIUM': 'warning', 'LOW': 'note', 'INFO': 'note'}
+FINGERPRINT_KEY = 'tabsca/v1'
+
+
+class SarifWriter:
+    """A SARIF 2.1.0 log with one run, written as results are handed over:
+    ``result`` appends one result to the open ``results`` array and
+    ``close`` ends the document, so no result list is built in memory.
+
+    Results point at the workbook (*uri*) with the finding's line and
+    column, its XPath as the logical location and its fingerprint under
+    ``partialFingerprints``, which is what review tools match on to carry
+    suppressions across runs.  For packages, line and column are in the
+    XML *member*, so results point at the member, declared as an artifact
+    nested in the package (``parentIndex``), not at the zip itself.
+    """
+
+    def __init__(self, out: IO[str], rules: Iterable[Rule], uri: str,
+                 member: str | None = None):
+        self.out = out
+        artifacts = [{'location': {'uri': uri}}]
+        if member is not None:
+            artifacts.append({'location': {'uri': urllib.parse.quote(member)},
+                              'parentIndex': 0})
+        self._artifact = {'uri': artifacts[-1]['location']['uri'],
+                          'index': len(artifacts) - 1}
+        rules = list(rules)
+        self._index = {r.id: i for i, r in enumerate(rules)}
+        self._rules = {r.id: r for r in rules}
+        self._first = True
+        driver = {'name': 'TabSCA', 'rules': [
+            {'id': r.id, 'shortDescription': {'text': r.description or r.id},
+             'defaultConfiguration': {'level': LEVELS.get(r.severity,
+                                                          'warning')},
+             'properties': {'group': r.group, 'severity': r.severity}}
+            for r in rules]}
+        head = json.dumps({'$schema': SCHEMA, 'version': '2.1.0'},
+                          ensure_ascii=False)[:-1]
+        run = json.dumps({'tool': {'driver': driver},
+                          'artifacts': artifacts,
+                          'columnKind': 'unicodeCodePoints'},
+                         ensure_ascii=False)[:-1]
+        out.write(f'{head}, "runs": [{run}, "results": [\n')
+
+    def result(self, rule_id: str, category: str, message: str,
+               location: Location | None) -> None:
+        rule = self._rules[rule_id]
+        physical: dict = {'artifactLocation': self._artifact}
+        record: dict = {
+            'ruleId': rule_id, 'ruleIndex': self._index[rule_id],
+            'level': LEVELS.get(rule.severity, 'warning'),
+            'message': {'text': message},
+            'locations': [{'physicalLocation': physical}],
+            'properties': {'category': category},
+        }
+        if location is not None:
+            if location.line:
+                physical['region'] = {'startLine': location.line,
+                                      'startColumn': location.column}
+            record['locations'][0]['logicalLocations'] = [
+                {'fullyQualifiedName': location.xpath, 'kind': 'element'}]
+            record['partialFingerprints'] = {
+                FINGERPRINT_KEY: location.fingerprint}
+        if not self._first:
+            self.out.write(',\n')
+        self._first = False
+        self.out.write(json.dumps(record, ensure_ascii=False))
+
+    def close(self, score: int) -> None:
+        props = json.dumps({'healthScore': score})
+        self.out.write(f'\n], "properties": {props}}}]}}\n')
@@ -0,0 +1,203 @@
+# scoring.py
+
+from __future__ import annotations
+import json
+from array import array
+from pathlib import Path
+from typing import Iterable, Mapping, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # optional; the pure-Python path gives the same numbers
+    np = None
+
+DEFAULT_WEIGHTS = {'INFO': 0, 'LOW': 1, 'MEDIUM': 3, 'HIGH': 5}
+MAX_SCORE = 100
+PERCENTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+BAND_WIDTH = 10
+
+
+def read_scoring_config(config_path: Path | None
+                        ) -> tuple[dict[str, int], dict[str, int]]:
+    """Return the ``weights`` and ``group_caps`` of the config's
+    ``scoring`` section (empty when absent)::
+
+        {"scoring": {"weights": {"MEDIUM": 4},
+                     "group_caps": {"Data Hygiene": 20}}}
+    """
+    if config_path is None or not config_path.exists():
+        return {}, {}
+    cfg = json.loads(config_path.read_text()).get('scoring', {})
+    weights = {k.upper(): v for k, v in cfg.get('weights', {}).items()}
+    caps = dict(cfg.get('group_caps', {}))
+    for key, value in [*weights.items(), *caps.items()]:
+        if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+            raise ValueError(f'{config_path}: scoring value for {key!r} must '
+                             'be a non-negative integer')
+    unknown = set(weights) - set(DEFAULT_WEIGHTS)
+    if unknown:
+        raise ValueError(f'{config_path}: unknown severities in scoring '
+                         f"weights: {', '.join(sorted(unknown))}")
+    return weights, caps
+
+
+def percentile(ordered: Sequence[int], q: float) -> int | None:
+    """Nearest-rank percentile of an ascending sequence."""
+    if not len(ordered):
+        return None
+    return int(ordered[min(len(ordered), max(1, round(q * len(ordered)))) - 1])
+
+
+def bands(scores: Iterable[int], width: int = BAND_WIDTH
+          ) -> list[tuple[str, int]]:
+    """Counts per score band (0–9, 10–19, …, 90–100)."""
+    counts = [0] * (MAX_SCORE // width)
+    for score in scores:
+        counts[min(int(score) // width, len(counts) - 1)] += 1
+    return [(f'{i * width}–{i * width + width - (i < len(counts) - 1)}', n)
+            for i, n in enumerate(counts)]
+
+
+class CountMatrix:
+    """Per-rule finding counts of many workbooks: one row per workbook,
+    one column per rule of the model, stored flat as ``uint32`` so NumPy
+    can view it without copying."""
+
+    def __init__(self, columns: Mapping[str, int]):
+        self._columns = columns
+        self.width = len(columns)
+        self.data = array('I')
+        self.rows = 0
+
+    def add(self, counts: Mapping[str, int]) -> None:
+        row = [0] * self.width
+        for rule_id, n in counts.items():
+            row[self._columns[rule_id]] = n
+        self.data.extend(row)
+        self.rows += 1
+
+    def row(self, i: int) -> array:
+        return self.data[i * self.width:(i + 1) * self.width]
+
+
+class ScoringModel:
+    """The health score, in one place.
+
+    A workbook's penalty per rule group is the sum over its findings of the
+    rule's severity weight; a group's penalty counts towards the workbook
+    score only up to the group's cap (if any), and the score is
+    ``max(0, 100 - Σ capped group penalties)``.  Group scores are
+    ``max(0, 100 - group penalty)``.  Weights and caps come from the
+    ``scoring`` section of tableau_optimizer.json.
+
+    ``score_matrix`` scores many workbooks at once from a CountMatrix, as
+    array operations when NumPy is installed and row by row otherwise.
+    """
+
+    def __init__(self, rules: Iterable, weights: Mapping[str, int] |
+                 None = None, group_caps: Mapping[str, int] | None = None):
+        rules = list(rules)
+        self.weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        self.groups = sorted({r.group for r in rules})
+        group_index = {g: i for i, g in enumerate(self.groups)}
+        self.columns = {r.id: i for i, r in enumerate(rules)}
+        self.severity_of = {r.id: r.severity for r in rules}
+        self.rule_weight = [self.weights[r.severity] for r in rules]
+        self.rule_group = [group_index[r.group] for r in rules]
+        caps = group_caps or {}
+        self.caps = [caps.get(g) for g in self.groups]
+
+    @classmethod
+    def from_config(cls, rules: Iterable, config_path: Path | None
+                    ) -> ScoringModel:
+        weights, caps = read_scoring_config(config_path)
+        return cls(rules, weights, caps)
+
+    def matrix(self) -> CountMatrix:
+        return CountMatrix(self.columns)
+
+    # ── one workbook ──────────────────────────────────────────────
+    def group_penalties(self, counts: Mapping[str, int]) -> list[int]:
+        penalty = [0] * len(self.groups)
+        for rule_id, n in counts.items():
+            col = self.columns[rule_id]
+            penalty[self.rule_group[col]] += self.rule_weight[col] * n
+        return penalty
+
+    def _total(self, penalty: Sequence[int]) -> int:
+        return sum(p if cap is None else min(p, cap)
+                   for p, cap in zip(penalty, self.caps))
+
+    def score(self, counts: Mapping[str, int]) -> int:
+        """Health score from per-rule finding counts."""
+        return max(0, MAX_SCORE - self._total(self.group_penalties(counts)))
+
+    def group_scores(self, counts: Mapping[str, int]) -> dict[str, int]:
+        return {g: max(0, MAX_SCORE - p) for g, p in
+                zip(self.groups, self.group_penalties(counts))}
+
+    # ── many workbooks ────────────────────────────────────────────
+    def score_matrix(self, matrix: CountMatrix
+                     ) -> tuple[list[int], list[list[int]]]:
+        """Scores and per-group scores (one column per group) of every
+        row."""
+        if not matrix.rows:
+            return [], []
+        if np is not None:
+            counts = np.frombuffer(matrix.data, dtype=np.uint32).reshape(
+                matrix.rows, matrix.width).astype(np.int64)
+            membership = np.zeros((matrix.width, len(self.groups)), np.int64)
+            membership[np.arange(matrix.width), self.rule_group] = 1
+            penalty = (counts * np.asarray(self.rule_weight, np.int64)
+                       ) @ membership
+            caps = np.asarray([np.iinfo(np.int64).max if c is None else c
+                               for c in self.caps], np.int64)
+            total = np.minimum(penalty, caps).sum(axis=1)
+            scores = np.clip(MAX_SCORE - total, 0, MAX_SCORE)
+            group_scores = np.clip(MAX_SCORE - penalty, 0, MAX_SCORE)
+            return scores.tolist(), group_scores.tolist()
+        scores, group_scores = [], []
+        weight, group = self.rule_weight, self.rule_group
+        for i in range(matrix.rows):
+            penalty = [0] * len(self.groups)
+            for col, n in enumerate(matrix.row(i)):
+                if n:
+                    penalty[group[col]] += weight[col] * n
+            scores.append(max(0, MAX_SCORE - self._total(penalty)))
+            group_scores.append([max(0, MAX_SCORE - p) for p in penalty])
+        return scores, group_scores
+
+    def portfolio(self, matrix: CountMatrix, names: Sequence[str] = (),
+                  fence: float = 1.5) -> dict:
+        """Portfolio statistics in one call: score percentiles and mean,
+        per-group score percentiles and distributions, and low outliers
+        (scores below Q1 - fence × IQR, with the IQR at least one point),
+        worst first."""
+        scores, group_scores = self.score_matrix(matrix)
+        ordered = sorted(scores)
+        stats: dict = {
+            'workbooks': len(scores),
+            'mean_score': round(sum(scores) / len(scores), 1)
+            if scores else None,
+            'percentiles': {f'p{round(q * 100)}': percentile(ordered, q)
+                            for q in PERCENTILES},
+            'distribution': bands(scores),
+            'groups': {},
+            'outliers': [],
+        }
+        for g, group in enumerate(self.groups):
+            column = sorted(row[g] for row in group_scores)
+            stats['groups'][group] = {
+                'median': percentile(column, 0.5),
+                'p10': percentile(column, 0.1),
+                'distribution': bands(column),
+            }
+        if scores:
+            q1, q3 = percentile(ordered, 0.25), percentile(ordered, 0.75)
+            low = q1 - fence * max(q3 - q1, 1)
+            stats['low_fence'] = low
+            stats['outliers'] = sorted(
+                ((names[i] if i < len(names) else i, s)
+                 for i, s in enumerate(scores) if s < low),
+                key=lambda o: o[1])
+        return stats
@@ -0,0 +1,505 @@
+# server_ingest.py
+
+from __future__ import annotations
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import ssl
+import time
+import urllib.parse
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable, NamedTuple
+
+DEFAULT_API_VERSION = '3.19'
+DEFAULT_PAGE_SIZE = 100
+CHUNK = 1 << 16
+# Statuses worth another attempt after a pause (Retry-After if given).
+RETRY_STATUS = frozenset({429, 500, 502, 503, 504})
+MAX_BACKOFF = 30.0
+_FILENAME_RE = re.compile(r'filename\*?=(?:UTF-8\'\')?"?([^";]+)"?', re.I)
+
+
+class HttpError(Exception):
+    def __init__(self, method: str, target: str, status: int, reason: str,
+                 detail: str = ''):
+        super().__init__(f'{method} {target}: HTTP {status} {reason}'
+                         + (f' ({detail})' if detail else ''))
+        self.status = status
+
+
+class Response:
+    __slots__ = ('status', 'reason', 'headers', 'body')
+
+    def __init__(self, status: int, reason: str, headers: dict[str, str],
+                 body: bytes):
+        self.status = status
+        self.reason = reason
+        self.headers = headers  # lower-cased names
+        self.body = body
+
+    def json(self) -> dict:
+        return json.loads(self.body or b'{}')
+
+
+class RateLimiter:
+    """Token bucket shared by every request of a pool: *rate* requests per
+    second on average, bursts of up to *burst*.  A rate of 0 disables it."""
+
+    def __init__(self, rate: float, burst: int | None = None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self._tokens = float(self.capacity)
+        self._stamp = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens +
+                                   (now - self._stamp) * self.rate)
+                self._stamp = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class _Connection:
+    __slots__ = ('reader', 'writer')
+
+    def __init__(self, reader: asyncio.StreamReader,
+                 writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+class HttpPool:
+    """Keep-alive HTTP/1.1 connections to one server, on asyncio streams.
+
+    At most *size* requests are on the wire at once, each waits for the
+    rate limiter, and connection errors, timeouts and RETRY_STATUS replies
+    are retried up to *retries* times with exponential backoff and jitter
+    (or after the server's Retry-After).  A kept-alive connection the
+    server has since closed is replaced without using up an attempt.
+    """
+
+    def __init__(self, base_url: str, size: int = 4, rate: float = 0.0,
+                 retries: int = 4, backoff: float = 0.5,
+                 timeout: float = 60.0):
+        url = urllib.parse.urlsplit(base_url)
+        if url.scheme not in ('http', 'https') or not url.hostname:
+            raise ValueError(f'not an http(s) URL: {base_url}')
+        self.host = url.hostname
+        self.port = url.port or (443 if url.scheme == 'https' else 80)
+        self.authority = url.netloc.rpartition('@')[2]
+        self.prefix = url.path.rstrip('/')
+        self._ssl = ssl.create_default_context() if url.scheme == 'https' \
+            else None
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.limiter = RateLimiter(rate)
+        self.headers: dict[str, str] = {}  # sent with every request
+        self.requests = 0
+        self.retried = 0
+        self._slots = asyncio.Semaphore(size)
+        self._idle: list[_Connection] = []
+
+    async def _io(self, aw: Awaitable):
+        return await asyncio.wait_for(aw, self.timeout)
+
+    async def _connect(self) -> _Connection:
+        reader, writer = await self._io(asyncio.open_connection(
+            self.host, self.port, ssl=self._ssl, limit=CHUNK))
+        return _Connection(reader, writer)
+
+    async def _body(self, reader: asyncio.StreamReader,
+                    headers: dict[str, str]) -> AsyncIterator[bytes]:
+        if 'chunked' in headers.get('transfer-encoding', '').lower():
+            while True:
+                line = await self._io(reader.readline())
+                size = int(line.split(b';', 1)[0].strip() or b'0', 16)
+                if not size:
+                    while (await self._io(reader.readline())).strip():
+                        pass  # trailers
+                    return
+                while size:
+                    data = await self._io(reader.readexactly(min(size, CHUNK)))
+                    size -= len(data)
+                    yield data
+                await self._io(reader.readexactly(2))
+        elif 'content-length' in headers:
+            left = int(headers['content-length'])
+            while left:
+                data = await self._io(reader.read(min(left, CHUNK)))
+                if not data:
+                    raise ConnectionError('connection closed mid-response')
+                left -= len(data)
+                yield data
+        else:
+            while data := await self._io(reader.read(CHUNK)):
+                yield data
+
+    async def _exchange(self, conn: _Connection, method: str, target: str,
+                        body: bytes | None, headers: dict[str, str],
+                        sink) -> tuple[Response, bool]:
+        head = {'Host': self.authority, 'User-Agent': 'TabSCA',
+                'Accept-Encoding': 'identity', **self.headers, **headers}
+        if body is not None:
+            head['Content-Length'] = str(len(body))
+        conn.writer.write(f'{method} {target} HTTP/1.1\r\n'.encode('latin-1')
+                          + ''.join(f'{k}: {v}\r\n' for k, v in head.items()
+                                    ).encode('latin-1') + b'\r\n'
+                          + (body or b''))
+        await self._io(conn.writer.drain())
+        line = await self._io(conn.reader.readline())
+        if not line:
+            raise ConnectionError('server closed the connection')
+        version, status, reason = (line.decode('latin-1').rstrip('\r\n')
+                                   .split(' ', 2) + [''])[:3]
+        status = int(status)
+        fields: dict[str, str] = {}
+        while (line := await self._io(conn.reader.readline())).strip():
+            name, _, value = line.decode('latin-1').partition(':')
+            fields[name.strip().lower()] = value.strip()
+        parts: list[bytes] = []
+        if method != 'HEAD' and status >= 200 and status not in (204, 304):
+            into = sink if sink is not None and 200 <= status < 300 else None
+            async for data in self._body(conn.reader, fields):
+                if into is not None:
+                    into.write(data)
+                else:
+                    parts.append(data)
+        keep = (version == 'HTTP/1.1' and
+                fields.get('connection', '').lower() != 'close' and
+                ('content-length' in fields or 'transfer-encoding' in fields
+                 or method == 'HEAD' or status in (204, 304)))
+        return Response(status, reason, fields, b''.join(parts)), keep
+
+    def _delay(self, attempt: int, resp: Response | None) -> float:
+        if resp is not None and resp.headers.get('retry-after', ''
+                                                 ).isdigit():
+            return min(float(resp.headers['retry-after']), MAX_BACKOFF)
+        cap = min(MAX_BACKOFF, self.backoff * 2 ** attempt)
+        return cap / 2 + random.uniform(0, cap / 2)
+
+    async def request(self, method: str, path: str, body: bytes | None =
+                      None, headers: dict[str, str] | None = None,
+                      sink=None) -> Response:
+        """Send a request for *path* (below the base URL's path).  A 2xx
+        body is written to *sink* (a binary file, rewound on retry) if
+        given; other bodies are kept on the response.  Raises the last
+        connection error once the retries are spent; a status is returned
+        as is."""
+        target = self.prefix + path
+        attempt = 0
+        while True:
+            await self.limiter.acquire()
+            resp = error = None
+            async with self._slots:
+                conn = self._idle.pop() if self._idle else None
+                reused = conn is not None
+                try:
+                    if conn is None:
+                        conn = await self._connect()
+                    if sink is not None:
+                        sink.seek(0)
+                        sink.truncate()
+                    self.requests += 1
+                    resp, keep = await self._exchange(
+                        conn, method, target, body, headers or {}, sink)
+                except (OSError, asyncio.TimeoutError,
+                        asyncio.IncompleteReadError, ValueError) as e:
+                    if conn is not None:
+                        conn.close()
+                    error = e
+                else:
+                    if keep:
+                        self._idle.append(conn)
+                    else:
+                        conn.close()
+            if error is not None and reused and \
+                    not isinstance(error, asyncio.TimeoutError):
+                continue  # stale keep-alive connection
+            if error is None and resp.status not in RETRY_STATUS:
+                return resp
+            if attempt == self.retries:
+                if error is not None:
+                    raise error
+                return resp
+            self.retried += 1
+            await asyncio.sleep(self._delay(attempt, resp))
+            attempt += 1
+
+    async def close(self) -> None:
+        while self._idle:
+            self._idle.pop().close()
+
+
+class WorkbookEntry(NamedTuple):
+    id: str
+    name: str
+    project: str
+    updated_at: str
+    content_url: str
+
+    @property
+    def label(self) -> str:
+        return f'{self.project}/{self.name}' if self.project else self.name
+
+
+class TableauClient:
+    """The slice of the Tableau REST API the ingestion needs: sign in with
+    a personal access token, page through a site's workbooks and download
+    their content.  Requests and replies are JSON; an expired session is
+    signed in again once."""
+
+    def __init__(self, pool: HttpPool, site: str, token_name: str,
+                 token_secret: str, api_version: str = DEFAULT_API_VERSION):
+        self.pool = pool
+        self.site = site
+        self.api = f'/api/{api_version}'
+        self._credentials = {'personalAccessTokenName': token_name,
+                             'personalAccessTokenSecret': token_secret,
+                             'site': {'contentUrl': site}}
+        self.site_id = ''
+
+    async def sign_in(self) -> None:
+        self.pool.headers.pop('X-Tableau-Auth', None)
+        resp = await self.pool.request(
+            'POST', f'{self.api}/auth/signin',
+            json.dumps({'credentials': self._credentials}).encode(),
+            {'Content-Type': 'application/json',
+             'Accept': 'application/json'})
+        if resp.status != 200:
+            raise HttpError('POST', 'auth/signin', resp.status, resp.reason,
+                            _error_detail(resp))
+        creds = resp.json()['credentials']
+        self.site_id = creds['site']['id']
+        self.pool.headers['X-Tableau-Auth'] = creds['token']
+
+    async def sign_out(self) -> None:
+        try:
+            await self.pool.request('POST', f'{self.api}/auth/signout', b'')
+        except (OSError, asyncio.TimeoutError):
+            pass
+        self.pool.headers.pop('X-Tableau-Auth', None)
+
+    async def _call(self, method: str, path: str, sink=None) -> Response:
+        url = f'{self.api}/sites/{self.site_id}{path}'
+        headers = {'Accept': 'application/json'}
+        resp = await self.pool.request(method, url, None, headers, sink)
+        if resp.status == 401:
+            await self.sign_in()
+            url = f'{self.api}/sites/{self.site_id}{path}'
+            resp = await self.pool.request(method, url, None, headers, sink)
+        if not 200 <= resp.status < 300:
+            raise HttpError(method, path, resp.status, resp.reason,
+                            _error_detail(resp))
+        return resp
+
+    async def _page(self, number: int, size: int, project: str | None
+                    ) -> tuple[list[WorkbookEntry], int]:
+        query = {'pageSize': size, 'pageNumber': number}
+        if project:
+            query['filter'] = f'projectName:eq:{project}'
+        data = (await self._call(
+            'GET', f'/workbooks?{urllib.parse.urlencode(query)}')).json()
+        entries = [WorkbookEntry(w['id'], w.get('name', w['id']),
+                                 w.get('project', {}).get('name', ''),
+                                 w.get('updatedAt', ''),
+                                 w.get('contentUrl', ''))
+                   for w in data.get('workbooks', {}).get('workbook', [])]
+        return entries, int(data.get('pagination', {}).get(
+            'totalAvailable', 0))
+
+    async def workbooks(self, page_size: int = DEFAULT_PAGE_SIZE,
+                        project: str | None = None
+                        ) -> AsyncIterator[WorkbookEntry]:
+        """Every workbook of the site (of *project*, if given), fetching
+        the next page while the current one is consumed."""
+        number = 1
+        page = asyncio.ensure_future(self._page(number, page_size, project))
+        while page is not None:
+            entries, total = await page
+            page = None
+            if entries and number * page_size < total:
+                number += 1
+                page = asyncio.ensure_future(self._page(number, page_size,
+                                                        project))
+            try:
+                for entry in entries:
+                    yield entry
+            except BaseException:
+                if page is not None:
+                    page.cancel()
+                raise
+
+    async def download(self, entry: WorkbookEntry, spool: Path,
+                       include_extract: bool = False) -> Path:
+        """Stream the workbook's content to ``spool/<id>/<file name>``
+        (.twb or .twbx, as the server names it)."""
+        folder = spool / entry.id
+        folder.mkdir(parents=True, exist_ok=True)
+        part = folder / '.download'
+        query = 'true' if include_extract else 'false'
+        try:
+            with open(part, 'wb') as sink:
+                resp = await self._call(
+                    'GET', f'/workbooks/{entry.id}/content'
+                    f'?includeExtract={query}', sink)
+        except BaseException:
+            _discard(part)
+            raise
+        packaged = _is_zip(part)
+        match = _FILENAME_RE.search(resp.headers.get('content-disposition',
+                                                     ''))
+        name = urllib.parse.unquote(match.group(1)) if match else entry.name
+        if Path(name).suffix.lower() not in ('.twb', '.twbx'):
+            name += '.twbx' if packaged else '.twb'
+        path = folder / re.sub(r'[^\w.() -]+', '_', name).lstrip('.')
+        os.replace(part, path)
+        return path
+
+
+def _is_zip(path: Path) -> bool:
+    with open(path, 'rb') as fh:
+        return fh.read(4) == b'PK\x03\x04'
+
+
+def _error_detail(resp: Response) -> str:
+    """The summary/detail of a REST error body, if it is one."""
+    try:
+        error = resp.json().get('error', {})
+    except ValueError:
+        return ''
+    return ': '.join(str(error[k]) for k in ('summary', 'detail')
+                     if error.get(k))
+
+
+class SyncState:
+    """``updatedAt`` of every workbook analyzed by earlier runs against one
+    site, so unchanged ones are skipped.  The state is discarded when the
+    rule selection it was recorded under differs from the current one."""
+
+    def __init__(self, path: Path, selection: dict):
+        self.path = path
+        self.selection = selection
+        try:
+            data = json.loads(path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            data = {}
+        self.seen: dict[str, dict] = data.get('workbooks', {}) \
+            if data.get('selection') == selection else {}
+
+    def unchanged(self, entry: WorkbookEntry) -> dict | None:
+        """The last run's record of *entry* if it has not changed since."""
+        record = self.seen.get(entry.id)
+        if record is not None and entry.updated_at and \
+                record.get('updatedAt') == entry.updated_at:
+            return record
+        return None
+
+    def record(self, entry: WorkbookEntry, score: int, findings: int
+               ) -> None:
+        self.seen[entry.id] = {'updatedAt': entry.updated_at,
+                               'name': entry.label, 'score': score,
+                               'findings': findings}
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix('.tmp')
+        tmp.write_text(json.dumps({'selection': self.selection,
+                                   'workbooks': self.seen}),
+                       encoding='utf-8')
+        os.replace(tmp, self.path)
+
+
+def workbook_key(base_url: str, site: str, entry: WorkbookEntry) -> str:
+    """Stable name of a server workbook for the findings history, which
+    must not record the spooled download (deleted once analyzed).  Like
+    SyncState it goes by the workbook id, so renaming or moving a workbook
+    keeps its history and two workbooks with the same label do not share
+    one; ``entry.label`` is only for display."""
+    base = base_url.rstrip('/')
+    if site:
+        base += f'/sites/{site}'
+    return f'{base}/workbooks/{entry.id}'
+
+
+def site_dir(cache_dir: Path, base_url: str, site: str) -> Path:
+    """Per-site directory below the cache for the spool and SyncState."""
+    key = hashlib.sha256(f'{base_url.rstrip("/")}|{site}'.encode())
+    return Path(cache_dir) / 'server' / key.hexdigest()[:16]
+
+
+def _discard(path: Path) -> None:
+    try:
+        path.unlink()
+        path.parent.rmdir()
+    except OSError:
+        pass
+
+
+async def ingest(client: TableauClient, spool: Path,
+                 analyze: Callable[[Path], Awaitable[dict]],
+                 on_result: Callable[[WorkbookEntry, dict], None],
+                 state: SyncState | None = None, downloads: int = 4,
+                 window: int = 8, include_extract: bool = False,
+                 page_size: int = DEFAULT_PAGE_SIZE,
+                 project: str | None = None) -> None:
+    """Page through the site's workbooks and, for each one *state* does not
+    report unchanged, download it into *spool* and ``await analyze(path)``;
+    the spooled file is removed once analyzed.
+
+    At most *downloads* downloads are in flight and at most *window*
+    workbooks are between download and result, so the spool stays small
+    while the analyzer is kept busy.  ``on_result(entry, result)`` gets
+    the analyzer's dict, ``{'error': …}`` for a failed download, or
+    ``{'unchanged': record}`` for a skipped workbook, in completion order.
+    """
+    fetching = asyncio.Semaphore(downloads)
+    slots = asyncio.Semaphore(window)
+    tasks: set[asyncio.Task] = set()
+
+    async def one(entry: WorkbookEntry) -> None:
+        path = None
+        try:
+            async with fetching:
+                path = await client.download(entry, spool, include_extract)
+            result = await analyze(path)
+        except (HttpError, OSError, asyncio.TimeoutError,
+                asyncio.IncompleteReadError) as e:
+            result = {'error': str(e) or type(e).__name__}
+        finally:
+            if path is not None:
+                _discard(path)
+            slots.release()
+        on_result(entry, result)
+
+    try:
+        async for entry in client.workbooks(page_size, project):
+            record = state.unchanged(entry) if state is not None else None
+            if record is not None:
+                on_result(entry, {'unchanged': record})
+                continue
+            await slots.acquire()
+            task = asyncio.create_task(one(entry))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        while tasks:
+            await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
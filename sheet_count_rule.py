@@ -1,14 +1,24 @@
 from __future__ import annotations
 from rule_base import Rule, Finding
-import xml.etree.ElementTree as ET
+from streaming import StreamHandler, TagCountHandler
+from workbook_index import WorkbookIndex
 
 class SheetCountRule(Rule):
     id = 'GSHEETS'
     description = 'Workbook contains an unusually high number of sheets (>50).'
     group = 'Design Complexity'
     severity = 'MEDIUM'
+    cost = 1
+    short_circuit = True
+    threshold = 50
 
-    def check(self, tree: ET.ElementTree) ->list[Finding]:
-        sheets = tree.findall('.//worksheet')
-        return [Finding(self.id, f'Workbook has {len(sheets)} sheets.',
-            'NEEDS_REVIEW')] if len(sheets) > 50 else []
\ No newline at end of file
+    def _report(self, sheets: int) ->list[Finding]:
+        return [Finding(self.id, f'Workbook has {sheets} sheets.',
+            'NEEDS_REVIEW')] if sheets > self.threshold else []
+
+    def check_index(self, index: WorkbookIndex) ->list[Finding]:
+        return self._report(index.count('worksheet'))
+
+    def stream(self) ->StreamHandler:
+        return TagCountHandler('worksheet', self._report,
+            limit=self.threshold + 1)
@@ -0,0 +1,229 @@
+# sql_parser.py
+
+from __future__ import annotations
+import hashlib
+import re
+from collections import OrderedDict
+from typing import Iterator
+
+# Custom SQL is copied between workbooks with its connection, so distinct
+# statements are few; keep the measured ones.
+CACHE_SIZE = 4096
+
+# First keywords of statements that only configure the session.
+SESSION_VERBS = frozenset({'SET', 'USE', 'ALTER SESSION', 'DECLARE'})
+# Clauses that end a FROM list.
+_CLAUSES = frozenset({'WHERE', 'GROUP', 'HAVING', 'ORDER', 'LIMIT', 'QUALIFY',
+                      'WINDOW', 'FETCH', 'OFFSET'})
+_SET_OPS = frozenset({'UNION', 'EXCEPT', 'INTERSECT', 'MINUS'})
+_STAR_AFTER = frozenset({'SELECT', 'DISTINCT', 'ALL', ',', '.'})
+
+
+# ── tokenizer ────────────────────────────────────────────────────────
+_TOKEN_RE = re.compile(r"""
+    (?P<ws>\s+)
+  | (?P<comment>--[^\n]*|/\*.*?(?:\*/|\Z))
+  | (?P<param><\[[^\]]*\](?:\.\[[^\]]*\])*>)
+  | (?P<str>'(?:[^']|'')*(?:'|\Z))
+  | (?P<name>"(?:[^"]|"")*(?:"|\Z)|\[(?:[^\]]|\]\])*(?:\]|\Z)|`[^`]*(?:`|\Z))
+  | (?P<num>(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)
+  | (?P<ident>[A-Za-z_@#$][A-Za-z0-9_@#$]*)
+  | (?P<op>.)
+""", re.S | re.X)
+
+
+class Token:
+    __slots__ = ('kind', 'value')
+
+    def __init__(self, kind: str, value: str):
+        self.kind = kind    # param | str | name | num | ident | op
+        self.value = value  # identifiers are upper-cased
+
+    def __repr__(self) -> str:
+        return f'<Token {self.kind} {self.value!r}>'
+
+
+def tokenize(sql: str) -> Iterator[Token]:
+    """Lexical tokens of *sql*, without whitespace and comments.  Never
+    raises: anything unrecognized is a one-character ``op``, and
+    unterminated quotes run to the end."""
+    for m in _TOKEN_RE.finditer(sql):
+        kind = m.lastgroup
+        if kind in ('ws', 'comment'):
+            continue
+        value = m.group()
+        yield Token(kind, value.upper() if kind == 'ident' else value)
+
+
+# ── analysis ─────────────────────────────────────────────────────────
+class _Block:
+    """State of the query block at one parenthesis depth."""
+
+    __slots__ = ('query', 'clause', 'where', 'commas', 'pending', 'table')
+
+    def __init__(self):
+        self.reset()
+        self.query = False
+
+    def reset(self) -> None:
+        self.clause: str | None = None
+        self.where = False
+        self.commas = 0       # comma-joined tables in the FROM list
+        self.pending = False  # JOIN still waiting for ON / USING
+        self.table = False    # next name is a table reference
+
+
+class SqlInfo:
+    """Measurements of one SQL text (custom SQL or initial SQL).
+
+    The analysis is lexical: it tracks SELECT blocks by parenthesis depth
+    rather than building a tree, which is enough for the patterns the
+    connectivity rules look for and never fails on dialect syntax.
+    """
+
+    __slots__ = ('statements', 'verbs', 'tables', 'joins', 'cartesian',
+                 'select_star', 'subquery_depth', 'order_by', 'cte')
+
+    def __init__(self, sql: str):
+        self.statements = 0
+        self.verbs: tuple[str, ...] = ()
+        self.tables = 0
+        self.joins = 0
+        self.cartesian = False
+        self.select_star = False
+        self.subquery_depth = 0
+        self.order_by = False
+        self.cte = False
+        self._measure(sql)
+
+    def _finish(self, block: _Block) -> None:
+        if block.pending or (block.commas and not block.where):
+            self.cartesian = True
+        block.reset()
+
+    def _measure(self, sql: str) -> None:
+        verbs: list[str] = []
+        stack = [_Block()]
+        prev: Token | None = None
+        start = True
+        for tok in tokenize(sql):
+            kind, value = tok.kind, tok.value
+            block = stack[-1]
+            if start and kind != 'op':
+                verbs.append(value)
+                self.cte = self.cte or value == 'WITH'
+                start = False
+            elif verbs and verbs[-1] == 'ALTER' and prev is not None and \
+                    prev.value == 'ALTER' and value == 'SESSION':
+                verbs[-1] = 'ALTER SESSION'
+            if kind == 'op':
+                if value == '(':
+                    if block.table:
+                        self.tables += 1    # derived table
+                        block.table = False
+                    stack.append(_Block())
+                elif value == ')':
+                    if len(stack) > 1:
+                        self._finish(stack.pop())
+                elif value == ';':
+                    for b in stack:
+                        self._finish(b)
+                    stack = [_Block()]
+                    start = True
+                elif value == ',' and block.clause == 'from':
+                    block.commas += 1
+                    self.joins += 1
+                    block.table = True
+                elif value == '*' and block.clause == 'select' and (
+                        prev is None or prev.value in _STAR_AFTER or
+                        prev.kind == 'num'):
+                    self.select_star = True
+            elif kind == 'ident':
+                if value == 'SELECT':
+                    if block.query:
+                        self._finish(block)
+                    block.query = True
+                    block.clause = 'select'
+                    self.subquery_depth = max(self.subquery_depth, sum(
+                        b.query for b in stack) - 1)
+                elif value == 'FROM' and block.clause == 'select':
+                    block.clause = 'from'
+                    block.table = True
+                elif value == 'JOIN':
+                    if block.pending:
+                        self.cartesian = True
+                    natural = prev is not None and prev.value == 'NATURAL'
+                    if prev is not None and prev.value == 'CROSS':
+                        self.cartesian = True
+                    block.pending = not natural and not (
+                        prev is not None and prev.value == 'CROSS')
+                    block.clause = 'from'
+                    block.table = True
+                    self.joins += 1
+                elif value in ('ON', 'USING'):
+                    block.pending = False
+                    block.table = False
+                elif value == 'APPLY':
+                    block.table = True
+                    self.joins += 1
+                elif value == 'WHERE':
+                    if block.pending:
+                        self.cartesian = True
+                        block.pending = False
+                    block.clause = 'where'
+                    block.where = True
+                    block.table = False
+                elif value in _CLAUSES:
+                    if value == 'ORDER' and len(stack) == 1:
+                        self.order_by = True
+                    if block.clause in ('from', 'select'):
+                        self._finish_from(block)
+                    block.clause = value.lower()
+                    block.table = False
+                elif value in _SET_OPS:
+                    self._finish(block)
+                elif block.table:
+                    self.tables += 1
+                    block.table = False
+            elif kind == 'name' and block.table:
+                self.tables += 1
+                block.table = False
+            prev = tok
+        for b in stack:
+            self._finish(b)
+        self.statements = len(verbs)
+        self.verbs = tuple(verbs)
+
+    def _finish_from(self, block: _Block) -> None:
+        """The FROM list ended (WHERE excepted, which joins it)."""
+        if block.pending:
+            self.cartesian = True
+            block.pending = False
+        if block.commas and not block.where:
+            self.cartesian = True
+            block.commas = 0
+
+    @property
+    def session_only(self) -> bool:
+        """Whether every statement only configures the session."""
+        return all(v in SESSION_VERBS for v in self.verbs)
+
+
+_CACHE: OrderedDict[bytes, SqlInfo] = OrderedDict()
+
+
+def sql_key(sql: str) -> bytes:
+    return hashlib.blake2b(sql.encode('utf-8'), digest_size=16).digest()
+
+
+def analyze(sql: str) -> SqlInfo:
+    """Measure *sql*, memoized by its hash (LRU, CACHE_SIZE entries)."""
+    key = sql_key(sql)
+    info = _CACHE.get(key)
+    if info is not None:
+        _CACHE.move_to_end(key)
+        return info
+    info = _CACHE[key] = SqlInfo(sql)
+    if len(_CACHE) > CACHE_SIZE:
+        _CACHE.popitem(last=False)
+    return info
@@ -0,0 +1,266 @@
+# streaming.py
+
+from __future__ import annotations
+import xml.etree.ElementTree as ET
+from collections import defaultdict
+from typing import IO, Callable, Iterable, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from gating import Gate
+    from rule_base import Finding, Rule
+    from profiling import NullProfiler, Profiler
+    from workbook_loader import PackageContents
+
+
+class StreamContext:
+    """Parse state shared with handlers while a workbook is streamed.
+
+    ``stack`` holds the currently open elements (root first).  Open
+    elements carry their attributes; their children are only guaranteed
+    to be present inside a tag some handler asked to ``keep``.
+    """
+
+    def __init__(self, package: PackageContents | None = None):
+        self.root: ET.Element | None = None
+        self.stack: list[ET.Element] = []
+        self.package = package  # zip central-directory metadata, if any
+
+    @property
+    def depth(self) -> int:
+        return len(self.stack)
+
+    def nearest(self, tag: str) -> ET.Element | None:
+        """Closest open ancestor with *tag*, or None."""
+        for elem in reversed(self.stack):
+            if elem.tag == tag:
+                return elem
+        return None
+
+    def inside(self, tag: str) -> bool:
+        return self.nearest(tag) is not None
+
+
+class StreamHandler:
+    """Per-workbook event subscriber created by ``Rule.stream()``.
+
+    ``tags``  – element tags this handler receives start/end events for.
+    ``keep``  – tags whose full subtree must still be intact at their end
+                event (everything else is cleared as soon as it closes).
+    The root element is not dispatched by default, matching ``.//tag``
+    lookups.  ``start`` may return True once the number of findings the
+    handler will report can no longer change (a presence or threshold
+    count was reached); under ``--fail-fast`` that lets the parse stop
+    early.
+    """
+
+    tags: Iterable[str] = ()
+    keep: Iterable[str] = ()
+
+    def start(self, elem: ET.Element, ctx: StreamContext) -> bool | None:
+        pass
+
+    def end(self, elem: ET.Element, ctx: StreamContext) -> None:
+        pass
+
+    def finish(self, ctx: StreamContext) -> list[Finding]:
+        return []
+
+
+class ElementHandler(StreamHandler):
+    """Call ``report(elem)`` for every element with one of *tags*."""
+
+    def __init__(self, tags: Iterable[str],
+                 report: Callable[[ET.Element], Finding | None]):
+        self.tags = tuple(tags)
+        self._report = report
+        self.findings: list[Finding] = []
+
+    def start(self, elem, ctx):
+        finding = self._report(elem)
+        if finding is not None:
+            self.findings.append(finding)
+
+    def finish(self, ctx):
+        return self.findings
+
+
+class TagCountHandler(StreamHandler):
+    """Count elements of *tag*; ``report(count)`` runs once at the end.
+    With *limit*, ``start`` returns True when the count reaches it (the
+    rule's threshold, or 1 for presence rules)."""
+
+    def __init__(self, tag: str, report: Callable[[int], list[Finding]],
+                 match: Callable[[ET.Element], bool] | None = None,
+                 limit: int | None = None):
+        self.tags = (tag,)
+        self._report = report
+        self._match = match
+        self._limit = limit
+        self.count = 0
+
+    def start(self, elem, ctx):
+        if self._match is None or self._match(elem):
+            self.count += 1
+            return self.count == self._limit
+
+    def finish(self, ctx):
+        return self._report(self.count)
+
+
+class ScopedCountHandler(StreamHandler):
+    """Count *item* elements below each *scope* element.
+
+    ``report(scope_elem, count)`` runs when the scope closes, so findings
+    come out in document order just like ``findall`` loops.
+    """
+
+    def __init__(self, scope: str, item: str,
+                 report: Callable[[ET.Element, int], Finding | None]):
+        self.tags = (scope, item)
+        self._scope = scope
+        self._report = report
+        self._open: list[list] = []
+        self.findings: list[Finding] = []
+
+    def start(self, elem, ctx):
+        if elem.tag == self._scope:
+            self._open.append([elem, 0])
+        else:
+            for entry in self._open:
+                entry[1] += 1
+
+    def end(self, elem, ctx):
+        if elem.tag != self._scope:
+            return
+        scope_elem, count = self._open.pop()
+        finding = self._report(scope_elem, count)
+        if finding is not None:
+            self.findings.append(finding)
+
+    def finish(self, ctx):
+        return self.findings
+
+
+def stream_findings(source: str | IO[bytes], rules: Iterable[Rule],
+                    include_root: bool = False,
+                    package: PackageContents | None = None,
+                    profiler: Profiler | NullProfiler | None = None,
+                    gate: Gate | None = None,
+                    reopen: Callable[[], IO[bytes]] | None = None
+                    ) -> tuple[list[Finding], list[Rule]]:
+    """Run *rules* over an XML source in a single iterparse pass.
+
+    Every element is cleared and detached from its parent once its end
+    event has been dispatched, so peak memory is bounded by nesting depth
+    (plus any ``keep`` subtrees) rather than by document size.  The root is
+    only dispatched with ``include_root`` (see WorkbookIndex); a *profiler*
+    books each handler's callbacks to its rule.  Returns the findings in
+    rule order and the rules that have no streaming handler.
+
+    With a *gate*, every handler that settles its verdict early is checked
+    against it, and ``FailFast`` is raised as soon as the settled rules
+    fail it, without parsing the rest of the document.
+
+    With *reopen* (a callable returning the document again), findings are
+    located (``locations.locate``): elements are numbered by the parser
+    and linked to their parents, so a finding's element can still name
+    its XPath after it has been cleared.
+    """
+    handlers: list[tuple[Rule, StreamHandler]] = []
+    skipped: list[Rule] = []
+    for rule in rules:
+        handler = rule.stream()
+        if handler is None:
+            skipped.append(rule)
+        else:
+            if profiler is not None:
+                handler = profiler.handler(handler, rule.id)
+            handlers.append((rule, handler))
+
+    gating: dict[StreamHandler, Rule] = {}
+    if gate is not None:
+        gating = {h: r for r, h in handlers if gate.gating(r)}
+    unsettled = len(gating)
+    counts: dict[str, int] = {}
+
+    subscribers: dict[str, list[StreamHandler]] = defaultdict(list)
+    keep: set[str] = set()
+    for _, handler in handlers:
+        for tag in handler.tags:
+            subscribers[tag].append(handler)
+        keep.update(handler.keep)
+
+    ctx = StreamContext(package)
+    stack = ctx.stack
+    kept = 0
+    parser = None
+    siblings: list[dict[str, int]] = []
+    if reopen is not None:
+        from locations import located_parser, step_of
+        parser = located_parser()
+    for event, elem in ET.iterparse(source, events=('start', 'end'),
+                                    parser=parser):
+        tag = elem.tag
+        if event == 'start':
+            if not stack:
+                ctx.root = elem
+            if parser is not None:
+                if stack:
+                    seen = siblings[-1]
+                    seen[tag] = seen.get(tag, 0) + 1
+                    elem.up = stack[-1]
+                    elem.step = step_of(elem, seen[tag])
+                else:
+                    elem.up = None
+                siblings.append({})
+            if stack or include_root:
+                for handler in subscribers.get(tag, ()):
+                    if handler.start(elem, ctx) and handler in gating:
+                        _settle(gating.pop(handler), handler, ctx, gate,
+                                counts, unsettled - len(gating),
+                                len(handlers))
+            stack.append(elem)
+            if tag in keep:
+                kept += 1
+            continue
+        stack.pop()
+        if parser is not None:
+            siblings.pop()
+        if stack or include_root:
+            for handler in subscribers.get(tag, ()):
+                handler.end(elem, ctx)
+        if not stack:
+            break
+        if tag in keep:
+            kept -= 1
+        if kept:
+            continue
+        elem.clear()
+        # Earlier siblings are already gone, so a closed element is always
+        # the first child left in its parent (the parser may have queued
+        # later siblings behind it).
+        parent = stack[-1]
+        if len(parent) and parent[0] is elem:
+            del parent[0]
+
+    findings: list[Finding] = []
+    for _, handler in handlers:
+        findings.extend(handler.finish(ctx))
+    if reopen is not None:
+        from locations import locate
+        locate(findings, ctx.root, reopen)
+    return findings, skipped
+
+
+def _settle(rule: Rule, handler: StreamHandler, ctx: StreamContext,
+            gate: Gate, counts: dict[str, int], settled: int, total: int
+            ) -> None:
+    """Add a settled handler's findings to *counts*; raise ``FailFast`` if
+    the gate now fails."""
+    found = len(handler.finish(ctx))
+    if found:
+        counts[rule.id] = found
+    reason = gate.verdict(counts)
+    if reason is not None:
+        from gating import FailFast
+        raise FailFast(reason, settled, total)
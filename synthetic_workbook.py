@@ -0,0 +1,126 @@
+# synthetic_workbook.py
+
+from __future__ import annotations
+import io
+import zipfile
+from pathlib import Path
+from typing import IO
+from xml.sax.saxutils import quoteattr
+
+# Named size presets for the benchmark suite.  "huge" lands in the hundreds
+# of MB of XML; extract_mb adds a stored (uncompressed) .hyper per source.
+PRESETS: dict[str, dict[str, int]] = {
+    'small':  dict(worksheets=10, dashboards=2, datasources=3, columns=50,
+                   filters=4, views=6, long_calcs=5, extract_mb=0),
+    'medium': dict(worksheets=120, dashboards=15, datasources=20,
+                   columns=1500, filters=8, views=12, long_calcs=200,
+                   extract_mb=1),
+    'large':  dict(worksheets=500, dashboards=60, datasources=40,
+                   columns=15000, filters=12, views=20, long_calcs=2000,
+                   extract_mb=4),
+    'huge':   dict(worksheets=2000, dashboards=200, datasources=60,
+                   columns=150000, filters=14, views=24, long_calcs=20000,
+                   extract_mb=16),
+}
+
+_LONG_FORMULA = ' + '.join(f'IF [f{i}] > {i} THEN [f{i}] ELSE 0 END'
+                           for i in range(30))
+
+
+def _write_twb(out: IO[str], worksheets: int = 10, dashboards: int = 2,
+               datasources: int = 3, columns: int = 50, filters: int = 4,
+               views: int = 6, long_calcs: int = 5, **_) -> None:
+    """Write workbook XML exercising every built-in rule.
+
+    ``columns`` and ``long_calcs`` are per data source; ``filters`` per
+    worksheet; ``views`` per dashboard.  Every fifth column is unused and
+    every seventh data source is flagged unused.
+    """
+    w = out.write
+    w("<?xml version='1.0' encoding='utf-8' ?>\n")
+    w("<workbook source-build='synthetic' version='18.1'>\n<datasources>\n")
+    for d in range(datasources):
+        name = f'ds{d}'
+        used = 'false' if d % 7 == 6 else 'true'
+        w(f"<datasource caption='Source {d}' name='{name}' isUsed='{used}'>\n")
+        w("<connection class='federated'><named-connections>")
+        for c in range(1 + d % 5):
+            klass = 'sqlproxy' if d % 9 == 8 else 'postgres'
+            w(f"<named-connection name='c{c}'><connection class='{klass}' "
+              f"dbname='db{c}' server='db.example.com'/></named-connection>")
+        w("</named-connections>")
+        w(f"<relation name='t' table='[public].[t{d}]' type='table'/>")
+        w("</connection>\n")
+        w(f"<connection class='hyper' dbname='Data/Extracts/{name}.hyper'/>\n")
+        for c in range(columns):
+            usage = " usage='unused'" if c % 5 == 0 else ''
+            w(f"<column datatype='real' name='[f{c}]' role='measure'"
+              f" type='quantitative'{usage}/>\n")
+        for c in range(long_calcs):
+            cross = " is-cross-data-source='true'" if c == 0 and d == 0 else ''
+            w(f"<column caption='Calc {c}' datatype='real' name='[calc{c}]' "
+              f"role='measure'><calculation class='tableau'{cross} "
+              f"formula={quoteattr(_LONG_FORMULA)}/></column>\n")
+        w("</datasource>\n")
+    w("</datasources>\n<worksheets>\n")
+    for s in range(worksheets):
+        caption = f" caption='Sheet {s}'" if s % 2 else ''
+        w(f"<worksheet name='Sheet {s}'{caption}><table><view>"
+          "<datasources>")
+        blended = 1 + s % 3
+        for b in range(blended):
+            w(f"<datasource name='ds{(s + b) % max(datasources, 1)}'/>")
+        w("</datasources>")
+        for b in range(blended):
+            w(f"<datasource-dependencies datasource='ds{(s + b) % max(datasources, 1)}'>"
+              "<column name='[f1]'/></datasource-dependencies>")
+        for f in range(filters + s % 5):
+            w(f"<filter class='categorical' column='[ds0].[f{f}]'>"
+              "<groupfilter function='member' member='1'/></filter>")
+        w("</view></table></worksheet>\n")
+    w("</worksheets>\n<dashboards>\n")
+    for d in range(dashboards):
+        fixed = " automatic-size='false'" if d % 2 else ''
+        w(f"<dashboard name='Dashboard {d}'{fixed}><zones>")
+        for v in range(views + d % 6):
+            w(f"<zone id='{v}' name='Sheet {v % max(worksheets, 1)}'/>")
+        w("</zones><devicelayouts/>")
+        for v in range(views + d % 6):
+            w(f"<view name='Sheet {v % max(worksheets, 1)}'/>")
+        w("</dashboard>\n")
+    w("</dashboards>\n</workbook>\n")
+
+
+def generate(path: Path, extract_mb: int = 0, **counts: int) -> Path:
+    """Write a synthetic .twb, or a .twbx package when *path* says so.
+
+    Packages get one stored extract of ``extract_mb`` MB per data source so
+    central-directory rules have something to measure.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.suffix.lower() != '.twbx':
+        with open(path, 'w', encoding='utf-8') as fh:
+            _write_twb(fh, **counts)
+        return path
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED,
+                         compresslevel=1) as z:
+        with z.open(f'{path.stem}.twb', 'w', force_zip64=True) as raw:
+            with io.TextIOWrapper(raw, encoding='utf-8') as fh:
+                _write_twb(fh, **counts)
+        if extract_mb:
+            block = bytes(range(256)) * 4096  # 1 MB
+            for d in range(counts.get('datasources', 3)):
+                info = zipfile.ZipInfo(f'Data/Extracts/ds{d}.hyper')
+                info.compress_type = zipfile.ZIP_STORED
+                with z.open(info, 'w', force_zip64=True) as fh:
+                    for _ in range(extract_mb):
+                        fh.write(block)
+    return path
+
+
+def generate_preset(name: str, directory: Path, packaged: bool = True
+                    ) -> Path:
+    suffix = '.twbx' if packaged else '.twb'
+    return generate(Path(directory) / f'synthetic_{name}{suffix}',
+                    **PRESETS[name])
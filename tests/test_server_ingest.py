@@ -0,0 +1,251 @@
+# test_server_ingest.py
+
+import asyncio
+import io
+import json
+import sys
+import tempfile
+import threading
+import unittest
+import urllib.parse
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import server_ingest  # noqa: E402
+from server_ingest import HttpPool, SyncState, TableauClient  # noqa: E402
+
+WORKBOOKS = f'/api/{server_ingest.DEFAULT_API_VERSION}/sites/SITE/workbooks'
+TWB = b"<?xml version='1.0'?><workbook><worksheets/></workbook>"
+
+
+def _twbx() -> bytes:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w') as z:
+        z.writestr('Book.twb', TWB)
+    return buf.getvalue()
+
+
+class MockServer:
+    """A stand-in for the slice of the Tableau REST API the ingestion uses,
+    on a ThreadingHTTPServer: PAT sign-in, paged workbook lists, content
+    downloads.  ``fail`` maps a request path (without query) to how many
+    503 replies it gets before a real one; ``requests`` records every
+    request line the server handled."""
+
+    def __init__(self, workbooks: list[dict]):
+        self.workbooks = workbooks
+        self.content: dict[str, tuple[bytes, str | None]] = {}
+        self.fail: dict[str, int] = {}
+        self.requests: list[str] = []
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.url = f'http://127.0.0.1:{self.httpd.server_address[1]}'
+        self._thread = threading.Thread(target=self.httpd.serve_forever,
+                                        args=(0.05,), daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body=b'', headers=()):
+                self.send_response(status)
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _failing(self, path):
+                with server.lock:
+                    server.requests.append(f'{self.command} {self.path}')
+                    left = server.fail.get(path, 0)
+                    if left:
+                        server.fail[path] = left - 1
+                if left:
+                    self._send(503, headers=[('Retry-After', '0')])
+                return bool(left)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                path = urllib.parse.urlsplit(self.path).path
+                if self._failing(path):
+                    return
+                if path.endswith('/auth/signin'):
+                    creds = json.loads(body)['credentials']
+                    if creds['personalAccessTokenSecret'] != 's3cret':
+                        return self._send(401)
+                    return self._send(200, json.dumps({'credentials': {
+                        'token': 'TOKEN', 'site': {'id': 'SITE'}}}).encode())
+                self._send(204)
+
+            def do_GET(self):
+                url = urllib.parse.urlsplit(self.path)
+                if self._failing(url.path):
+                    return
+                if self.headers.get('X-Tableau-Auth') != 'TOKEN':
+                    return self._send(401)
+                query = dict(urllib.parse.parse_qsl(url.query))
+                if url.path.endswith('/sites/SITE/workbooks'):
+                    size = int(query['pageSize'])
+                    start = (int(query['pageNumber']) - 1) * size
+                    return self._send(200, json.dumps({
+                        'pagination': {'totalAvailable':
+                                       str(len(server.workbooks))},
+                        'workbooks': {'workbook':
+                                      server.workbooks[start:start + size]},
+                    }).encode())
+                wb = url.path.split('/')[-2]
+                body, filename = server.content[wb]
+                headers = []
+                if filename:
+                    headers.append(('Content-Disposition',
+                                    f'attachment; filename="{filename}"'))
+                self._send(200, body, headers)
+
+        return Handler
+
+
+def _workbooks(n: int, updated: str = '2026-01-01T00:00:00Z') -> list[dict]:
+    return [{'id': f'wb-{i}', 'name': f'Book {i}',
+             'project': {'name': 'Sales'}, 'updatedAt': updated,
+             'contentUrl': f'Book{i}'} for i in range(n)]
+
+
+class ServerIngestTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = Path(tmp.name)
+
+    def _run(self, server: MockServer, body):
+        """Sign in to *server*, ``await body(client)``, sign out; returns
+        the pool (for its counters) and what *body* returned."""
+        async def go():
+            pool = HttpPool(server.url, size=2, retries=3, backoff=0.01)
+            client = TableauClient(pool, 'site', 'token', 's3cret')
+            await client.sign_in()
+            try:
+                return pool, await body(client)
+            finally:
+                await client.sign_out()
+                await pool.close()
+        return asyncio.run(go())
+
+    def _ingest(self, server: MockServer, state: SyncState | None = None):
+        """Ingest every workbook of *server*; returns the spooled files as
+        ``analyze`` saw them (name and bytes) and the results by id."""
+        spooled = {}
+        results = {}
+
+        async def analyze(path: Path) -> dict:
+            spooled[path.parent.name] = (path.name, path.read_bytes())
+            return {'score': 100, 'rows': []}
+
+        def on_result(entry, result):
+            results[entry.id] = result
+            if state is not None and 'score' in result:
+                state.record(entry, result['score'], len(result['rows']))
+
+        async def body(client):
+            await server_ingest.ingest(client, self.tmp / 'spool', analyze,
+                                       on_result, state, downloads=2,
+                                       window=3, page_size=2)
+        self._run(server, body)
+        return spooled, results
+
+    def test_pages_through_every_workbook(self):
+        with MockServer(_workbooks(5)) as server:
+            async def body(client):
+                return [e async for e in client.workbooks(page_size=2)]
+            _, entries = self._run(server, body)
+        self.assertEqual([e.id for e in entries],
+                         [f'wb-{i}' for i in range(5)])
+        self.assertEqual(entries[0].label, 'Sales/Book 0')
+        pages = sorted(r.split('pageNumber=')[1].split('&')[0]
+                       for r in server.requests if 'pageNumber=' in r)
+        self.assertEqual(pages, ['1', '2', '3'])
+
+    def test_retries_503_after_retry_after(self):
+        with MockServer(_workbooks(3)) as server:
+            server.fail[WORKBOOKS] = 2
+            async def body(client):
+                return [e async for e in client.workbooks(page_size=2)]
+            pool, entries = self._run(server, body)
+        self.assertEqual(len(entries), 3)
+        self.assertEqual(pool.retried, 2)
+
+    def test_gives_up_after_retries(self):
+        with MockServer(_workbooks(1)) as server:
+            server.fail[WORKBOOKS] = 10
+            async def body(client):
+                return [e async for e in client.workbooks()]
+            with self.assertRaises(server_ingest.HttpError) as raised:
+                self._run(server, body)
+        self.assertEqual(raised.exception.status, 503)
+
+    def test_spools_twb_and_twbx(self):
+        twbx = _twbx()
+        with MockServer(_workbooks(3)) as server:
+            server.content = {'wb-0': (TWB, 'Book 0.twb'),
+                              'wb-1': (twbx, 'Book 1.twbx'),
+                              # No file name: the suffix comes from the
+                              # content.
+                              'wb-2': (twbx, None)}
+            spooled, results = self._ingest(server)
+        self.assertEqual(spooled, {'wb-0': ('Book 0.twb', TWB),
+                                   'wb-1': ('Book 1.twbx', twbx),
+                                   'wb-2': ('Book 2.twbx', twbx)})
+        self.assertTrue(all('score' in r for r in results.values()))
+        # Spooled files are removed once analyzed.
+        self.assertEqual(list((self.tmp / 'spool').iterdir()), [])
+
+    def test_skips_workbooks_with_unchanged_updated_at(self):
+        state_file = self.tmp / 'state.json'
+        workbooks = _workbooks(3)
+        with MockServer(workbooks) as server:
+            server.content = {w['id']: (TWB, None) for w in workbooks}
+            state = SyncState(state_file, {'only': []})
+            spooled, _ = self._ingest(server, state)
+            state.save()
+            self.assertEqual(len(spooled), 3)
+
+            workbooks[1]['updatedAt'] = '2026-02-01T00:00:00Z'
+            state = SyncState(state_file, {'only': []})
+            spooled, results = self._ingest(server, state)
+        self.assertEqual(list(spooled), ['wb-1'])
+        self.assertEqual(results['wb-0'], {'unchanged': {
+            'updatedAt': '2026-01-01T00:00:00Z', 'name': 'Sales/Book 0',
+            'score': 100, 'findings': 0}})
+        self.assertIn('score', results['wb-1'])
+
+    def test_state_of_another_rule_selection_is_discarded(self):
+        state_file = self.tmp / 'state.json'
+        with MockServer(_workbooks(2)) as server:
+            server.content = {'wb-0': (TWB, None), 'wb-1': (TWB, None)}
+            state = SyncState(state_file, {'only': []})
+            self._ingest(server, state)
+            state.save()
+            state = SyncState(state_file, {'only': ['GBLEND']})
+            spooled, _ = self._ingest(server, state)
+        self.assertEqual(sorted(spooled), ['wb-0', 'wb-1'])
+
+
+if __name__ == '__main__':
+    unittest.main()
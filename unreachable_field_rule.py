@@ -0,0 +1,72 @@
+from __future__ import annotations
+from field_graph import DATASOURCE, FIELD, PARAMETERS, graph_for
+from rule_base import Rule, Finding
+from workbook_index import WorkbookIndex
+
+
+def _has_views(index: WorkbookIndex) ->bool:
+    """Published data sources (.tds/.tdsx) have no views to reach fields
+    from, so nothing in them counts as dead."""
+    return index.root.tag != 'datasource'
+
+
+class DeadFieldRule(Rule):
+    id = 'GDEAD_FIELD'
+    description = ('Fields and calculations no visible view reaches, '
+                   'directly or through other calculations.')
+    group = 'Data Hygiene'
+    severity = 'LOW'
+    cost = 100
+
+    def check_index(self, index: WorkbookIndex) ->list[Finding]:
+        if not _has_views(index):
+            return []
+        graph = graph_for(index)
+        seen = graph.reachable()
+        flagged = {col.get('name') for col in index.findall('column')
+                   if col.get('usage') == 'unused'}
+        findings = []
+        for nid in graph.nodes(FIELD):
+            if seen[nid]:
+                continue
+            ds = graph.owner[nid]
+            if graph.name(ds) == PARAMETERS or graph.name(nid) in flagged:
+                continue
+            how = ('is only referenced by unused calculations'
+                   if graph.field_referenced[nid] else
+                   'is not referenced by any visible view')
+            findings.append(Finding(self.id,
+                "Field '{}' in data source '{}' {}.", 'TAKE_ACTION',
+                (graph.labels[nid], graph.labels[ds], how),
+                graph.elements[nid]))
+        return findings
+
+
+class DeadDataSourceRule(Rule):
+    id = 'GDEAD_DS'
+    description = 'Data sources no visible view reaches.'
+    group = 'Data Hygiene'
+    severity = 'LOW'
+    cost = 100
+
+    def check_index(self, index: WorkbookIndex) ->list[Finding]:
+        if not _has_views(index):
+            return []
+        graph = graph_for(index)
+        seen = graph.reachable()
+        live = bytearray(len(graph.keys))
+        for nid in graph.nodes(FIELD):
+            if seen[nid]:
+                live[graph.owner[nid]] = 1
+        flagged = {ds.get('name') for ds in index.findall('datasource')
+                   if ds.get('isUsed', 'true') == 'false'}
+        findings = []
+        for nid in graph.nodes(DATASOURCE):
+            name = graph.name(nid)
+            if seen[nid] or live[nid] or name == PARAMETERS or \
+                    name in flagged:
+                continue
+            findings.append(Finding(self.id,
+                "Data source '{}' is not used by any visible view.",
+                'TAKE_ACTION', (graph.labels[nid],), graph.elements[nid]))
+        return findings
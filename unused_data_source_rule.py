@@ -1,18 +1,25 @@
 from __future__ import annotations
 from rule_base import Rule, Finding
-import xml.etree.ElementTree as ET
+from streaming import ElementHandler, StreamHandler
+from workbook_index import WorkbookIndex
 
 class UnusedDataSourceRule(Rule):
     id = 'GUNUSED_DS'
     description = 'Data sources present but not referenced by any sheet.'
     group = 'Data Hygiene'
     severity = 'LOW'
+    scope = 'datasource'
 
-    def check(self, tree: ET.ElementTree) ->list[Finding]:
-        findings = []
-        for ds in tree.findall('.//datasource'):
-            if ds.get('isUsed', 'true') == 'false':
-                findings.append(Finding(self.id,
-                    f"Datasource '{ds.get('name')}' is unused.", 'TAKE_ACTION')
-                    )
-        return findings
\ No newline at end of file
+    def _report(self, ds) ->(Finding | None):
+        if ds.get('isUsed', 'true') == 'false':
+            return Finding(self.id,
+                "Datasource '{}' is unused.", 'TAKE_ACTION', (ds.get('name'),),
+                ds)
+        return None
+
+    def check_object(self, ds, index: WorkbookIndex) ->list[Finding]:
+        finding = self._report(ds)
+        return [finding] if finding is not None else []
+
+    def stream(self) ->StreamHandler:
+        return ElementHandler(('datasource',), self._report)
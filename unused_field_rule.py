@@ -1,6 +1,7 @@
 from __future__ import annotations
 from rule_base import Rule, Finding
-import xml.etree.ElementTree as ET
+from streaming import ElementHandler, StreamHandler
+from workbook_index import WorkbookIndex
 
 class UnusedFieldRule(Rule):
     id = 'GUNUSED_FIELDS'
@@ -8,11 +9,20 @@ class UnusedFieldRule(Rule):
     group = 'Data Hygiene'
     severity = 'LOW'
 
-    def check(self, tree: ET.ElementTree) ->list[Finding]:
+    def _report(self, col) ->(Finding | None):
+        if col.get('usage') == 'unused':
+            return Finding(self.id,
+                "Field '{}' defined but not used.", 'TAKE_ACTION',
+                (col.get('name'),), col)
+        return None
+
+    def check_index(self, index: WorkbookIndex) ->list[Finding]:
         findings = []
-        for col in tree.findall('.//column'):
-            if col.get('usage') == 'unused':
-                findings.append(Finding(self.id,
-                    f"Field '{col.get('name')}' defined but not used.",
-                    'TAKE_ACTION'))
-        return findings
\ No newline at end of file
+        for col in index.findall('column'):
+            finding = self._report(col)
+            if finding is not None:
+                findings.append(finding)
+        return findings
+
+    def stream(self) ->StreamHandler:
+        return ElementHandler(('column',), self._report)
@@ -1,19 +1,25 @@
 from __future__ import annotations
 from rule_base import Rule, Finding
-import xml.etree.ElementTree as ET
+from streaming import ScopedCountHandler, StreamHandler
+from workbook_index import WorkbookIndex
 
 class ViewCountRule(Rule):
     id = 'GVIEWS'
     description = 'Dashboards containing excessive number of views (>16).'
     group = 'Design Complexity'
     severity = 'MEDIUM'
+    scope = 'dashboard'
 
-    def check(self, tree: ET.ElementTree) ->list[Finding]:
-        findings = []
-        for dash in tree.findall('.//dashboard'):
-            views = dash.findall('.//view')
-            if len(views) > 16:
-                findings.append(Finding(self.id,
-                    f"Dashboard '{dash.get('name')}' has {len(views)} views.",
-                    'NEEDS_REVIEW'))
-        return findings
\ No newline at end of file
+    def _report(self, dash, views: int) ->(Finding | None):
+        if views > 16:
+            return Finding(self.id,
+                "Dashboard '{}' has {} views.", 'NEEDS_REVIEW',
+                (dash.get('name'), views), dash)
+        return None
+
+    def check_object(self, dash, index: WorkbookIndex) ->list[Finding]:
+        finding = self._report(dash, len(index.views_of(dash)))
+        return [finding] if finding is not None else []
+
+    def stream(self) ->StreamHandler:
+        return ScopedCountHandler('dashboard', 'view', self._report)
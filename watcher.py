@@ -0,0 +1,232 @@
+# watcher.py
+
+from __future__ import annotations
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from portfolio import SCAN_SUFFIXES, discover
+
+DEFAULT_DEBOUNCE = 0.3
+DEFAULT_POLL_INTERVAL = 0.5
+
+# <sys/inotify.h>
+_IN_MODIFY = 0x002
+_IN_CLOSE_WRITE = 0x008
+_IN_MOVED_TO = 0x080
+_IN_CREATE = 0x100
+_IN_Q_OVERFLOW = 0x4000
+_IN_ISDIR = 0x40000000
+_MASK = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+_EVENT = struct.Struct('iIII')
+
+# Sentinel for "events were lost; look at everything".
+RESCAN = None
+
+
+def _signature(path: Path) -> tuple[int, int] | None:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class _Polling:
+    """Finds changes by comparing (mtime, size) of every watched file."""
+
+    name = 'polling'
+
+    def __init__(self, watcher: Watcher, interval: float):
+        self._watcher = watcher
+        self._interval = interval
+        self._last = {p: _signature(p) for p in watcher.files()}
+
+    def wait(self, timeout: float | None) -> set[Path]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            step = self._interval
+            if deadline is not None:
+                step = min(step, max(0.0, deadline - time.monotonic()))
+            time.sleep(step)
+            current = {p: _signature(p) for p in self._watcher.files()}
+            changed = {p for p, sig in current.items()
+                       if self._last.get(p) != sig}
+            self._last = current
+            if changed or (deadline is not None and
+                           time.monotonic() >= deadline):
+                return changed
+
+    def close(self) -> None:
+        pass
+
+
+class _Inotify:
+    """Linux inotify on every watched directory (files are watched through
+    their directory, since Tableau saves by replacing the file)."""
+
+    name = 'inotify'
+
+    def __init__(self, watcher: Watcher):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6',
+                           use_errno=True)
+        self._libc = libc
+        self._watcher = watcher
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self._dirs: dict[int, Path] = {}
+        try:
+            for directory in watcher.directories():
+                self._add(directory)
+        except OSError:
+            os.close(self._fd)
+            raise
+
+    def _add(self, directory: Path) -> None:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory),
+                                          _MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f'cannot watch {directory}')
+        self._dirs[wd] = directory
+
+    def wait(self, timeout: float | None) -> set[Path] | None:
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return set()
+        changed: set[Path] = set()
+        try:
+            data = os.read(self._fd, 1 << 16)
+        except BlockingIOError:
+            return changed
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if mask & _IN_Q_OVERFLOW:
+                return RESCAN
+            directory = self._dirs.get(wd)
+            if directory is None or not name:
+                continue
+            path = directory / os.fsdecode(name)
+            if mask & _IN_ISDIR:
+                if mask & (_IN_CREATE | _IN_MOVED_TO) and \
+                        self._watcher.recursive(path):
+                    try:
+                        for sub in [path, *(p for p in path.rglob('*')
+                                            if p.is_dir())]:
+                            self._add(sub)
+                    except OSError:
+                        pass    # out of watches; files already seen still work
+                    changed.update(self._watcher.files(path))
+            elif self._watcher.wanted(path):
+                changed.add(path)
+        return changed
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+class Watcher:
+    """Yields batches of workbooks that changed on disk.
+
+    *targets* are files or directories (searched recursively for
+    ``suffixes``).  Events are debounced: a batch is reported once no
+    event arrived for ``debounce`` seconds, so the several writes of one
+    Tableau save give one batch, and only files whose (mtime, size)
+    actually differs from the last batch are reported.  Uses inotify where
+    available and falls back to polling.
+    """
+
+    def __init__(self, targets: Iterable[Path],
+                 suffixes: tuple[str, ...] = SCAN_SUFFIXES,
+                 debounce: float = DEFAULT_DEBOUNCE,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL,
+                 polling: bool = False):
+        self.targets = [Path(t).resolve() for t in targets]
+        self._files = {t for t in self.targets if not t.is_dir()}
+        self._roots = [t for t in self.targets if t.is_dir()]
+        self.suffixes = suffixes
+        self.debounce = debounce
+        self._seen = {p: _signature(p) for p in self.files()}
+        backend = None
+        if not polling and sys.platform.startswith('linux'):
+            try:
+                backend = _Inotify(self)
+            except (OSError, AttributeError):
+                backend = None
+        self._backend = backend or _Polling(self, poll_interval)
+
+    @property
+    def backend(self) -> str:
+        return self._backend.name
+
+    def recursive(self, path: Path) -> bool:
+        return any(root == path or root in path.parents
+                   for root in self._roots)
+
+    def wanted(self, path: Path) -> bool:
+        if path in self._files:
+            return True
+        if path.name.startswith(('.', '~')) or \
+                not path.name.lower().endswith(self.suffixes):
+            return False
+        return self.recursive(path.parent)
+
+    def directories(self) -> list[Path]:
+        dirs = {f.parent for f in self._files}
+        for root in self._roots:
+            dirs.add(root)
+            dirs.update(p for p in root.rglob('*') if p.is_dir())
+        return sorted(dirs)
+
+    def files(self, under: Path | None = None) -> list[Path]:
+        """Watched workbooks that exist now (all, or those below *under*)."""
+        found = set()
+        for root in ([under] if under is not None else self._roots):
+            found.update(p for p in discover(root, self.suffixes)
+                         if self.wanted(p))
+        if under is None:
+            found.update(f for f in self._files if f.exists())
+        return sorted(found)
+
+    def _changed(self, paths: set[Path] | None) -> list[Path]:
+        if paths is RESCAN:
+            paths = set(self.files())
+        changed = []
+        for path in sorted(paths):
+            sig = _signature(path)
+            if sig is not None and self._seen.get(path) != sig:
+                changed.append(path)
+            self._seen[path] = sig
+        return changed
+
+    def batches(self) -> Iterator[list[Path]]:
+        while True:
+            pending = self._backend.wait(None)
+            while pending is not RESCAN:
+                more = self._backend.wait(self.debounce)
+                if more is RESCAN:
+                    pending = RESCAN
+                elif not more:
+                    break
+                else:
+                    pending |= more
+            if pending is RESCAN:
+                # Drain what is left of the burst before rescanning.
+                while self._backend.wait(self.debounce) != set():
+                    pass
+            changed = self._changed(pending)
+            if changed:
+                yield changed
+
+    def close(self) -> None:
+        self._backend.close()
@@ -1,6 +1,7 @@
 from __future__ import annotations
 from rule_base import Rule, Finding
-import xml.etree.ElementTree as ET
+from streaming import StreamHandler
+from workbook_index import WorkbookIndex
 
 class WorkbookDescriptionRule(Rule):
     id = 'GDESC'
@@ -8,21 +9,57 @@ class WorkbookDescriptionRule(Rule):
     group = 'Documentation'
     severity = 'LOW'
 
-    def check(self, tree: ET.ElementTree) ->list[Finding]:
-        findings: list[Finding] = []
-        wb = tree.find('.//workbook')
-        if wb is not None and not (wb.get('description') or '').strip():
-            findings.append(Finding(self.id,
-                'Workbook is missing a description.', 'TAKE_ACTION'))
-        for ws in tree.findall('.//worksheet'):
-            if not ((ws.get('caption') or '').strip() or (ws.get(
+    def _report(self, elem) ->(Finding | None):
+        if elem.tag == 'workbook':
+            if not (elem.get('description') or '').strip():
+                return Finding(self.id,
+                    'Workbook is missing a description.', 'TAKE_ACTION',
+                    node=elem)
+        elif elem.tag == 'worksheet':
+            if not ((elem.get('caption') or '').strip() or (elem.get(
                 'description') or '').strip()):
-                findings.append(Finding(self.id,
-                    f"Worksheet '{ws.get('name')}' is missing caption or description."
-                    , 'TAKE_ACTION'))
-        for dash in tree.findall('.//dashboard'):
-            if not (dash.get('description') or '').strip():
-                findings.append(Finding(self.id,
-                    f"Dashboard '{dash.get('name')}' is missing a description."
-                    , 'TAKE_ACTION'))
-        return findings
\ No newline at end of file
+                return Finding(self.id,
+                    "Worksheet '{}' is missing caption or description.",
+                    'TAKE_ACTION', (elem.get('name'),), elem)
+        elif not (elem.get('description') or '').strip():
+            return Finding(self.id,
+                "Dashboard '{}' is missing a description.", 'TAKE_ACTION',
+                (elem.get('name'),), elem)
+        return None
+
+    def check_index(self, index: WorkbookIndex) ->list[Finding]:
+        findings: list[Finding] = []
+        wb = index.find('workbook')
+        elems = ([wb] if wb is not None else []) + index.findall('worksheet'
+            ) + index.findall('dashboard')
+        for elem in elems:
+            finding = self._report(elem)
+            if finding is not None:
+                findings.append(finding)
+        return findings
+
+    def stream(self) ->StreamHandler:
+        return _DescriptionHandler(self)
+
+
+class _DescriptionHandler(StreamHandler):
+    """Collect per-tag findings so they come out workbook → worksheets →
+    dashboards, the same order as the indexed check."""
+    tags = ('workbook', 'worksheet', 'dashboard')
+
+    def __init__(self, rule: WorkbookDescriptionRule):
+        self._rule = rule
+        self._seen_workbook = False
+        self._by_tag: dict[str, list[Finding]] = {t: [] for t in self.tags}
+
+    def start(self, elem, ctx):
+        if elem.tag == 'workbook':
+            if self._seen_workbook:
+                return
+            self._seen_workbook = True
+        finding = self._rule._report(elem)
+        if finding is not None:
+            self._by_tag[elem.tag].append(finding)
+
+    def finish(self, ctx):
+        return [f for t in self.tags for f in self._by_tag[t]]
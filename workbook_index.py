@@ -0,0 +1,125 @@
+# workbook_index.py
+
+from __future__ import annotations
+import xml.etree.ElementTree as ET
+from collections import defaultdict
+from typing import Iterator, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from workbook_loader import PackageContents
+
+# Tags whose descendants are bucketed per element during the single pass, so
+# rules can ask "which filters live under this worksheet" without re-walking.
+SCOPE_TAGS = ('worksheet', 'dashboard', 'datasource')
+
+_EMPTY: tuple = ()
+
+
+class WorkbookIndex:
+    """Element index built in one traversal of a workbook tree.
+
+    Buckets every element below the root by tag (document order), records
+    parent links and, for each worksheet / dashboard / datasource, the tags
+    found inside it.  Lookups mirror ``tree.findall('.//tag')`` semantics:
+    the root element itself is not part of any bucket unless
+    ``include_root`` is set (published data sources, whose root *is* the
+    ``<datasource>`` the rules should see).
+    """
+
+    def __init__(self, tree: ET.ElementTree | ET.Element,
+                 include_root: bool = False,
+                 package: PackageContents | None = None):
+        # Zip central-directory metadata for packaged files (else None).
+        self.package = package
+        if isinstance(tree, ET.ElementTree):
+            self.tree = tree
+        else:
+            self.tree = ET.ElementTree(tree)
+        self.root: ET.Element = self.tree.getroot()
+        self.parent: dict[ET.Element, ET.Element] = {}
+        self._by_tag: dict[str, list[ET.Element]] = defaultdict(list)
+        self._scoped: dict[ET.Element, dict[str, list[ET.Element]]] = {}
+        self._build(include_root)
+
+    def _build(self, include_root: bool) -> None:
+        parent = self.parent
+        by_tag = self._by_tag
+        scoped = self._scoped
+        open_scopes: list[dict[str, list[ET.Element]]] = []
+        root = self.root
+        root_scope = include_root and root.tag in SCOPE_TAGS
+        if include_root:
+            by_tag[root.tag].append(root)
+        if root_scope:
+            open_scopes.append(scoped.setdefault(root, defaultdict(list)))
+        # Explicit stack of (element, child iterator, is_scope) so deep
+        # workbooks never hit the recursion limit.
+        stack = [(root, iter(root), root_scope)]
+        while stack:
+            node, children, _ = stack[-1]
+            child = next(children, None)
+            if child is None:
+                if stack.pop()[2]:
+                    open_scopes.pop()
+                continue
+            tag = child.tag
+            parent[child] = node
+            by_tag[tag].append(child)
+            for bucket in open_scopes:
+                bucket[tag].append(child)
+            is_scope = tag in SCOPE_TAGS
+            if is_scope:
+                bucket = scoped[child] = defaultdict(list)
+                open_scopes.append(bucket)
+            stack.append((child, iter(child), is_scope))
+
+    # ── tag lookups ──────────────────────────────────────────────
+    def findall(self, tag: str) -> list[ET.Element]:
+        """All elements with *tag* below the root, in document order."""
+        return self._by_tag.get(tag, [])
+
+    def find(self, tag: str) -> ET.Element | None:
+        """First element with *tag* below the root, or None."""
+        found = self._by_tag.get(tag)
+        return found[0] if found else None
+
+    def count(self, tag: str) -> int:
+        return len(self._by_tag.get(tag, _EMPTY))
+
+    def tags(self) -> Iterator[str]:
+        return iter(self._by_tag)
+
+    # ── structural lookups ───────────────────────────────────────
+    def ancestors(self, elem: ET.Element) -> Iterator[ET.Element]:
+        """Yield the parent chain of *elem*, nearest first."""
+        parent = self.parent.get(elem)
+        while parent is not None:
+            yield parent
+            parent = self.parent.get(parent)
+
+    def nearest(self, elem: ET.Element, tag: str) -> ET.Element | None:
+        """Closest ancestor of *elem* with *tag*, or None."""
+        for anc in self.ancestors(elem):
+            if anc.tag == tag:
+                return anc
+        return None
+
+    def within(self, scope: ET.Element, tag: str) -> list[ET.Element]:
+        """Descendants of a worksheet/dashboard/datasource with *tag*.
+
+        Equivalent to ``scope.findall('.//tag')`` but answered from the
+        buckets collected during the build pass.
+        """
+        bucket = self._scoped.get(scope)
+        if bucket is None:
+            return scope.findall(f'.//{tag}')
+        return bucket.get(tag, [])
+
+    def filters_of(self, worksheet: ET.Element) -> list[ET.Element]:
+        return self.within(worksheet, 'filter')
+
+    def views_of(self, dashboard: ET.Element) -> list[ET.Element]:
+        return self.within(dashboard, 'view')
+
+    def connections_of(self, datasource: ET.Element) -> list[ET.Element]:
+        return self.within(datasource, 'connection')
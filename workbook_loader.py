@@ -0,0 +1,136 @@
+# workbook_loader.py
+
+from __future__ import annotations
+import contextlib
+import hashlib
+import xml.etree.ElementTree as ET
+import zipfile
+from pathlib import Path
+from typing import IO, Iterator
+
+# Plain XML documents and the member each packaged format carries.
+XML_KINDS = {'.twb': 'workbook', '.tds': 'datasource'}
+PACKAGE_MEMBERS = {'.twbx': '.twb', '.tdsx': '.tds'}
+
+# Package payloads that are never the document we analyze.
+_PAYLOAD_PREFIXES = ('Data/', 'TwbxExternalCache/', 'Image/')
+_PAYLOAD_SUFFIXES = ('.hyper', '.tde')
+
+
+class PackageContents:
+    """Central-directory view of a packaged workbook.
+
+    Built from ``ZipInfo`` records only; nothing here ever decompresses a
+    member, so it is free even for multi-GB packages.
+    """
+
+    def __init__(self, entries: list[zipfile.ZipInfo],
+                 document: zipfile.ZipInfo):
+        self.entries = [e for e in entries if not e.is_dir()]
+        self.document = document
+
+    def extracts(self) -> list[zipfile.ZipInfo]:
+        """Extract files (.hyper / legacy .tde) carried in the package."""
+        return [e for e in self.entries
+                if e.filename.lower().endswith(_PAYLOAD_SUFFIXES)]
+
+    def query_cache(self) -> list[zipfile.ZipInfo]:
+        """Entries of Tableau's external query/result cache."""
+        return [e for e in self.entries
+                if e.filename.startswith('TwbxExternalCache/')]
+
+    def fingerprint(self) -> str:
+        """Digest of the directory listing (names, sizes, timestamps)."""
+        h = hashlib.sha256()
+        for e in self.entries:
+            h.update(f'{e.filename}\0{e.file_size}\0{e.compress_size}\0'
+                     f'{e.date_time}\n'.encode())
+        return h.hexdigest()
+
+    @property
+    def total_size(self) -> int:
+        return sum(e.file_size for e in self.entries)
+
+    @property
+    def compressed_size(self) -> int:
+        return sum(e.compress_size for e in self.entries)
+
+
+class WorkbookSource:
+    """A workbook or published data source on disk.
+
+    ``member`` is the ZipInfo of the XML document for packaged files (taken
+    from the central directory only) and None for plain .twb/.tds files.
+    Only that member is ever opened; extracts and cache entries stay
+    untouched.
+    """
+
+    def __init__(self, path: Path, kind: str,
+                 member: zipfile.ZipInfo | None = None,
+                 package: PackageContents | None = None):
+        self.path = path
+        self.kind = kind        # workbook | datasource
+        self.member = member
+        self.package = package  # None for plain .twb/.tds
+
+    @property
+    def is_package(self) -> bool:
+        return self.member is not None
+
+    @contextlib.contextmanager
+    def open(self) -> Iterator[IO[bytes]]:
+        """Binary stream over the XML document, decompressed on the fly."""
+        if self.member is None:
+            with open(self.path, 'rb') as fh:
+                yield fh
+            return
+        with zipfile.ZipFile(self.path) as z:
+            with z.open(self.member) as fh:
+                yield fh
+
+    def parse(self) -> ET.ElementTree:
+        """Parse straight from the stream; no bytes/str copy of the file."""
+        with self.open() as fh:
+            return ET.parse(fh)
+
+    def __repr__(self) -> str:
+        member = f' [{self.member.filename}]' if self.member else ''
+        return f'<WorkbookSource {self.kind} {self.path.name}{member}>'
+
+
+def _is_payload(name: str) -> bool:
+    return name.startswith(_PAYLOAD_PREFIXES) or name.lower().endswith(
+        _PAYLOAD_SUFFIXES)
+
+
+def find_xml_member(infos: list[zipfile.ZipInfo], suffix: str | None = None
+                    ) -> zipfile.ZipInfo:
+    """Pick the document member of a package from its central directory.
+
+    Prefers a member with the expected suffix at the archive root (where
+    Tableau writes it), falling back to the shallowest match.  With no
+    expected suffix any .twb or .tds qualifies.
+    """
+    suffixes = (suffix,) if suffix else tuple(XML_KINDS)
+    candidates = [i for i in infos if not i.is_dir() and not _is_payload(
+        i.filename) and i.filename.lower().endswith(suffixes)]
+    if not candidates:
+        wanted = ' or '.join(suffixes)
+        raise FileNotFoundError(f'Workbook XML ({wanted}) not found inside package')
+    return min(candidates, key=lambda i: (i.filename.count('/'), i.filename))
+
+
+def resolve_source(path: Path) -> WorkbookSource:
+    """Classify *path* and locate its XML document without reading it."""
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix in XML_KINDS:
+        return WorkbookSource(path, XML_KINDS[suffix])
+    if suffix in PACKAGE_MEMBERS or zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as z:
+            infos = z.infolist()
+        member = find_xml_member(infos, PACKAGE_MEMBERS.get(suffix))
+        kind = XML_KINDS[Path(member.filename).suffix.lower()]
+        return WorkbookSource(path, kind, member, PackageContents(infos,
+                                                                  member))
+    return WorkbookSource(path, 'workbook')